@@ -6,101 +6,54 @@ Implements Router-First Agentic Architecture with Human-in-the-Loop
 import os
 import json
 import uuid
-from typing import Annotated, Literal, Dict, Any, List
-from datetime import datetime, timedelta
+import time
+import asyncio
+from typing import Annotated, Literal, Dict, Any, List, Optional, Tuple, AsyncIterator
+from datetime import datetime
 import logging
-import dateparser
-import pytz
 
-from langchain_groq import ChatGroq
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
 
 from models import (
     AgentState, TaskData, PendingTask, TaskConfirmation,
     UserRole, TaskList, TaskPriority
 )
-from firestore_service import firestore_service
+from firestore_service import firestore_service, TASK_QUERY_LIMIT, QUIZ_RESULTS_LIMIT
+from async_firestore_service import async_firestore_service
+from prefetch import request_prefetch, prefetch_for
+from intent_router import intent_pre_classifier, classification_cache
+from date_resolver import parse_natural_date
+from metrics import (
+    GRAPH_NODE_DURATION, INTENT_TOTAL, JSON_PARSE_FAILURES, RETRIEVAL_PROMPT_TOKENS,
+    DATA_ANSWERS, llm_metrics_callback
+)
+from data_compactor import compact_retrieved_data
+from answer_templates import render_templated_answer
+from confirmation_store import confirmation_store
+from session_checkpointer import create_session_saver, session_context
+from llm_client import llm_client_factory
+from llm_policy import llm_call_policy
+from prompts import prompt_registry, ROUTER_SYSTEM_PROMPT, CONVERSATIONALIST_SYSTEM_PROMPT
 
 logger = logging.getLogger(__name__)
 
-# =========================================================================
-# DATE PARSING UTILITIES
-# =========================================================================
+# Workflow mode (per deployment):
+# - "multi_hop": router LLM call, then the intent-specific node makes its own LLM calls
+# - "fused": one structured LLM call returns the intent plus the intent-specific payload
+GRAPH_MODES = ("multi_hop", "fused")
+AGENT_GRAPH_MODE = os.getenv("AGENT_GRAPH_MODE", "multi_hop").lower()
 
-def parse_natural_date(date_str: str) -> str:
-    """
-    Parse natural language dates into YYYY-MM-DD format using dateparser library.
-    Timezone: Asia/Colombo (Sri Lanka)
-    
-    Supported formats:
-    - "today" -> current date in Sri Lanka timezone
-    - "tomorrow" -> current date + 1 day
-    - "next monday", "next friday", etc. -> next occurrence of that day
-    - "this afternoon", "this evening" -> today
-    - "November 29", "Dec 5", "Jan 15" -> specific date in current/next year
-    - "2025-11-29" -> already formatted, return as-is
-    - "in 3 days", "in a week" -> relative dates
-    - And many more natural language formats
-    
-    Args:
-        date_str: Natural language date string
-        
-    Returns:
-        Date in YYYY-MM-DD format or None if parsing fails
-    """
-    if not date_str or not isinstance(date_str, str):
-        return None
-    
-    date_str = date_str.strip()
-    
-    # Get current time in Sri Lanka timezone
-    sri_lanka_tz = pytz.timezone('Asia/Colombo')
-    now_sri_lanka = datetime.now(sri_lanka_tz)
-    
-    # Try dateparser first with standard settings
-    parsed_date = dateparser.parse(
-        date_str,
-        settings={
-            'PREFER_DATES_FROM': 'future',  # Prefer future dates for ambiguous inputs
-            'RELATIVE_BASE': now_sri_lanka,  # Base date for relative dates (Sri Lanka time)
-            'TIMEZONE': 'Asia/Colombo',  # Sri Lanka timezone
-            'RETURN_AS_TIMEZONE_AWARE': True,  # Return timezone-aware datetime
-            'PARSERS': ['relative-time', 'absolute-time', 'timestamp'],  # Enable all parsers
-        },
-        languages=['en']  # Explicitly set English language
-    )
-    
-    # If dateparser failed, try removing "next" and parsing just the day name
-    # dateparser handles "wednesday" better than "next wednesday"
-    if not parsed_date and date_str.lower().startswith('next '):
-        # Extract the day name after "next "
-        day_name = date_str[5:].strip()  # Remove "next " prefix
-        parsed_date = dateparser.parse(
-            day_name,
-            settings={
-                'PREFER_DATES_FROM': 'future',
-                'RELATIVE_BASE': now_sri_lanka,
-                'TIMEZONE': 'Asia/Colombo',
-                'RETURN_AS_TIMEZONE_AWARE': True,
-            },
-            languages=['en']
-        )
-    
-    # Return formatted date if parsing succeeded
-    if parsed_date:
-        # Convert to Sri Lanka timezone if not already
-        if parsed_date.tzinfo is None:
-            parsed_date = sri_lanka_tz.localize(parsed_date)
-        else:
-            parsed_date = parsed_date.astimezone(sri_lanka_tz)
-        
-        return parsed_date.strftime("%Y-%m-%d")
-    
-    # Could not parse - log for debugging
-    logger.warning(f"Failed to parse date string: '{date_str}'")
-    return None
+# Tag on the LLM calls whose tokens are the user-facing answer (streamed over SSE)
+FINAL_RESPONSE_TAG = "final_response"
+
+# Nodes whose output carries the classified intent
+CLASSIFIER_NODES = ("fast_router", "router", "classify_and_act")
+
+# Row caps of the data reads per query type (templated answers must not
+# present a capped read as a complete count)
+ROW_LIMITS = {"tasks": TASK_QUERY_LIMIT, "quizzes": QUIZ_RESULTS_LIMIT}
 
 class StudyMateAgent:
     """
@@ -108,36 +61,89 @@ class StudyMateAgent:
     with LangGraph state management
     """
     
-    def __init__(self, groq_api_key: str):
-        """Initialize the agent with LLM and graph"""
-        self.llm = ChatGroq(
-            groq_api_key=groq_api_key,
+    def __init__(self, groq_api_key: str, graph_mode: str = None):
+        """
+        Initialize the agent with LLM and graph
+        
+        Args:
+            groq_api_key: Groq API key
+            graph_mode: "multi_hop" or "fused" (defaults to AGENT_GRAPH_MODE)
+        """
+        # Shared pooled HTTP clients (keep-alive across requests and models)
+        self.llm = llm_client_factory.chat_model(
+            groq_api_key,
             model_name="llama-3.1-8b-instant",
             temperature=0.3,
+            callbacks=[llm_metrics_callback],
+            # Retries are deadline-aware in llm_call_policy instead of the SDK's
+            max_retries=0,
         )
         
+        self.graph_mode = (graph_mode or AGENT_GRAPH_MODE).lower()
+        if self.graph_mode not in GRAPH_MODES:
+            logger.warning(f"Unknown graph mode '{self.graph_mode}', falling back to 'multi_hop'")
+            self.graph_mode = "multi_hop"
+        
+        # Session checkpointing: history and pending tasks are restored per sessionId
+        self.memory = create_session_saver()
+        
         # Build the state graph
         self.graph = self._build_graph()
         
-        # Memory for checkpointing (session management)
-        self.memory = MemorySaver()
-        
-        logger.info("StudyMate Agent initialized successfully")
+        logger.info(f"StudyMate Agent initialized successfully (graph mode: {self.graph_mode})")
     
     def _build_graph(self) -> StateGraph:
-        """Build the LangGraph workflow"""
+        """
+        Build the LangGraph workflow
+        
+        In "multi_hop" mode the LLM router classifies the intent and each node
+        makes its own LLM calls. In "fused" mode a single classify_and_act call
+        returns the intent together with the node's payload (extraction JSON,
+        query parameters or small talk reply); the multi-hop router is kept as
+        a fallback when the fused output cannot be parsed.
+        """
+        fused = getattr(self, "graph_mode", "multi_hop") == "fused"
         
         # Create the state graph with dict schema
         workflow = StateGraph(dict)
         
-        # Add nodes
-        workflow.add_node("router", self.router_node)
-        workflow.add_node("conversationalist", self.conversationalist_node)
-        workflow.add_node("task_extractor", self.task_extractor_node)
-        workflow.add_node("knowledge_retriever", self.knowledge_retriever_node)
+        # Add nodes (each node has a sync and an async implementation so the
+        # same compiled graph serves both graph.invoke and graph.ainvoke)
+        workflow.add_node("fast_router", self._timed_node("fast_router", self.fast_router_node, self.fast_router_node_async))
+        workflow.add_node("router", self._timed_node("router", self.router_node, self.router_node_async))
+        workflow.add_node("conversationalist", self._timed_node("conversationalist", self.conversationalist_node, self.conversationalist_node_async))
+        workflow.add_node("task_extractor", self._timed_node("task_extractor", self.task_extractor_node, self.task_extractor_node_async))
+        workflow.add_node("knowledge_retriever", self._timed_node("knowledge_retriever", self.knowledge_retriever_node, self.knowledge_retriever_node_async))
+        if fused:
+            workflow.add_node("classify_and_act", self._timed_node("classify_and_act", self.classify_and_act_node, self.classify_and_act_node_async))
+        
+        # Set entry point - the rule-based pre-classifier runs before the LLM router
+        workflow.set_entry_point("fast_router")
+        
+        # Confident pre-classifications skip the LLM router entirely
+        workflow.add_conditional_edges(
+            "fast_router",
+            self.fast_route_decision,
+            {
+                "router": "classify_and_act" if fused else "router",
+                "small_talk": "conversationalist",
+                "tool_use": "task_extractor",
+                "data_query": "knowledge_retriever"
+            }
+        )
         
-        # Set entry point
-        workflow.set_entry_point("router")
+        if fused:
+            # Fused planner dispatches straight to the node that consumes its payload
+            workflow.add_conditional_edges(
+                "classify_and_act",
+                self.fused_route_decision,
+                {
+                    "router": "router",
+                    "small_talk": "conversationalist",
+                    "tool_use": "task_extractor",
+                    "data_query": "knowledge_retriever"
+                }
+            )
         
         # Add conditional edges from router
         workflow.add_conditional_edges(
@@ -155,76 +161,253 @@ class StudyMateAgent:
         workflow.add_edge("task_extractor", END)
         workflow.add_edge("knowledge_retriever", END)
         
-        return workflow.compile()
+        return workflow.compile(checkpointer=getattr(self, "memory", None))
+    
+    def _timed_node(self, name: str, func, afunc) -> RunnableLambda:
+        """Wrap a node's sync and async implementations with latency metrics"""
+        def run(state: dict) -> dict:
+            start = time.perf_counter()
+            try:
+                return func(state)
+            finally:
+                GRAPH_NODE_DURATION.observe(time.perf_counter() - start, node=name)
+        
+        async def arun(state: dict) -> dict:
+            start = time.perf_counter()
+            try:
+                return await afunc(state)
+            finally:
+                GRAPH_NODE_DURATION.observe(time.perf_counter() - start, node=name)
+        
+        return RunnableLambda(run, afunc=arun, name=name)
+    
+    def _final_llm(self):
+        """LLM tagged as producing the user-facing answer (its tokens are streamed)"""
+        return self.llm.with_config(tags=[FINAL_RESPONSE_TAG])
+    
+    def _invoke_llm(self, state: dict, node: str, messages: list, final: bool = False):
+        """
+        Call the LLM within the request's deadline (retries, hedging for latency-critical nodes)
+        
+        Final answers are never hedged, and in streaming requests never
+        retried: their tokens go straight to the SSE stream, so a second
+        attempt would repeat text the client already received.
+        """
+        llm = self._final_llm() if final else self.llm
+        return llm_call_policy.invoke(
+            llm, messages, node, deadline=state.get("deadline"),
+            hedge=False if final else None, retry=not (final and state.get("streaming"))
+        )
+    
+    async def _ainvoke_llm(self, state: dict, node: str, messages: list, final: bool = False):
+        """Async variant of _invoke_llm"""
+        llm = self._final_llm() if final else self.llm
+        return await llm_call_policy.ainvoke(
+            llm, messages, node, deadline=state.get("deadline"),
+            hedge=False if final else None, retry=not (final and state.get("streaming"))
+        )
+    
+    # =========================================================================
+    # FAST ROUTER NODE (ZERO-LLM PRE-CLASSIFIER)
+    # =========================================================================
+    
+    def fast_router_node(self, state: dict) -> dict:
+        """
+        Fast Router Node: Deterministic keyword/pattern pre-classification.
+        Sets the intent only when the rules are confident; otherwise leaves it
+        unset so the LLM router decides.
+        """
+        result = intent_pre_classifier.classify(
+            state["user_message"],
+            has_pending_tasks=bool(state.get("pending_tasks"))
+        )
+        
+        if result["intent"]:
+            state["intent"] = result["intent"]
+            logger.info(
+                f"Fast path classified intent as: {result['intent']} "
+                f"(rule: {result['rule']}, confidence: {result['confidence']})"
+            )
+        else:
+            logger.info(f"Fast path deferred to LLM router ({result['fallback_reason']})")
+        
+        state["intent_source"] = result["path"]
+        return state
+    
+    async def fast_router_node_async(self, state: dict) -> dict:
+        """Async entry point for fast_router_node (pure CPU, no I/O)"""
+        self.fast_router_node(state)
+        self._notify_prefetch(state)
+        return state
+    
+    def _notify_prefetch(self, state: dict):
+        """Let the request prefetch start (or cancel) reads for the classified intent"""
+        prefetch = prefetch_for(state)
+        if prefetch:
+            prefetch.on_intent(state.get("intent"))
+    
+    def fast_route_decision(self, state: dict) -> Literal["router", "small_talk", "tool_use", "data_query"]:
+        """Skip the LLM router when the pre-classifier already set the intent"""
+        return state.get("intent") or "router"
+    
+    # =========================================================================
+    # FUSED CLASSIFY-AND-ACT NODE (SINGLE LLM CALL)
+    # =========================================================================
+    
+    def _classify_and_act_messages(self, state: dict) -> list:
+        """
+        Build the fused prompt: intent classification plus the instructions of
+        every downstream node, so one response carries the node's payload
+        """
+        messages = [SystemMessage(content=prompt_registry.fused_system_prompt(state.get("pending_tasks")))]
+        messages.extend(self._conversation_context_messages(state))
+        messages.append(HumanMessage(content=f"Current message: {state['user_message']}"))
+        return messages
+    
+    def _apply_fused_result(self, state: dict, content: str) -> dict:
+        """Parse the fused planner output into intent + payload for the next node"""
+        result = self._parse_json_content(content)
+        
+        intent = result.get("intent")
+        if intent not in ("small_talk", "tool_use", "data_query"):
+            raise ValueError(f"Fused planner returned unknown intent: {intent}")
+        
+        state["intent"] = intent
+        state["fused_payload"] = {
+            "reply": result.get("reply"),
+            "extraction": result.get("extraction"),
+            "query": result.get("query")
+        }
+        logger.info(f"Fused planner classified intent as: {intent} (confidence: {result.get('confidence')})")
+        return state
+    
+    def classify_and_act_node(self, state: dict) -> dict:
+        """
+        Classify-and-Act Node (fused mode): one structured LLM call returns
+        the intent and the intent-specific payload. On failure the intent is
+        left unset and the multi-hop router takes over.
+        """
+        logger.info(f"Fused planner processing message: {state['user_message'][:100]}")
+        
+        try:
+            response = self._invoke_llm(state, "classify_and_act", self._classify_and_act_messages(state))
+            self._apply_fused_result(state, response.content)
+            
+        except Exception as e:
+            logger.error(f"Error in classify-and-act node, falling back to router: {e}")
+            if isinstance(e, json.JSONDecodeError):
+                JSON_PARSE_FAILURES.inc(node="classify_and_act")
+            state["intent"] = None
+            state["fused_payload"] = None
+        
+        return state
+    
+    async def classify_and_act_node_async(self, state: dict) -> dict:
+        """Async variant of classify_and_act_node (non-blocking LLM call)"""
+        logger.info(f"Fused planner processing message: {state['user_message'][:100]}")
+        
+        try:
+            response = await self._ainvoke_llm(state, "classify_and_act", self._classify_and_act_messages(state))
+            self._apply_fused_result(state, response.content)
+            
+        except Exception as e:
+            logger.error(f"Error in classify-and-act node, falling back to router: {e}")
+            if isinstance(e, json.JSONDecodeError):
+                JSON_PARSE_FAILURES.inc(node="classify_and_act")
+            state["intent"] = None
+            state["fused_payload"] = None
+        
+        self._notify_prefetch(state)
+        return state
+    
+    def fused_route_decision(self, state: dict) -> Literal["router", "small_talk", "tool_use", "data_query"]:
+        """Dispatch on the fused intent, or fall back to the multi-hop router"""
+        return state.get("intent") or "router"
+    
+    def _fused_payload(self, state: dict, key: str) -> Any:
+        """Payload produced by the fused planner for the current node, if any"""
+        payload = state.get("fused_payload") or {}
+        return payload.get(key)
     
     # =========================================================================
     # ROUTER NODE
     # =========================================================================
     
+    def _router_system_prompt(self) -> str:
+        """Intent classification instructions shared by the router and the fused planner"""
+        return ROUTER_SYSTEM_PROMPT
+    
+    def _router_messages(self, state: dict) -> list:
+        """Build the intent classification prompt for the router"""
+        return [
+            SystemMessage(content=self._router_system_prompt()),
+            HumanMessage(content=f"Classify this message: '{state['user_message']}'")
+        ]
+    
+    def _apply_router_result(self, state: dict, content: str) -> dict:
+        """Parse the router's JSON classification into the state"""
+        result = json.loads(content)
+        
+        state["intent"] = result["intent"]
+        logger.info(f"Intent classified as: {state['intent']} (confidence: {result['confidence']})")
+        
+        # Confident classifications are shared with later requests
+        classification_cache.put(state["user_message"], result["intent"], result.get("confidence"))
+        return state
+    
+    def _apply_cached_classification(self, state: dict) -> bool:
+        """Reuse a cached router classification; returns True on a hit"""
+        cached = classification_cache.get(state["user_message"], bypass=bool(state.get("bypass_cache")))
+        if not cached:
+            return False
+        
+        state["intent"] = cached["intent"]
+        state["intent_source"] = "router_cache"
+        logger.info(f"Intent served from classification cache: {cached['intent']} (confidence: {cached['confidence']})")
+        return True
+    
     def router_node(self, state: dict) -> dict:
         """
         Router Node: Classifies user intent into 'small_talk', 'tool_use', or 'data_query'
         """
         logger.info(f"Router processing message: {state['user_message'][:100]}")
         
-        system_prompt = """You are an intent classifier for a task management assistant.
-
-Your job is to determine if the user's message is:
-1. **small_talk** - Casual conversation, greetings, questions about the bot, emotional support, or general chitchat
-2. **tool_use** - Task management requests (creating, adding, updating, deleting tasks), or anything requiring task creation/modification
-3. **data_query** - Requests to KNOW SOMETHING from the database (asking about existing tasks, pomodoro stats, quiz results, or any information retrieval)
-
-Examples:
-
-small_talk:
-- "Hello!"
-- "How are you?"
-- "What can you do?"
-- "I'm feeling tired today"
-- "Thanks for your help"
-- "Good morning"
-
-tool_use:
-- "I need to study for my exam next week"
-- "Add a task to buy groceries"
-- "I have a meeting tomorrow at 3 PM"
-- "Remind me to call mom"
-- "Create a task to finish my homework"
-
-data_query:
-- "Show me my tasks"
-- "What are my pending tasks?"
-- "What tasks do I have this week?"
-- "How many pomodoros did I complete?"
-- "What are my quiz scores?"
-- "Show me my completed tasks"
-- "What tasks are due tomorrow?"
-- "How much time have I studied?"
-
-Respond with ONLY a JSON object:
-{
-    "intent": "small_talk" or "tool_use" or "data_query",
-    "confidence": 0.0 to 1.0,
-    "reasoning": "brief explanation"
-}"""
+        if self._apply_cached_classification(state):
+            return state
         
         try:
-            messages = [
-                SystemMessage(content=system_prompt),
-                HumanMessage(content=f"Classify this message: '{state['user_message']}'")
-            ]
-            
-            response = self.llm.invoke(messages)
-            result = json.loads(response.content)
+            response = self._invoke_llm(state, "router", self._router_messages(state))
+            self._apply_router_result(state, response.content)
             
-            state["intent"] = result["intent"]
-            logger.info(f"Intent classified as: {state['intent']} (confidence: {result['confidence']})")
+        except Exception as e:
+            logger.error(f"Error in router node: {e}")
+            if isinstance(e, json.JSONDecodeError):
+                JSON_PARSE_FAILURES.inc(node="router")
+            # Default to small_talk if classification fails
+            state["intent"] = "small_talk"
+        
+        return state
+    
+    async def router_node_async(self, state: dict) -> dict:
+        """Async variant of router_node (non-blocking LLM call)"""
+        logger.info(f"Router processing message: {state['user_message'][:100]}")
+        
+        if self._apply_cached_classification(state):
+            self._notify_prefetch(state)
+            return state
+        
+        try:
+            response = await self._ainvoke_llm(state, "router", self._router_messages(state))
+            self._apply_router_result(state, response.content)
             
         except Exception as e:
             logger.error(f"Error in router node: {e}")
+            if isinstance(e, json.JSONDecodeError):
+                JSON_PARSE_FAILURES.inc(node="router")
             # Default to small_talk if classification fails
             state["intent"] = "small_talk"
         
+        self._notify_prefetch(state)
         return state
     
     def route_decision(self, state: dict) -> Literal["small_talk", "tool_use", "data_query"]:
@@ -235,6 +418,26 @@ Respond with ONLY a JSON object:
     # CONVERSATIONALIST NODE
     # =========================================================================
     
+    def _conversationalist_system_prompt(self) -> str:
+        """Persona and guidelines for small talk replies"""
+        return CONVERSATIONALIST_SYSTEM_PROMPT
+    
+    def _conversationalist_messages(self, state: dict) -> list:
+        """Build the conversationalist prompt with recent conversation history"""
+        # Build conversation context
+        messages = [SystemMessage(content=self._conversationalist_system_prompt())]
+        
+        # Add recent conversation history
+        for msg in state.get("conversation_history", [])[-6:]:
+            if msg["role"] == "user":
+                messages.append(HumanMessage(content=msg["content"]))
+            else:
+                messages.append(AIMessage(content=msg["content"]))
+        
+        # Add current message
+        messages.append(HumanMessage(content=state["user_message"]))
+        return messages
+    
     def conversationalist_node(self, state: dict) -> dict:
         """
         Conversationalist Node: Handles casual conversation
@@ -242,43 +445,38 @@ Respond with ONLY a JSON object:
         """
         logger.info("Conversationalist handling small talk")
         
-        system_prompt = """You are a friendly and empathetic AI assistant for students.
-
-Your role:
-- Provide emotional support and encouragement
-- Answer questions about how you work
-- Engage in friendly conversation
-- Be warm, supportive, and helpful
-- Guide users toward productivity when appropriate
-
-You do NOT have access to:
-- Task databases
-- User information
-- Calendar systems
-
-Keep responses:
-- Short and conversational (2-4 sentences)
-- Warm and encouraging
-- Honest about your limitations
-- Focused on helping the user feel supported
-
-If the user asks about tasks or productivity, gently let them know you can help with that if they tell you what they need to do."""
+        # Fused mode: the planner already wrote the reply
+        reply = self._fused_payload(state, "reply")
+        if reply:
+            state["response"] = reply
+            logger.info("Conversationalist using fused planner reply")
+            return state
         
         try:
-            # Build conversation context
-            messages = [SystemMessage(content=system_prompt)]
-            
-            # Add recent conversation history
-            for msg in state.get("conversation_history", [])[-6:]:
-                if msg["role"] == "user":
-                    messages.append(HumanMessage(content=msg["content"]))
-                else:
-                    messages.append(AIMessage(content=msg["content"]))
+            response = self._invoke_llm(state, "conversationalist", self._conversationalist_messages(state), final=True)
+            state["response"] = response.content
             
-            # Add current message
-            messages.append(HumanMessage(content=state["user_message"]))
+            logger.info("Conversationalist response generated")
             
-            response = self.llm.invoke(messages)
+        except Exception as e:
+            logger.error(f"Error in conversationalist node: {e}")
+            state["response"] = "I'm here to help! How can I assist you today?"
+        
+        return state
+    
+    async def conversationalist_node_async(self, state: dict) -> dict:
+        """Async variant of conversationalist_node (non-blocking LLM call)"""
+        logger.info("Conversationalist handling small talk")
+        
+        # Fused mode: the planner already wrote the reply
+        reply = self._fused_payload(state, "reply")
+        if reply:
+            state["response"] = reply
+            logger.info("Conversationalist using fused planner reply")
+            return state
+        
+        try:
+            response = await self._ainvoke_llm(state, "conversationalist", self._conversationalist_messages(state), final=True)
             state["response"] = response.content
             
             logger.info("Conversationalist response generated")
@@ -293,6 +491,151 @@ If the user asks about tasks or productivity, gently let them know you can help
     # KNOWLEDGE RETRIEVER NODE (DATA QUERY)
     # =========================================================================
     
+    def _query_dates(self) -> Dict[str, Any]:
+        """Current date and helper dates (Sri Lanka timezone), cached for the day"""
+        return prompt_registry.dates()
+    
+    def _analysis_instructions(self, dates: Dict[str, Any]) -> str:
+        """Query analysis instructions shared by the retriever and the fused planner"""
+        return prompt_registry.analysis_instructions(dates)
+    
+    def _analysis_prompt(self, state: dict, dates: Dict[str, Any]) -> str:
+        """Phase 1 prompt: analyze the user query and extract parameters"""
+        return prompt_registry.analysis_prompt(state['user_message'], dates)
+    
+    def _parse_json_content(self, content: str) -> Dict[str, Any]:
+        """Parse an LLM JSON response (tolerates markdown code fences)"""
+        # Try to extract JSON from the response
+        response_content = content.strip()
+        
+        # Remove markdown code blocks if present
+        if response_content.startswith("```"):
+            response_content = response_content.split("```")[1]
+            if response_content.startswith("json"):
+                response_content = response_content[4:]
+            response_content = response_content.strip()
+        
+        return json.loads(response_content)
+    
+    def _parse_query_params(self, content: str) -> Dict[str, Any]:
+        """Parse the query analysis JSON"""
+        query_params = self._parse_json_content(content)
+        
+        logger.info(f"Query analysis: {json.dumps(query_params, indent=2)}")
+        return query_params
+    
+    def _fetch_query_data(self, state: dict, query_params: Dict[str, Any]) -> Any:
+        """
+        Phase 2: Execute the database query described by query_params.
+        Blocking (Firestore) - async callers run it in a worker thread.
+        """
+        retrieved_data = None
+        query_type = query_params.get("query_type")
+        
+        if query_type == "tasks":
+            # Extract filter parameters
+            date_range = query_params.get("date_range", {})
+            filters = query_params.get("filters", {})
+            
+            start_date = date_range.get("start_date")
+            end_date = date_range.get("end_date")
+            completed = filters.get("completed")
+            importance = filters.get("importance")
+            task_list = filters.get("list")
+            priority = filters.get("priority")
+            
+            # Log the query parameters
+            logger.info(f"Querying tasks with params - start_date: {start_date}, end_date: {end_date}, "
+                       f"completed: {completed}, importance: {importance}, list: {task_list}, priority: {priority}")
+            
+            retrieved_data = firestore_service.query_tasks(
+                uid=state["user_id"],
+                start_date=start_date,
+                end_date=end_date,
+                completed=completed,
+                importance=importance,
+                task_list=task_list,
+                priority=priority
+            )
+            
+            logger.info(f"Retrieved {len(retrieved_data)} tasks from Firestore")
+            
+            # Log sample task if available for debugging
+            if retrieved_data and len(retrieved_data) > 0:
+                logger.info(f"Sample task: {json.dumps(retrieved_data[0], indent=2, default=str)}")
+            
+        elif query_type == "timer_stats":
+            retrieved_data = firestore_service.get_pomodoro_stats(state["user_id"])
+            logger.info(f"Retrieved pomodoro stats: {retrieved_data}")
+            
+        elif query_type == "quizzes":
+            # Answers use the summary fields only; selectedAnswers is never read
+            retrieved_data = firestore_service.get_quiz_results(state["user_id"], summary=True)
+            logger.info(f"Retrieved {len(retrieved_data)} quiz results")
+        
+        return retrieved_data
+    
+    async def _afetch_query_data(self, state: dict, query_params: Dict[str, Any]) -> Any:
+        """
+        Async variant of _fetch_query_data (awaits the async Firestore service).
+        Reads started by the request prefetch are awaited first, so the query
+        is answered from the caches they filled instead of a second read.
+        """
+        retrieved_data = None
+        query_type = query_params.get("query_type")
+        prefetch = prefetch_for(state)
+        
+        if prefetch and query_type == "tasks":
+            await prefetch.wait("tasks")
+        elif prefetch and query_type == "timer_stats":
+            await prefetch.wait("profile")
+        
+        if query_type == "tasks":
+            date_range = query_params.get("date_range", {})
+            filters = query_params.get("filters", {})
+            
+            retrieved_data = await async_firestore_service.query_tasks(
+                uid=state["user_id"],
+                start_date=date_range.get("start_date"),
+                end_date=date_range.get("end_date"),
+                completed=filters.get("completed"),
+                importance=filters.get("importance"),
+                task_list=filters.get("list"),
+                priority=filters.get("priority")
+            )
+            logger.info(f"Retrieved {len(retrieved_data)} tasks from Firestore")
+            
+        elif query_type == "timer_stats":
+            retrieved_data = await async_firestore_service.get_pomodoro_stats(state["user_id"])
+            logger.info(f"Retrieved pomodoro stats: {retrieved_data}")
+            
+        elif query_type == "quizzes":
+            retrieved_data = await async_firestore_service.get_quiz_results(state["user_id"], summary=True)
+            logger.info(f"Retrieved {len(retrieved_data)} quiz results")
+        
+        return retrieved_data
+    
+    def _answer_prompt(
+        self,
+        state: dict,
+        dates: Dict[str, Any],
+        query_params: Dict[str, Any],
+        retrieved_data: Any
+    ) -> str:
+        """Phase 3 prompt: turn the retrieved data into a natural language answer"""
+        query_type = query_params.get("query_type")
+        
+        # Dense, token-budgeted rendering instead of indented JSON
+        compacted = compact_retrieved_data(query_type, retrieved_data)
+        RETRIEVAL_PROMPT_TOKENS.inc(compacted["tokens"], query_type=query_type or "none", kind="rendered")
+        RETRIEVAL_PROMPT_TOKENS.inc(compacted["tokens_saved"], query_type=query_type or "none", kind="saved")
+        logger.info(
+            f"Retrieved data rendered: {compacted['rows_shown']}/{compacted['rows_total']} rows, "
+            f"~{compacted['tokens']} tokens (~{compacted['tokens_saved']} saved)"
+        )
+        
+        return prompt_registry.answer_prompt(state['user_message'], compacted["text"], dates)
+    
     def knowledge_retriever_node(self, state: dict) -> dict:
         """
         Knowledge Retriever Node: Handles data query requests
@@ -300,235 +643,92 @@ If the user asks about tasks or productivity, gently let them know you can help
         """
         logger.info("Knowledge retriever processing data query")
         
-        # Get current date in Sri Lanka timezone
-        sri_lanka_tz = pytz.timezone('Asia/Colombo')
-        current_date = datetime.now(sri_lanka_tz)
-        current_date_str = current_date.strftime("%Y-%m-%d")
-        
-        # Calculate helper dates
-        from datetime import timedelta
-        tomorrow = current_date + timedelta(days=1)
-        tomorrow_str = tomorrow.strftime("%Y-%m-%d")
-        
-        yesterday = current_date - timedelta(days=1)
-        yesterday_str = yesterday.strftime("%Y-%m-%d")
-        
-        # Week calculations
-        week_start = current_date - timedelta(days=current_date.weekday())
-        week_end = week_start + timedelta(days=6)
-        week_start_str = week_start.strftime("%Y-%m-%d")
-        week_end_str = week_end.strftime("%Y-%m-%d")
-        
-        # Phase 1: Analyze user query and extract parameters
-        analysis_prompt = f"""You are a query analyzer for a student task management system.
-Current date (Sri Lanka time): {current_date_str} ({current_date.strftime("%A, %B %d, %Y")})
-Tomorrow: {tomorrow_str}
-Yesterday: {yesterday_str}
-This week: {week_start_str} to {week_end_str}
-
-Your job is to analyze the user's question and extract query parameters.
-
-Query types:
-- "tasks" - Questions about tasks (e.g., "Show my tasks", "What's due this week?", "overdue tasks")
-- "timer_stats" - Questions about pomodoro/study time (e.g., "How many pomodoros?", "Study time?")
-- "quizzes" - Questions about quiz results (e.g., "My quiz scores", "How did I do on quizzes?")
-
-Date range calculations (USE THESE EXACT VALUES):
-- "today" -> start_date: "{current_date_str}", end_date: "{current_date_str}"
-- "tomorrow" -> start_date: "{tomorrow_str}", end_date: "{tomorrow_str}"
-- "yesterday" -> start_date: "{yesterday_str}", end_date: "{yesterday_str}"
-- "this week" -> start_date: "{week_start_str}", end_date: "{week_end_str}"
-- "overdue" or "past due" -> start_date: null, end_date: "{yesterday_str}"
-- No date mentioned -> start_date: null, end_date: null (all tasks)
-
-Task filters:
-- completed: true (for completed tasks), false (for pending/incomplete tasks), null (all tasks)
-- importance: true (important only), false (not important), null (all tasks)
-- list: "Personal"/"Work"/"Study"/null (null = all lists)
-- priority: "low"/"medium"/"high"/null (null = all priorities)
-
-IMPORTANT RULES:
-1. For "overdue tasks" questions: set end_date to yesterday ({yesterday_str}) and completed to false
-2. For "tomorrow" questions: set BOTH start_date AND end_date to {tomorrow_str}
-3. For "pending" or "incomplete" tasks: set completed to false
-4. For "completed" tasks: set completed to true
-5. If no completion status mentioned: set completed to null (shows all tasks)
-
-Respond with ONLY a JSON object:
-{{
-    "query_type": "tasks" or "timer_stats" or "quizzes",
-    "date_range": {{
-        "start_date": "YYYY-MM-DD or null",
-        "end_date": "YYYY-MM-DD or null"
-    }},
-    "filters": {{
-        "completed": true/false/null,
-        "importance": true/false/null,
-        "list": "Personal"/"Work"/"Study"/null,
-        "priority": "low"/"medium"/"high"/null
-    }},
-    "reasoning": "brief explanation of your analysis"
-}}
-
-Examples:
-
-User: "What are the tasks I have to do tomorrow?"
-Response:
-{{
-    "query_type": "tasks",
-    "date_range": {{
-        "start_date": "{tomorrow_str}",
-        "end_date": "{tomorrow_str}"
-    }},
-    "filters": {{
-        "completed": null,
-        "importance": null,
-        "list": null,
-        "priority": null
-    }},
-    "reasoning": "User wants all tasks due tomorrow"
-}}
-
-User: "What are the overdue tasks I had?"
-Response:
-{{
-    "query_type": "tasks",
-    "date_range": {{
-        "start_date": null,
-        "end_date": "{yesterday_str}"
-    }},
-    "filters": {{
-        "completed": false,
-        "importance": null,
-        "list": null,
-        "priority": null
-    }},
-    "reasoning": "User wants incomplete tasks with due dates before today"
-}}
-
-User: "Show me my pending tasks"
-Response:
-{{
-    "query_type": "tasks",
-    "date_range": {{
-        "start_date": null,
-        "end_date": null
-    }},
-    "filters": {{
-        "completed": false,
-        "importance": null,
-        "list": null,
-        "priority": null
-    }},
-    "reasoning": "User wants all incomplete tasks"
-}}
-
-User: "How many pomodoros did I complete?"
-Response:
-{{
-    "query_type": "timer_stats",
-    "date_range": {{
-        "start_date": null,
-        "end_date": null
-    }},
-    "filters": {{}},
-    "reasoning": "User asking for pomodoro statistics"
-}}
-
-User message: {state['user_message']}"""
+        dates = self._query_dates()
         
         try:
-            # Step 1: Analyze query
-            messages = [HumanMessage(content=analysis_prompt)]
-            analysis_response = self.llm.invoke(messages)
+            # Step 1: Analyze query (fused mode: reuse the planner's query parameters)
+            query_params = self._fused_payload(state, "query")
+            if not isinstance(query_params, dict) or not query_params.get("query_type"):
+                messages = [HumanMessage(content=self._analysis_prompt(state, dates))]
+                analysis_response = self._invoke_llm(state, "knowledge_retriever", messages)
+                query_params = self._parse_query_params(analysis_response.content)
             
-            # Try to extract JSON from the response
-            response_content = analysis_response.content.strip()
+            # Step 2: Execute database query based on query_type
+            retrieved_data = self._fetch_query_data(state, query_params)
             
-            # Remove markdown code blocks if present
-            if response_content.startswith("```"):
-                response_content = response_content.split("```")[1]
-                if response_content.startswith("json"):
-                    response_content = response_content[4:]
-                response_content = response_content.strip()
+            # Step 3: Answer from a template when the data speaks for itself,
+            # otherwise generate a natural language response
+            query_type = query_params.get("query_type") or "none"
+            templated = render_templated_answer(
+                state["user_message"], query_params, retrieved_data, dates, ROW_LIMITS.get(query_type)
+            )
+            if templated is not None:
+                DATA_ANSWERS.inc(query_type=query_type, path="template")
+                state["response"] = templated
+                logger.info("Knowledge retriever answered from template")
+                return state
             
-            query_params = json.loads(response_content)
+            messages = [HumanMessage(content=self._answer_prompt(state, dates, query_params, retrieved_data))]
+            answer_response = self._invoke_llm(state, "knowledge_retriever", messages, final=True)
+            DATA_ANSWERS.inc(query_type=query_type, path="llm")
             
-            logger.info(f"Query analysis: {json.dumps(query_params, indent=2)}")
+            state["response"] = answer_response.content
+            logger.info("Knowledge retriever response generated")
             
-            # Step 2: Execute database query based on query_type
-            retrieved_data = None
-            query_type = query_params.get("query_type")
+        except json.JSONDecodeError as e:
+            JSON_PARSE_FAILURES.inc(node="knowledge_retriever")
+            logger.error(f"Failed to parse LLM response: {e}")
+            logger.error(f"Raw LLM response: {analysis_response.content if 'analysis_response' in locals() else 'N/A'}")
+            state["response"] = "I'd be happy to help you find that information. Could you rephrase your question?"
             
-            if query_type == "tasks":
-                # Extract filter parameters
-                date_range = query_params.get("date_range", {})
-                filters = query_params.get("filters", {})
-                
-                start_date = date_range.get("start_date")
-                end_date = date_range.get("end_date")
-                completed = filters.get("completed")
-                importance = filters.get("importance")
-                task_list = filters.get("list")
-                priority = filters.get("priority")
-                
-                # Log the query parameters
-                logger.info(f"Querying tasks with params - start_date: {start_date}, end_date: {end_date}, "
-                           f"completed: {completed}, importance: {importance}, list: {task_list}, priority: {priority}")
-                
-                retrieved_data = firestore_service.query_tasks(
-                    uid=state["user_id"],
-                    start_date=start_date,
-                    end_date=end_date,
-                    completed=completed,
-                    importance=importance,
-                    task_list=task_list,
-                    priority=priority
-                )
-                
-                logger.info(f"Retrieved {len(retrieved_data)} tasks from Firestore")
-                
-                # Log sample task if available for debugging
-                if retrieved_data and len(retrieved_data) > 0:
-                    logger.info(f"Sample task: {json.dumps(retrieved_data[0], indent=2, default=str)}")
-                
-            elif query_type == "timer_stats":
-                retrieved_data = firestore_service.get_pomodoro_stats(state["user_id"])
-                logger.info(f"Retrieved pomodoro stats: {retrieved_data}")
-                
-            elif query_type == "quizzes":
-                retrieved_data = firestore_service.get_quiz_results(state["user_id"])
-                logger.info(f"Retrieved {len(retrieved_data)} quiz results")
+        except Exception as e:
+            logger.error(f"Error in knowledge retriever node: {e}", exc_info=True)
+            state["response"] = "I'm having trouble retrieving that information right now. Please try again."
+            state["error"] = str(e)
+        
+        return state
+    
+    async def knowledge_retriever_node_async(self, state: dict) -> dict:
+        """
+        Async variant of knowledge_retriever_node.
+        LLM calls use ainvoke; the Firestore query uses the async client.
+        """
+        logger.info("Knowledge retriever processing data query")
+        
+        dates = self._query_dates()
+        
+        try:
+            # Step 1: Analyze query (fused mode: reuse the planner's query parameters)
+            query_params = self._fused_payload(state, "query")
+            if not isinstance(query_params, dict) or not query_params.get("query_type"):
+                messages = [HumanMessage(content=self._analysis_prompt(state, dates))]
+                analysis_response = await self._ainvoke_llm(state, "knowledge_retriever", messages)
+                query_params = self._parse_query_params(analysis_response.content)
             
-            # Step 3: Generate natural language response
-            answer_prompt = f"""You are a helpful AI assistant for a student task management system.
-Current date: {current_date_str}
-
-The user asked: "{state['user_message']}"
-
-Retrieved data from database:
-{json.dumps(retrieved_data, indent=2, default=str)}
-
-Generate a friendly, conversational response that answers the user's question based on the retrieved data.
-
-Guidelines:
-- Be natural and conversational
-- If data is found, present it clearly with bullet points or numbering
-- Show task descriptions, due dates, priority, and completion status
-- If NO data found (empty list or no results), acknowledge it briefly but positively
-- For pomodoro stats, convert presentTime (seconds) to hours/minutes if needed
-- Keep response concise but informative (3-8 sentences)
-- DO NOT make up information - only use the retrieved data
-
-Response:"""
+            # Step 2: Execute database query (awaited, no worker thread)
+            retrieved_data = await self._afetch_query_data(state, query_params)
+            
+            # Step 3: Answer from a template when the data speaks for itself,
+            # otherwise generate a natural language response
+            query_type = query_params.get("query_type") or "none"
+            templated = render_templated_answer(
+                state["user_message"], query_params, retrieved_data, dates, ROW_LIMITS.get(query_type)
+            )
+            if templated is not None:
+                DATA_ANSWERS.inc(query_type=query_type, path="template")
+                state["response"] = templated
+                logger.info("Knowledge retriever answered from template")
+                return state
             
-            messages = [HumanMessage(content=answer_prompt)]
-            answer_response = self.llm.invoke(messages)
+            messages = [HumanMessage(content=self._answer_prompt(state, dates, query_params, retrieved_data))]
+            answer_response = await self._ainvoke_llm(state, "knowledge_retriever", messages, final=True)
+            DATA_ANSWERS.inc(query_type=query_type, path="llm")
             
             state["response"] = answer_response.content
             logger.info("Knowledge retriever response generated")
             
         except json.JSONDecodeError as e:
+            JSON_PARSE_FAILURES.inc(node="knowledge_retriever")
             logger.error(f"Failed to parse LLM response: {e}")
             logger.error(f"Raw LLM response: {analysis_response.content if 'analysis_response' in locals() else 'N/A'}")
             state["response"] = "I'd be happy to help you find that information. Could you rephrase your question?"
@@ -544,6 +744,169 @@ Response:"""
     # TASK EXTRACTOR NODE (EXECUTOR)
     # =========================================================================
     
+    def _task_extractor_system_prompt(self, state: dict) -> str:
+        """Task extraction instructions with today's date and active pending tasks"""
+        return prompt_registry.task_extractor_system_prompt(state.get("pending_tasks"))
+    
+    def _conversation_context_messages(self, state: dict) -> list:
+        """Recent conversation history as a single context message (if any)"""
+        context = "Conversation history:\n"
+        for msg in state.get("conversation_history", [])[-8:]:
+            role = "User" if msg["role"] == "user" else "Assistant"
+            context += f"{role}: {msg['content']}\n"
+        
+        if context != "Conversation history:\n":
+            return [HumanMessage(content=context)]
+        return []
+    
+    def _task_extractor_messages(self, state: dict) -> list:
+        """Build the task extraction prompt with pending tasks and conversation history"""
+        # Build conversation context
+        messages = [SystemMessage(content=self._task_extractor_system_prompt(state))]
+        
+        # Add conversation history
+        messages.extend(self._conversation_context_messages(state))
+        
+        # Add current message
+        messages.append(HumanMessage(content=f"Current message: {state['user_message']}"))
+        
+        return messages
+    
+    def _apply_extraction_result(self, state: dict, content: str) -> dict:
+        """Parse the extractor's raw JSON output and apply it to the state"""
+        try:
+            result = json.loads(content)
+        except json.JSONDecodeError as e:
+            JSON_PARSE_FAILURES.inc(node="task_extractor")
+            logger.error(f"Failed to parse LLM response: {e}")
+            state["response"] = "I understand you want to create a task. Could you tell me what you need to do and when you'd like to complete it?"
+            state["needs_follow_up"] = True
+            return state
+        
+        return self._apply_extraction(state, result)
+    
+    def _apply_extraction(self, state: dict, result: Dict[str, Any]) -> dict:
+        """
+        Validate extraction output into tasks, pending tasks and
+        HITL confirmations on the state
+        """
+        # Validate and process tasks
+        valid_tasks = []
+        for task in result.get("tasks", []):
+            # CRITICAL: Must have both description and dueDate
+            if task.get("description") and task.get("dueDate"):
+                # Parse and validate dueDate
+                raw_due_date = task.get("dueDate")
+                parsed_due_date = parse_natural_date(raw_due_date)
+                
+                # If date parsing failed, skip this task and ask for clarification
+                if not parsed_due_date:
+                    logger.warning(f"Could not parse date '{raw_due_date}', skipping task")
+                    continue
+                
+                # Clean and validate list field
+                task_list_raw = task.get("list", "Personal")
+                # If LLM returned pipe-delimited string, take first value
+                if isinstance(task_list_raw, str) and "|" in task_list_raw:
+                    task_list_raw = task_list_raw.split("|")[0].strip()
+                # Validate against TaskList enum
+                try:
+                    task_list = TaskList(task_list_raw)
+                except ValueError:
+                    logger.warning(f"Invalid task list '{task_list_raw}', defaulting to 'Personal'")
+                    task_list = TaskList.Personal
+                
+                # Clean and validate priority field
+                task_priority_raw = task.get("priority", "medium")
+                if isinstance(task_priority_raw, str) and "|" in task_priority_raw:
+                    task_priority_raw = task_priority_raw.split("|")[0].strip()
+                try:
+                    task_priority = TaskPriority(task_priority_raw)
+                except ValueError:
+                    logger.warning(f"Invalid priority '{task_priority_raw}', defaulting to 'medium'")
+                    task_priority = TaskPriority.medium
+                
+                task_obj = TaskData(
+                    description=task["description"],
+                    list=task_list,
+                    dueDate=parsed_due_date,  # Use parsed date instead of raw
+                    subTasks=task.get("subTasks"),
+                    priority=task_priority,
+                    importance=task.get("importance", False)
+                )
+                valid_tasks.append(task_obj)
+                
+                # Create confirmation object for HITL
+                confirmation = TaskConfirmation(
+                    taskId=str(uuid.uuid4()),
+                    task=task_obj,
+                    status="pending"
+                )
+                if "task_confirmations" not in state:
+                    state["task_confirmations"] = []
+                state["task_confirmations"].append(confirmation)
+                # Kept server-side so /api/task/confirm can commit it by taskId
+                confirmation_store.put(state["user_id"], state["session_id"], confirmation)
+            else:
+                logger.warning("Task missing required fields, skipping")
+        
+        # Process pending tasks
+        valid_pending = []
+        for pending in result.get("pendingTasks", []):
+            # Parse dueDate if present (might be in natural language)
+            pending_due_date = None
+            if pending.get("dueDate"):
+                parsed_date = parse_natural_date(pending["dueDate"])
+                if parsed_date:
+                    pending_due_date = parsed_date
+                else:
+                    # Keep original if parsing fails
+                    pending_due_date = pending["dueDate"]
+            
+            # Clean and validate list field if present
+            pending_list = None
+            if pending.get("list"):
+                pending_list_raw = pending["list"]
+                if isinstance(pending_list_raw, str) and "|" in pending_list_raw:
+                    pending_list_raw = pending_list_raw.split("|")[0].strip()
+                try:
+                    pending_list = TaskList(pending_list_raw)
+                except ValueError:
+                    logger.warning(f"Invalid pending task list '{pending_list_raw}', setting to None")
+                    pending_list = None
+            
+            # Clean and validate priority field if present
+            pending_priority = None
+            if pending.get("priority"):
+                pending_priority_raw = pending["priority"]
+                if isinstance(pending_priority_raw, str) and "|" in pending_priority_raw:
+                    pending_priority_raw = pending_priority_raw.split("|")[0].strip()
+                try:
+                    pending_priority = TaskPriority(pending_priority_raw)
+                except ValueError:
+                    logger.warning(f"Invalid pending priority '{pending_priority_raw}', setting to None")
+                    pending_priority = None
+            
+            pending_obj = PendingTask(
+                description=pending.get("description"),
+                list=pending_list,
+                dueDate=pending_due_date,
+                subTasks=pending.get("subTasks"),
+                priority=pending_priority,
+                missingFields=pending.get("missingFields", [])
+            )
+            valid_pending.append(pending_obj)
+        
+        state["extracted_tasks"] = valid_tasks
+        state["pending_tasks"] = valid_pending
+        state["response"] = result.get("response", "I understand. How can I help you organize your tasks?")
+        state["needs_follow_up"] = result.get("needsFollowUp", False)
+        state["follow_up_question"] = result.get("followUpQuestion")
+        
+        logger.info(f"Extracted {len(valid_tasks)} complete tasks, {len(valid_pending)} pending tasks")
+        
+        return state
+    
     def task_extractor_node(self, state: dict) -> dict:
         """
         Task Extractor Node: Handles task-related operations
@@ -551,420 +914,38 @@ Response:"""
         """
         logger.info("Task extractor processing request")
         
-        # Get current date in Sri Lanka timezone
-        sri_lanka_tz = pytz.timezone('Asia/Colombo')
-        current_date = datetime.now(sri_lanka_tz).strftime("%Y-%m-%d")
-        
-        # Check if there are pending tasks from previous interactions
-        pending_tasks_context = ""
-        if state.get("pending_tasks"):
-            pending_tasks_context = "\n\n**IMPORTANT - ACTIVE PENDING TASKS:**\n"
-            pending_tasks_context += "You have the following incomplete tasks that need missing information:\n\n"
-            for idx, pending in enumerate(state["pending_tasks"], 1):
-                pending_tasks_context += f"{idx}. Task: {pending.get('description', 'Unknown')}\n"
-                if pending.get('list'):
-                    pending_tasks_context += f"   - List: {pending['list']}\n"
-                if pending.get('dueDate'):
-                    pending_tasks_context += f"   - Due Date: {pending['dueDate']}\n"
-                if pending.get('priority'):
-                    pending_tasks_context += f"   - Priority: {pending['priority']}\n"
-                pending_tasks_context += f"   - Missing: {', '.join(pending.get('missingFields', []))}\n\n"
+        try:
+            # Fused mode: the planner already produced the extraction JSON
+            extraction = self._fused_payload(state, "extraction")
+            if isinstance(extraction, dict):
+                self._apply_extraction(state, extraction)
+            else:
+                response = self._invoke_llm(state, "task_extractor", self._task_extractor_messages(state))
+                self._apply_extraction_result(state, response.content)
             
-            pending_tasks_context += "**YOUR IMMEDIATE GOAL**: If the user's current message provides the missing information for any of these pending tasks, complete them by moving them to the 'tasks' array with all required fields filled. DO NOT ask for information that was already provided in these pending tasks!\n"
+        except Exception as e:
+            logger.error(f"Error in task extractor node: {e}")
+            state["response"] = "I'm having trouble processing that. Could you rephrase what you'd like to accomplish?"
+            state["error"] = str(e)
         
-        system_prompt = f"""You are an AI task management assistant that helps users organize their work.
-
-Today's date (Sri Lanka time): {current_date}
-{pending_tasks_context}
-
-Your responsibilities:
-1. Extract actionable tasks from user messages
-2. Ask follow-up questions when REQUIRED information is missing
-3. A task is COMPLETE only when it has BOTH description AND dueDate
-4. Never create tasks for casual statements
-
-CRITICAL RULES:
-- **REQUIRED FIELDS**: description AND dueDate
-- If EITHER is missing → create a pendingTask and ask for missing info
-- Keep asking until you have both pieces of information
-- **OPTIONAL FIELDS**: list (default: "Personal"), priority (default: "medium")
-- **IMPORTANT**: "list" must be EXACTLY ONE of: Personal, Work, or Study (choose one, not "Personal|Work|Study")
-  - Use "Study" for academic/school/learning tasks
-  - Use "Work" for professional/job tasks
-  - Use "Personal" for everything else
-- **IMPORTANT**: "dueDate" - if user mentions ANY time reference (today, tomorrow, next Friday, in 3 days, etc.), include it in dueDate:
-  - Extract date references like: "today", "tomorrow", "next Friday", "November 29", "in 3 days", etc.
-  - DO NOT ask "When is next Friday?" if user already said "next Friday" - that IS the date information!
-  - Put the date reference in dueDate field (e.g., "next Friday", "tomorrow", "November 29")
-  - The system will automatically convert it to YYYY-MM-DD format
-  - ONLY mark dueDate as missing if user provides NO time reference at all
-- **IMPORTANT**: NO TIME needed. When asking for dates, ask "When?" not "What time?"
-- **PRIORITY INFERENCE**: 
-  - Use "high" for urgent tasks (words like: urgent, ASAP, deadline, exam, due soon)
-  - Use "medium" for normal tasks (default)
-  - Use "low" for non-urgent tasks (words like: someday, eventually, when possible)
-- Use context from conversation history to complete tasks
-
-RESPONSE FORMAT - JSON ONLY:
-{{
-    "response": "Your conversational response",
-    "tasks": [
-        // ONLY include tasks with BOTH description AND dueDate
-        {{
-            "description": "Clear task description",
-            "list": "Study",
-            "dueDate": "YYYY-MM-DD (REQUIRED)",
-            "subTasks": ["subtask1", "subtask2"] or null,
-            "priority": "medium",
-            "importance": false
-        }}
-    ],
-    "pendingTasks": [
-        // Tasks missing description OR dueDate
-        {{
-            "description": "...",
-            "list": "...",
-            "dueDate": null,
-            "priority": "...",
-            "missingFields": ["dueDate"]
-        }}
-    ],
-    "needsFollowUp": boolean,
-    "followUpQuestion": "Question for missing information or null"
-}}
-
-EXAMPLES:
-
-User: "I need to study for math exam"
-Response:
-{{
-    "response": "I'll help you create a study task for your math exam. When is the exam or when would you like to complete studying?",
-    "tasks": [],
-    "pendingTasks": [
-        {{
-            "description": "Study for math exam",
-            "list": "Study",
-            "dueDate": null,
-            "priority": "high",
-            "missingFields": ["dueDate"]
-        }}
-    ],
-    "needsFollowUp": true,
-    "followUpQuestion": "When is your math exam scheduled?"
-}}
-
-User: "It's next Friday" (Context: pending task about math exam that was missing dueDate)
-Response:
-{{
-    "response": "Perfect! I've prepared a study task for your math exam on next Friday. Please confirm to add it to your list.",
-    "tasks": [
-        {{
-            "description": "Study for math exam",
-            "list": "Study",
-            "dueDate": "next Friday",
-            "subTasks": null,
-            "priority": "high",
-            "importance": false
-        }}
-    ],
-    "pendingTasks": [],
-    "needsFollowUp": false,
-    "followUpQuestion": null
-}}
-
-User: "November 29" (Context: pending task about project report that was missing dueDate)
-Response:
-{{
-    "response": "Got it! I've prepared a task to complete your project report by November 29. Please confirm to add it to your list.",
-    "tasks": [
-        {{
-            "description": "Complete project report",
-            "list": "Work",
-            "dueDate": "November 29",
-            "subTasks": null,
-            "priority": "medium",
-            "importance": false
-        }}
-    ],
-    "pendingTasks": [],
-    "needsFollowUp": false,
-    "followUpQuestion": null
-}}
-
-User: "Submit report by tomorrow"
-Response:
-{{
-    "response": "I've prepared a task to submit your report tomorrow. Please confirm to add it to your list.",
-    "tasks": [
-        {{
-            "description": "Submit report",
-            "list": "Work",
-            "dueDate": "2025-11-27",
-            "subTasks": null,
-            "priority": "high",
-            "importance": false
-        }}
-    ],
-    "pendingTasks": [],
-    "needsFollowUp": false,
-    "followUpQuestion": null
-}}
-
-User: "I want to complete the programming assignment today"
-Response:
-{{
-    "response": "I've prepared a task to complete the programming assignment today. Please confirm to add it to your list.",
-    "tasks": [
-        {{
-            "description": "Complete the programming assignment",
-            "list": "Study",
-            "dueDate": "2025-11-26",
-            "subTasks": null,
-            "priority": "medium",
-            "importance": false
-        }}
-    ],
-    "pendingTasks": [],
-    "needsFollowUp": false,
-    "followUpQuestion": null
-}}
-
-User: "Create a task to learn graph neural network by tomorrow"
-Response:
-{{
-    "response": "I've prepared a task to learn graph neural network by tomorrow. Please confirm to add it to your list.",
-    "tasks": [
-        {{
-            "description": "Learn graph neural network",
-            "list": "Study",
-            "dueDate": "2025-11-27",
-            "subTasks": null,
-            "priority": "medium",
-            "importance": false
-        }}
-    ],
-    "pendingTasks": [],
-    "needsFollowUp": false,
-    "followUpQuestion": null
-}}
-
-User: "Finish the project report by November 29"
-Response:
-{{
-    "response": "I've prepared a task to finish the project report by November 29. Please confirm to add it to your list.",
-    "tasks": [
-        {{
-            "description": "Finish the project report",
-            "list": "Work",
-            "dueDate": "2025-11-29",
-            "subTasks": null,
-            "priority": "medium",
-            "importance": false
-        }}
-    ],
-    "pendingTasks": [],
-    "needsFollowUp": false,
-    "followUpQuestion": null
-}}
-
-User: "I want to complete my intern report by next Friday"
-Response:
-{{
-    "response": "I've prepared a task to complete your intern report by next Friday. Please confirm to add it to your list.",
-    "tasks": [
-        {{
-            "description": "Complete intern report",
-            "list": "Work",
-            "dueDate": "next Friday",
-            "subTasks": null,
-            "priority": "medium",
-            "importance": false
-        }}
-    ],
-    "pendingTasks": [],
-    "needsFollowUp": false,
-    "followUpQuestion": null
-}}
-
-User: "Prepare for the meeting in 3 days"
-Response:
-{{
-    "response": "I've prepared a task to prepare for the meeting in 3 days. Please confirm to add it to your list.",
-    "tasks": [
-        {{
-            "description": "Prepare for the meeting",
-            "list": "Work",
-            "dueDate": "in 3 days",
-            "subTasks": null,
-            "priority": "medium",
-            "importance": false
-        }}
-    ],
-    "pendingTasks": [],
-    "needsFollowUp": false,
-    "followUpQuestion": null
-}}
-
-Remember:
-- **HANDLING PENDING TASKS**: If there are active pending tasks (shown above), check if the user's message provides missing information:
-  - If user provides a date/time → complete the pending task by filling dueDate and moving it to "tasks" array
-  - If user provides task description → complete the pending task by filling description and moving it to "tasks" array
-  - Keep all other fields (list, priority, etc.) from the pending task
-  - Clear the pending task from "pendingTasks" array once completed
-  - DO NOT ask for information that's already in the pending task object!
-- NEVER add incomplete tasks to "tasks" array
-- ALWAYS use "pendingTasks" for missing information
-- **CRITICAL**: If user mentions ANY date reference (today, tomorrow, next Friday, in 3 days, November 29, etc.), that IS valid date information!
-- **CRITICAL**: Extract the date phrase exactly as user said it and put it in dueDate field (e.g., "next Friday", "tomorrow", "in 3 days")
-- **DO NOT** ask "When is next Friday?" - if user said "next Friday", that's already date information! Just extract it!
-- **DO NOT** ask for clarification on dates like "tomorrow", "next week", "in 5 days" - these are valid date references!
-- Only mark dueDate as missing/null if user provides absolutely NO date or time reference at all
-- The system automatically converts natural language dates to YYYY-MM-DD format
-- Infer "list" based on task context: Study (academic), Work (professional), Personal (other)
-- Infer "priority" based on urgency indicators in the text
-- Reference conversation history for context
-- Be conversational and helpful"""
+        return state
+    
+    async def task_extractor_node_async(self, state: dict) -> dict:
+        """
+        Async variant of task_extractor_node.
+        Date parsing in the validation step is CPU-bound, so it runs in a worker thread.
+        """
+        logger.info("Task extractor processing request")
         
         try:
-            # Build conversation context
-            messages = [SystemMessage(content=system_prompt)]
-            
-            # Add conversation history
-            context = "Conversation history:\n"
-            for msg in state.get("conversation_history", [])[-8:]:
-                role = "User" if msg["role"] == "user" else "Assistant"
-                context += f"{role}: {msg['content']}\n"
-            
-            if context != "Conversation history:\n":
-                messages.append(HumanMessage(content=context))
-            
-            # Add current message
-            messages.append(HumanMessage(content=f"Current message: {state['user_message']}"))
-            
-            response = self.llm.invoke(messages)
+            # Fused mode: the planner already produced the extraction JSON
+            extraction = self._fused_payload(state, "extraction")
+            if isinstance(extraction, dict):
+                await asyncio.to_thread(self._apply_extraction, state, extraction)
+            else:
+                response = await self._ainvoke_llm(state, "task_extractor", self._task_extractor_messages(state))
+                await asyncio.to_thread(self._apply_extraction_result, state, response.content)
             
-            # Parse JSON response
-            try:
-                result = json.loads(response.content)
-                
-                # Validate and process tasks
-                valid_tasks = []
-                for task in result.get("tasks", []):
-                    # CRITICAL: Must have both description and dueDate
-                    if task.get("description") and task.get("dueDate"):
-                        # Parse and validate dueDate
-                        raw_due_date = task.get("dueDate")
-                        parsed_due_date = parse_natural_date(raw_due_date)
-                        
-                        # If date parsing failed, skip this task and ask for clarification
-                        if not parsed_due_date:
-                            logger.warning(f"Could not parse date '{raw_due_date}', skipping task")
-                            continue
-                        
-                        # Clean and validate list field
-                        task_list_raw = task.get("list", "Personal")
-                        # If LLM returned pipe-delimited string, take first value
-                        if isinstance(task_list_raw, str) and "|" in task_list_raw:
-                            task_list_raw = task_list_raw.split("|")[0].strip()
-                        # Validate against TaskList enum
-                        try:
-                            task_list = TaskList(task_list_raw)
-                        except ValueError:
-                            logger.warning(f"Invalid task list '{task_list_raw}', defaulting to 'Personal'")
-                            task_list = TaskList.Personal
-                        
-                        # Clean and validate priority field
-                        task_priority_raw = task.get("priority", "medium")
-                        if isinstance(task_priority_raw, str) and "|" in task_priority_raw:
-                            task_priority_raw = task_priority_raw.split("|")[0].strip()
-                        try:
-                            task_priority = TaskPriority(task_priority_raw)
-                        except ValueError:
-                            logger.warning(f"Invalid priority '{task_priority_raw}', defaulting to 'medium'")
-                            task_priority = TaskPriority.medium
-                        
-                        task_obj = TaskData(
-                            description=task["description"],
-                            list=task_list,
-                            dueDate=parsed_due_date,  # Use parsed date instead of raw
-                            subTasks=task.get("subTasks"),
-                            priority=task_priority,
-                            importance=task.get("importance", False)
-                        )
-                        valid_tasks.append(task_obj)
-                        
-                        # Create confirmation object for HITL
-                        confirmation = TaskConfirmation(
-                            taskId=str(uuid.uuid4()),
-                            task=task_obj,
-                            status="pending"
-                        )
-                        if "task_confirmations" not in state:
-                            state["task_confirmations"] = []
-                        state["task_confirmations"].append(confirmation)
-                    else:
-                        logger.warning("Task missing required fields, skipping")
-                
-                # Process pending tasks
-                valid_pending = []
-                for pending in result.get("pendingTasks", []):
-                    # Parse dueDate if present (might be in natural language)
-                    pending_due_date = None
-                    if pending.get("dueDate"):
-                        parsed_date = parse_natural_date(pending["dueDate"])
-                        if parsed_date:
-                            pending_due_date = parsed_date
-                        else:
-                            # Keep original if parsing fails
-                            pending_due_date = pending["dueDate"]
-                    
-                    # Clean and validate list field if present
-                    pending_list = None
-                    if pending.get("list"):
-                        pending_list_raw = pending["list"]
-                        if isinstance(pending_list_raw, str) and "|" in pending_list_raw:
-                            pending_list_raw = pending_list_raw.split("|")[0].strip()
-                        try:
-                            pending_list = TaskList(pending_list_raw)
-                        except ValueError:
-                            logger.warning(f"Invalid pending task list '{pending_list_raw}', setting to None")
-                            pending_list = None
-                    
-                    # Clean and validate priority field if present
-                    pending_priority = None
-                    if pending.get("priority"):
-                        pending_priority_raw = pending["priority"]
-                        if isinstance(pending_priority_raw, str) and "|" in pending_priority_raw:
-                            pending_priority_raw = pending_priority_raw.split("|")[0].strip()
-                        try:
-                            pending_priority = TaskPriority(pending_priority_raw)
-                        except ValueError:
-                            logger.warning(f"Invalid pending priority '{pending_priority_raw}', setting to None")
-                            pending_priority = None
-                    
-                    pending_obj = PendingTask(
-                        description=pending.get("description"),
-                        list=pending_list,
-                        dueDate=pending_due_date,
-                        subTasks=pending.get("subTasks"),
-                        priority=pending_priority,
-                        missingFields=pending.get("missingFields", [])
-                    )
-                    valid_pending.append(pending_obj)
-                
-                state["extracted_tasks"] = valid_tasks
-                state["pending_tasks"] = valid_pending
-                state["response"] = result.get("response", "I understand. How can I help you organize your tasks?")
-                state["needs_follow_up"] = result.get("needsFollowUp", False)
-                state["follow_up_question"] = result.get("followUpQuestion")
-                
-                logger.info(f"Extracted {len(valid_tasks)} complete tasks, {len(valid_pending)} pending tasks")
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse LLM response: {e}")
-                state["response"] = "I understand you want to create a task. Could you tell me what you need to do and when you'd like to complete it?"
-                state["needs_follow_up"] = True
-                
         except Exception as e:
             logger.error(f"Error in task extractor node: {e}")
             state["response"] = "I'm having trouble processing that. Could you rephrase what you'd like to accomplish?"
@@ -976,13 +957,121 @@ Remember:
     # MAIN EXECUTION
     # =========================================================================
     
+    def _session_config(self, user_id: str, session_id: str) -> Dict[str, Any]:
+        """Graph config selecting the session's checkpoint thread"""
+        # Scoped by user so a leaked sessionId cannot load someone else's conversation
+        return {"configurable": {"thread_id": f"{user_id}:{session_id}"}}
+    
+    def _session_context(
+        self,
+        previous: Dict[str, Any],
+        conversation_history: List[Dict[str, str]] = None,
+        pending_tasks: List[Dict[str, Any]] = None
+    ) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]]]:
+        """Conversation history and pending tasks for the next turn (see session_checkpointer.session_context)"""
+        return session_context(previous, conversation_history, pending_tasks)
+    
+    def _previous_state(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Last checkpointed state of the session ({} without checkpointing)"""
+        if getattr(self, "memory", None) is None:
+            return {}
+        values = self.graph.get_state(config).values
+        return values if isinstance(values, dict) else {}
+    
+    async def _previous_state_async(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """Async variant of _previous_state"""
+        if getattr(self, "memory", None) is None:
+            return {}
+        values = (await self.graph.aget_state(config)).values
+        return values if isinstance(values, dict) else {}
+    
+    def _initial_state(
+        self,
+        user_message: str,
+        user_id: str,
+        user_role: Optional[UserRole],
+        session_id: str = None,
+        conversation_history: List[Dict[str, str]] = None,
+        pending_tasks: List[Dict[str, Any]] = None,
+        bypass_cache: bool = False,
+        request_id: str = None,
+        streaming: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Create the initial graph state as a dictionary
+        
+        user_role is None on the async paths: the profile is read by the
+        request prefetch while the graph runs (no node reads the role).
+        streaming marks requests whose final answer is streamed over SSE.
+        """
+        return {
+            "request_id": request_id or uuid.uuid4().hex,
+            "user_message": user_message,
+            "user_id": user_id,
+            "user_role": user_role,
+            "session_id": session_id or str(uuid.uuid4()),
+            "conversation_history": conversation_history or [],
+            "intent": None,
+            "intent_source": None,
+            "fused_payload": None,
+            "extracted_tasks": [],
+            "pending_tasks": pending_tasks or [],  # From the client or the session checkpoint
+            "bypass_cache": bypass_cache,
+            "streaming": streaming,
+            "task_confirmations": [],
+            "response": "",
+            "needs_follow_up": False,
+            "follow_up_question": None,
+            "timestamp": datetime.now().isoformat(),
+            # One LLM budget shared by every node of this request
+            "deadline": llm_call_policy.new_deadline(),
+            "error": None
+        }
+    
+    def _format_result(self, final_state: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert the final graph state into the API response dictionary"""
+        # LangGraph returns a dictionary, not an AgentState object
+        # Access fields as dictionary keys
+        response = {
+            "response": final_state.get("response", "I'm here to help!"),
+            "tasks": [task.dict() if hasattr(task, 'dict') else task for task in final_state.get("extracted_tasks", [])],
+            "pendingTasks": [pt.dict() if hasattr(pt, 'dict') else pt for pt in final_state.get("pending_tasks", [])],
+            "taskConfirmations": [tc.dict() if hasattr(tc, 'dict') else tc for tc in final_state.get("task_confirmations", [])],
+            "needsFollowUp": final_state.get("needs_follow_up", False),
+            "followUpQuestion": final_state.get("follow_up_question"),
+            "sessionId": final_state.get("session_id"),
+            "intentType": final_state.get("intent")
+        }
+        
+        INTENT_TOTAL.inc(
+            intent=final_state.get("intent") or "none",
+            source=final_state.get("intent_source") or "none"
+        )
+        logger.info(f"Agent processing complete. Intent: {final_state.get('intent')}")
+        return response
+    
+    def _error_result(self, session_id: str, error: Exception) -> Dict[str, Any]:
+        """Fallback response when the workflow fails"""
+        logger.error(f"Error processing message: {error}")
+        return {
+            "response": "I apologize, I'm having trouble processing that right now. Please try again.",
+            "tasks": [],
+            "pendingTasks": [],
+            "taskConfirmations": [],
+            "needsFollowUp": False,
+            "followUpQuestion": None,
+            "sessionId": session_id or str(uuid.uuid4()),
+            "error": str(error)
+        }
+    
     def process_message(
         self,
         user_message: str,
         user_id: str,
         session_id: str = None,
         conversation_history: List[Dict[str, str]] = None,
-        pending_tasks: List[Dict[str, Any]] = None
+        pending_tasks: List[Dict[str, Any]] = None,
+        bypass_cache: bool = False
     ) -> Dict[str, Any]:
         """
         Process a user message through the agent workflow
@@ -990,9 +1079,12 @@ Remember:
         Args:
             user_message: The user's input
             user_id: User ID from Firestore
-            session_id: Optional session ID for continuity
-            conversation_history: Previous conversation messages
+            session_id: Optional session ID for continuity (restores the
+                session's history and pending tasks from its checkpoint)
+            conversation_history: Previous conversation messages (None = use the session's)
             pending_tasks: Pending tasks from previous interaction that need completion
+                (None = use the session's)
+            bypass_cache: Skip the shared classification cache for this request
             
         Returns:
             Dictionary with response and extracted data
@@ -1001,55 +1093,160 @@ Remember:
             # Get user role from Firestore
             user_role = firestore_service.get_user_role(user_id)
             
-            # Create initial state as dictionary
-            initial_state = {
-                "user_message": user_message,
-                "user_id": user_id,
-                "user_role": user_role,
-                "session_id": session_id or str(uuid.uuid4()),
-                "conversation_history": conversation_history or [],
-                "intent": None,
-                "extracted_tasks": [],
-                "pending_tasks": pending_tasks or [],  # Pass pending tasks from frontend
-                "task_confirmations": [],
-                "response": "",
-                "needs_follow_up": False,
-                "follow_up_question": None,
-                "timestamp": datetime.now().isoformat(),
-                "error": None
-            }
+            session_id = session_id or str(uuid.uuid4())
+            config = self._session_config(user_id, session_id)
+            conversation_history, pending_tasks = self._session_context(
+                self._previous_state(config), conversation_history, pending_tasks
+            )
             
-            # Run the graph
-            final_state = self.graph.invoke(initial_state)
+            initial_state = self._initial_state(
+                user_message, user_id, user_role, session_id,
+                conversation_history, pending_tasks, bypass_cache
+            )
             
-            # LangGraph returns a dictionary, not an AgentState object
-            # Access fields as dictionary keys
-            response = {
-                "response": final_state.get("response", "I'm here to help!"),
-                "tasks": [task.dict() if hasattr(task, 'dict') else task for task in final_state.get("extracted_tasks", [])],
-                "pendingTasks": [pt.dict() if hasattr(pt, 'dict') else pt for pt in final_state.get("pending_tasks", [])],
-                "taskConfirmations": [tc.dict() if hasattr(tc, 'dict') else tc for tc in final_state.get("task_confirmations", [])],
-                "needsFollowUp": final_state.get("needs_follow_up", False),
-                "followUpQuestion": final_state.get("follow_up_question"),
-                "sessionId": final_state.get("session_id"),
-                "intentType": final_state.get("intent")
-            }
+            # Run the graph (the final state is checkpointed for the session)
+            final_state = self.graph.invoke(initial_state, config=config)
+            return self._format_result(final_state)
             
-            logger.info(f"Agent processing complete. Intent: {final_state.get('intent')}")
-            return response
+        except Exception as e:
+            return self._error_result(session_id, e)
+    
+    async def process_message_async(
+        self,
+        user_message: str,
+        user_id: str,
+        session_id: str = None,
+        conversation_history: List[Dict[str, str]] = None,
+        pending_tasks: List[Dict[str, Any]] = None,
+        bypass_cache: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Async variant of process_message for use inside async endpoints.
+        
+        LLM calls go through llm.ainvoke and Firestore reads through the async
+        Firestore service, so a single worker can serve many chats concurrently.
+        
+        Args:
+            user_message: The user's input
+            user_id: User ID from Firestore
+            session_id: Optional session ID for continuity (restores the
+                session's history and pending tasks from its checkpoint)
+            conversation_history: Previous conversation messages (None = use the session's)
+            pending_tasks: Pending tasks from previous interaction that need completion
+                (None = use the session's)
+            bypass_cache: Skip the shared classification cache for this request
+            
+        Returns:
+            Dictionary with response and extracted data
+        """
+        try:
+            session_id = session_id or str(uuid.uuid4())
+            config = self._session_config(user_id, session_id)
+            request_id = uuid.uuid4().hex
+            
+            # The user's profile (role) and task index are read speculatively
+            # while the router's LLM call is in flight; nodes await them
+            async with request_prefetch(request_id, user_id):
+                conversation_history, pending_tasks = self._session_context(
+                    await self._previous_state_async(config), conversation_history, pending_tasks
+                )
+                
+                initial_state = self._initial_state(
+                    user_message, user_id, None, session_id,
+                    conversation_history, pending_tasks, bypass_cache, request_id
+                )
+                
+                # Run the graph with the async node implementations
+                final_state = await self.graph.ainvoke(initial_state, config=config)
+            return self._format_result(final_state)
             
         except Exception as e:
-            logger.error(f"Error processing message: {e}")
-            return {
-                "response": "I apologize, I'm having trouble processing that right now. Please try again.",
-                "tasks": [],
-                "pendingTasks": [],
-                "taskConfirmations": [],
-                "needsFollowUp": False,
-                "followUpQuestion": None,
-                "sessionId": session_id or str(uuid.uuid4()),
-                "error": str(e)
-            }
+            return self._error_result(session_id, e)
+    
+    async def stream_message(
+        self,
+        user_message: str,
+        user_id: str,
+        session_id: str = None,
+        conversation_history: List[Dict[str, str]] = None,
+        pending_tasks: List[Dict[str, Any]] = None,
+        bypass_cache: bool = False
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a user message through the agent workflow
+        
+        Yields events as dictionaries with "event" and "data" keys:
+        - "intent": classified intent, as soon as a classifier node finishes
+        - "token": text chunk of the final answer (conversationalist and
+          knowledge retriever answers; JSON-producing calls are not streamed)
+        - "done": the full response dictionary (same shape as process_message)
+        
+        Args:
+            user_message: The user's input
+            user_id: User ID from Firestore
+            session_id: Optional session ID for continuity (restores the
+                session's history and pending tasks from its checkpoint)
+            conversation_history: Previous conversation messages (None = use the session's)
+            pending_tasks: Pending tasks from previous interaction that need completion
+                (None = use the session's)
+            bypass_cache: Skip the shared classification cache for this request
+        """
+        try:
+            session_id = session_id or str(uuid.uuid4())
+            config = self._session_config(user_id, session_id)
+            request_id = uuid.uuid4().hex
+            
+            # The user's profile (role) and task index are read speculatively
+            # while the router's LLM call is in flight; nodes await them
+            async with request_prefetch(request_id, user_id):
+                conversation_history, pending_tasks = self._session_context(
+                    await self._previous_state_async(config), conversation_history, pending_tasks
+                )
+                
+                initial_state = self._initial_state(
+                    user_message, user_id, None, session_id,
+                    conversation_history, pending_tasks, bypass_cache, request_id,
+                    streaming=True
+                )
+                
+                final_state = None
+                intent_sent = False
+                
+                async for event in self.graph.astream_events(initial_state, config=config, version="v2"):
+                    kind = event["event"]
+                    
+                    if kind == "on_chat_model_stream" and FINAL_RESPONSE_TAG in event.get("tags", []):
+                        text = event["data"]["chunk"].content
+                        if text:
+                            yield {"event": "token", "data": {"text": text}}
+                    
+                    elif kind == "on_chain_end":
+                        output = event["data"].get("output")
+                        if not isinstance(output, dict):
+                            continue
+                        
+                        if event["name"] in CLASSIFIER_NODES and output.get("intent") and not intent_sent:
+                            intent_sent = True
+                            yield {
+                                "event": "intent",
+                                "data": {
+                                    "intentType": output["intent"],
+                                    "intentSource": output.get("intent_source"),
+                                    "sessionId": output.get("session_id")
+                                }
+                            }
+                        
+                        elif not event.get("parent_ids"):
+                            # Root graph run finished - this is the final state
+                            final_state = output
+            
+            if final_state is None:
+                raise RuntimeError("Workflow finished without a final state")
+            
+            yield {"event": "done", "data": self._format_result(final_state)}
+            
+        except Exception as e:
+            yield {"event": "done", "data": self._error_result(session_id, e)}
     
     def confirm_task(self, user_id: str, task_id: str, task_data: Dict[str, Any]) -> bool:
         """
@@ -1084,3 +1281,57 @@ Remember:
         except Exception as e:
             logger.error(f"Error confirming task: {e}")
             return False
+    
+    def confirm_tasks(self, user_id: str, tasks: List[Dict[str, Any]]) -> Optional[List[Optional[str]]]:
+        """
+        Confirm and add several tasks to Firestore with one role check and
+        batched writes
+        
+        Args:
+            user_id: User ID
+            tasks: Task data to add
+            
+        Returns:
+            Firestore task ID per task (None where the write failed), or None
+            if the user may not add tasks
+        """
+        user_role = firestore_service.get_user_role(user_id)
+        if user_role != UserRole.STUDENT:
+            logger.warning(f"User {user_id} with role {user_role} attempted to add {len(tasks)} tasks")
+            return None
+        
+        task_ids = firestore_service.add_tasks(user_id, tasks)
+        logger.info(f"Confirmed {sum(1 for task_id in task_ids if task_id)}/{len(tasks)} tasks for user {user_id}")
+        return task_ids
+    
+    async def confirm_task_async(self, user_id: str, task_id: str, task_data: Dict[str, Any]) -> bool:
+        """Async variant of confirm_task (async Firestore client)"""
+        try:
+            user_role = await async_firestore_service.get_user_role(user_id)
+            if user_role != UserRole.STUDENT:
+                logger.warning(f"User {user_id} with role {user_role} attempted to add task")
+                return False
+            
+            success = await async_firestore_service.add_task(user_id, task_data)
+            
+            if success:
+                logger.info(f"Task confirmed and added for user {user_id}")
+            else:
+                logger.error(f"Failed to add confirmed task for user {user_id}")
+            
+            return success
+            
+        except Exception as e:
+            logger.error(f"Error confirming task: {e}")
+            return False
+    
+    async def confirm_tasks_async(self, user_id: str, tasks: List[Dict[str, Any]]) -> Optional[List[Optional[str]]]:
+        """Async variant of confirm_tasks (async Firestore client)"""
+        user_role = await async_firestore_service.get_user_role(user_id)
+        if user_role != UserRole.STUDENT:
+            logger.warning(f"User {user_id} with role {user_role} attempted to add {len(tasks)} tasks")
+            return None
+        
+        task_ids = await async_firestore_service.add_tasks(user_id, tasks)
+        logger.info(f"Confirmed {sum(1 for task_id in task_ids if task_id)}/{len(tasks)} tasks for user {user_id}")
+        return task_ids
@@ -0,0 +1,325 @@
+"""
+Answer Templates Module
+Deterministic answers for structured data queries (tasks, timer_stats, quizzes)
+
+Most data questions ("what's due tomorrow?", "how many pomodoros?") only need
+the retrieved rows restated. Those are rendered here from the query
+parameters and the rows, skipping the knowledge retriever's answer LLM call.
+
+The gate is an allowlist: a template is used only when every word of the
+question is accounted for by the parsed query (its type, date range and
+filters) or is generic phrasing ("show me", "how many"). Anything else -
+a subject, a task name, a request for advice - is left to the LLM, since
+restating every row would not answer it.
+"""
+
+import os
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from data_compactor import format_duration
+
+TEMPLATED_ANSWERS_ENABLED = os.getenv("TEMPLATED_ANSWERS_ENABLED", "true").lower() == "true"
+
+# Items listed before collapsing the rest into "...and N more"
+MAX_LISTED_TASKS = 10
+MAX_LISTED_ATTEMPTS = 5
+
+# Phrasing that carries no constraint beyond "show me the data"
+GENERIC_WORDS = frozenset("""
+    a all an and any anything are at be can could currently d did do does doing
+    done for from get give got has have how i i'd i'm i've in is it know let list
+    ll m many me much my now number of on one ones please pull right s see show
+    so t tell that the them there these this those to total up ve what whats
+    which with would you your
+""".split())
+
+# Words each query type answers by itself
+QUERY_TYPE_WORDS = {
+    "tasks": frozenset("task tasks todo todos item items thing things count".split()),
+    "timer_stats": frozenset("""
+        pomodoro pomodoros session sessions focus focused study studied studying
+        time timer stats statistics hours minutes spent completed finished far
+    """.split()),
+    "quizzes": frozenset("""
+        quiz quizzes attempt attempts attempted result results score scores
+        paper papers past test tests taken took completed finished recent latest
+        average marks far
+    """.split()),
+}
+
+# Words a parsed date range accounts for (dates, weekdays, months, numbers)
+DATE_WORDS = frozenset("""
+    due today tomorrow yesterday tonight this next last week weeks weekend month
+    coming upcoming until by before after between since from onwards
+    day days date monday tuesday wednesday thursday friday saturday sunday
+    january february march april may june july august september october november
+    december jan feb mar apr jun jul aug sep sept oct nov dec
+""".split())
+
+# Words only the overdue query (pending, due by yesterday) accounts for
+OVERDUE_WORDS = frozenset("overdue late missed past".split())
+
+# Words each task filter accounts for, by filter value
+FILTER_WORDS = {
+    ("completed", True): frozenset("completed complete done finished".split()),
+    ("completed", False): frozenset(
+        "pending incomplete unfinished open remaining left outstanding still".split()
+    ),
+    ("importance", True): frozenset("important starred".split()),
+    ("priority", None): frozenset("priority high low medium urgent".split()),
+}
+
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_DATE_NUMBER = re.compile(r"\d+(st|nd|rd|th)?")
+
+
+def _is_overdue(query_params: Dict[str, Any], dates: Dict[str, Any]) -> bool:
+    """Pending tasks due by yesterday, with no start date"""
+    filters = query_params.get("filters") or {}
+    date_range = query_params.get("date_range") or {}
+    return (
+        filters.get("completed") is False
+        and not date_range.get("start_date")
+        and date_range.get("end_date") == dates["yesterday_str"]
+    )
+
+
+def _captured_words(query_params: Dict[str, Any], dates: Optional[Dict[str, Any]]) -> frozenset:
+    """Vocabulary the parsed query accounts for"""
+    query_type = query_params.get("query_type")
+    words = set(GENERIC_WORDS) | QUERY_TYPE_WORDS.get(query_type, frozenset())
+    if query_type != "tasks":
+        return frozenset(words)
+
+    date_range = query_params.get("date_range") or {}
+    if date_range.get("start_date") or date_range.get("end_date"):
+        words |= DATE_WORDS
+    if dates and _is_overdue(query_params, dates):
+        words |= OVERDUE_WORDS
+    filters = query_params.get("filters") or {}
+    for field in ("completed", "importance"):
+        if filters.get(field) is not None:
+            words |= FILTER_WORDS.get((field, filters[field]), frozenset())
+    if filters.get("priority"):
+        words |= FILTER_WORDS[("priority", None)]
+    if filters.get("list"):
+        words |= {"list", "lists", *_WORD_PATTERN.findall(str(filters["list"]).lower())}
+    return frozenset(words)
+
+
+def fully_captured(
+    user_message: str,
+    query_params: Dict[str, Any],
+    dates: Optional[Dict[str, Any]] = None
+) -> bool:
+    """
+    Whether the parsed query accounts for the whole question
+
+    Every word must be generic phrasing or covered by the query type, date
+    range or filters; numbers count only as part of a date range, and
+    "overdue" only as part of the overdue range (needs dates).
+    """
+    words = _WORD_PATTERN.findall((user_message or "").lower())
+    if not words:
+        return False
+    captured = _captured_words(query_params, dates)
+    dated = DATE_WORDS <= captured
+    return all(word in captured or (dated and _DATE_NUMBER.fullmatch(word)) for word in words)
+
+
+def _plural(count: int, word: str) -> str:
+    return f"{count} {word}" if count == 1 else f"{count} {word}s"
+
+
+def _day_label(date_str: Optional[str], dates: Dict[str, Any]) -> Optional[str]:
+    """YYYY-MM-DD -> 'today' / 'tomorrow' / 'yesterday' / 'Fri, Nov 29'"""
+    if not date_str:
+        return None
+    relative = {
+        dates["current_date_str"]: "today",
+        dates["tomorrow_str"]: "tomorrow",
+        dates["yesterday_str"]: "yesterday",
+    }
+    if date_str in relative:
+        return relative[date_str]
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").strftime("%a, %b %d").replace(" 0", " ")
+    except ValueError:
+        return date_str
+
+
+def _task_scope(query_params: Dict[str, Any], dates: Dict[str, Any]) -> Dict[str, str]:
+    """Describe the task filters: adjective ("pending important"), list and date phrases"""
+    filters = query_params.get("filters") or {}
+    date_range = query_params.get("date_range") or {}
+    start, end = date_range.get("start_date"), date_range.get("end_date")
+
+    words = []
+    overdue = _is_overdue(query_params, dates)
+    if overdue:
+        words.append("overdue")
+    elif filters.get("completed") is True:
+        words.append("completed")
+    elif filters.get("completed") is False:
+        words.append("pending")
+    if filters.get("importance") is True:
+        words.append("important")
+    if filters.get("priority"):
+        words.append(f"{filters['priority']}-priority")
+
+    if overdue:
+        when = ""
+    elif start and end and start == end:
+        label = _day_label(start, dates)
+        when = f" due {label}" if label in ("today", "tomorrow", "yesterday") else f" due on {label}"
+    elif start == dates["week_start_str"] and end == dates["week_end_str"]:
+        when = " due this week"
+    elif start and end:
+        when = f" due between {_day_label(start, dates)} and {_day_label(end, dates)}"
+    elif start:
+        when = f" due from {_day_label(start, dates)} onwards"
+    elif end:
+        when = f" due by {_day_label(end, dates)}"
+    else:
+        when = ""
+
+    task_list = filters.get("list")
+    return {
+        "adjective": " ".join(words),
+        "list": f" in your {task_list} list" if task_list else "",
+        "when": when,
+    }
+
+
+def _task_line(task: Dict[str, Any], dates: Dict[str, Any]) -> str:
+    details = []
+    due = _day_label(task.get("dueDate"), dates)
+    if due:
+        details.append(f"due {due}")
+    priority = task.get("priority")
+    if priority and priority != "medium":
+        details.append(f"{priority} priority")
+    if task.get("importance"):
+        details.append("important")
+    if task.get("completed"):
+        details.append("done")
+
+    line = f"• {task.get('description') or 'Untitled task'}"
+    return f"{line} ({', '.join(details)})" if details else line
+
+
+def render_tasks_answer(
+    query_params: Dict[str, Any],
+    tasks: List[Dict[str, Any]],
+    dates: Dict[str, Any],
+    row_limit: Optional[int] = None
+) -> str:
+    scope = _task_scope(query_params, dates)
+    noun = f"{scope['adjective']} tasks".strip()
+
+    if not tasks:
+        answer = f"You don't have any {noun}{scope['when']}{scope['list']}."
+        if scope["adjective"].startswith(("pending", "overdue")):
+            answer += " You're all caught up!"
+        return answer
+
+    count = len(tasks)
+    noun = _plural(count, f"{scope['adjective']} task".strip())
+    # A read capped at row_limit may have left tasks out
+    at_least = "at least " if row_limit and count >= row_limit else ""
+    lines = [f"You have {at_least}{noun}{scope['when']}{scope['list']}:"]
+    lines.extend(_task_line(task, dates) for task in tasks[:MAX_LISTED_TASKS])
+    if count > MAX_LISTED_TASKS:
+        lines.append(f"...and {count - MAX_LISTED_TASKS} more.")
+    return "\n".join(lines)
+
+
+def render_timer_stats_answer(stats: Dict[str, Any]) -> str:
+    pomodoros = int(stats.get("completedPomodoros") or 0)
+    study_time = stats.get("presentTime") or 0
+
+    if not pomodoros and not study_time:
+        return "You haven't completed any pomodoros yet. Start a focus session whenever you're ready!"
+
+    return (
+        f"You've completed {_plural(pomodoros, 'pomodoro')} so far, "
+        f"with {format_duration(study_time)} of total study time. Keep it up!"
+    )
+
+
+def _attempt_line(attempt: Dict[str, Any], dates: Dict[str, Any]) -> str:
+    title = " ".join(str(part) for part in (attempt.get("subject"), attempt.get("year")) if part) or "Quiz"
+    if attempt.get("category"):
+        title += f" ({attempt['category']})"
+
+    score = attempt.get("score")
+    total = attempt.get("totalQuestions")
+    result = f"{score}/{total}" if score is not None and total else str(score if score is not None else "-")
+    percentage = attempt.get("percentage")
+    if isinstance(percentage, (int, float)):
+        result += f" ({percentage:g}%)"
+
+    taken = attempt.get("createdAt") or attempt.get("timestamp")
+    when = _day_label(str(taken)[:10], dates) if taken else None
+    return f"• {title}: {result}" + (f", {when}" if when else "")
+
+
+def render_quizzes_answer(
+    attempts: List[Dict[str, Any]],
+    dates: Dict[str, Any],
+    row_limit: Optional[int] = None
+) -> str:
+    if not attempts:
+        return "You haven't attempted any quizzes yet. Try a past paper to see how you're doing!"
+
+    percentages = [a["percentage"] for a in attempts if isinstance(a.get("percentage"), (int, float))]
+    if row_limit and len(attempts) >= row_limit:
+        # Only the newest row_limit attempts were read: not a lifetime total
+        summary = f"Across your last {_plural(len(attempts), 'quiz attempt')}"
+        summary += f", you averaged {sum(percentages) / len(percentages):.1f}%" if percentages else ""
+    else:
+        summary = f"You've completed {_plural(len(attempts), 'quiz attempt')}"
+        if percentages:
+            summary += f", averaging {sum(percentages) / len(percentages):.1f}%"
+
+    listed = attempts[:MAX_LISTED_ATTEMPTS]
+    lines = [f"{summary}. Your most recent {'result' if len(listed) == 1 else 'results'}:"]
+    lines.extend(_attempt_line(attempt, dates) for attempt in listed)
+    if len(attempts) > len(listed):
+        lines.append(f"...and {len(attempts) - len(listed)} more.")
+    return "\n".join(lines)
+
+
+def render_templated_answer(
+    user_message: str,
+    query_params: Dict[str, Any],
+    data: Any,
+    dates: Dict[str, Any],
+    row_limit: Optional[int] = None
+) -> Optional[str]:
+    """
+    Final response for a data query without an LLM call
+
+    Args:
+        user_message: The user's question
+        query_params: Query analysis output (query_type, date_range, filters)
+        data: Rows returned by FirestoreService
+        dates: Helper dates from StudyMateAgent._query_dates
+        row_limit: Cap the rows were read with (None if the read was complete)
+
+    Returns:
+        The response text, or None when the LLM should answer
+    """
+    if not TEMPLATED_ANSWERS_ENABLED or not fully_captured(user_message, query_params, dates):
+        return None
+
+    query_type = query_params.get("query_type")
+    if query_type == "tasks" and isinstance(data, list):
+        return render_tasks_answer(query_params, data, dates, row_limit)
+    if query_type == "timer_stats" and isinstance(data, dict):
+        return render_timer_stats_answer(data)
+    if query_type == "quizzes" and isinstance(data, list):
+        return render_quizzes_answer(data, dates, row_limit)
+    return None
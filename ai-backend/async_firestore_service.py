@@ -0,0 +1,395 @@
+"""
+Async Firestore Service Module
+Coroutine counterpart of FirestoreService built on Firestore's AsyncClient
+
+FirestoreService keeps the blocking client for existing sync callers (the
+sync graph path, the confirmation store, scripts). AsyncFirestoreService
+exposes the same data methods as coroutines so async endpoints and graph
+nodes await Firestore instead of parking a worker thread per call, and
+independent reads inside one request can overlap (asyncio.gather).
+
+Both services share one user cache, task index and snapshot listener
+manager (owned by FirestoreService), so a write through either one is
+visible to reads through the other. Query planning, fallbacks and cache
+bookkeeping are FirestoreService helpers called by both, so the coroutines
+here only differ in awaiting the I/O. When the AsyncClient is unavailable
+the coroutines fall back to the sync service in a worker thread.
+"""
+
+import asyncio
+import logging
+from typing import Optional, List, Dict, Any, Tuple
+
+import firebase_admin
+from firebase_admin import firestore, firestore_async
+from google.api_core.exceptions import FailedPrecondition
+
+from models import UserRole
+from cache import MISSING
+from metrics import timed, FIRESTORE_CALL_DURATION
+from single_flight import single_flight
+from firestore_service import (
+    FirestoreService, firestore_service, TASK_QUERY_LIMIT, QUIZ_RESULTS_LIMIT, QUIZ_RESULTS_SHAPE,
+    POMODORO_FIELDS, quiz_projection, pomodoro_stats
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFirestoreService:
+    """Async data layer sharing caches with a FirestoreService"""
+
+    def __init__(self, sync_service: FirestoreService):
+        self.sync = sync_service
+        self._db = None
+        self._client_failed = False
+
+    @property
+    def db(self):
+        """
+        AsyncClient created on first use, inside the serving event loop
+        (its gRPC channel binds to the loop that first uses it)
+        """
+        if self._db is None and not self._client_failed:
+            if self.sync.db is None or not firebase_admin._apps:
+                self._client_failed = True
+                return None
+            try:
+                self._db = firestore_async.client()
+            except Exception as e:
+                self._client_failed = True
+                logger.warning(f"Firestore AsyncClient unavailable, using the sync client in worker threads: {e}")
+        return self._db
+
+    @staticmethod
+    async def _collect(query) -> List[Dict[str, Any]]:
+        """Stream a query into dictionaries with their document id"""
+        documents = []
+        async for doc in query.stream():
+            data = doc.to_dict()
+            data['id'] = doc.id
+            documents.append(data)
+        return documents
+
+    # =========================================================================
+    # USERS
+    # =========================================================================
+
+    @timed(FIRESTORE_CALL_DURATION)
+    @single_flight
+    async def get_user(self, uid: str) -> Optional[Dict[str, Any]]:
+        """Get user document by UID (served from the shared user cache when fresh)"""
+        cached = self.sync.user_cache.get(uid, MISSING)
+        if cached is not MISSING:
+            return dict(cached) if cached is not None else None
+
+        if self.db is None:
+            return await asyncio.to_thread(self.sync.get_user, uid)
+
+        try:
+            doc = await self.db.collection('users').document(uid).get()
+            user = doc.to_dict() if doc.exists else None
+
+            # Missing users are cached too; read errors are not
+            self.sync.user_cache.set(uid, user)
+            return dict(user) if user is not None else None
+
+        except Exception as e:
+            logger.error(f"Error getting user {uid}: {e}")
+            return None
+
+    @timed(FIRESTORE_CALL_DURATION)
+    async def get_user_role(self, uid: str) -> UserRole:
+        """Get user role, defaults to STUDENT"""
+        try:
+            user = await self.get_user(uid)
+            if user and 'role' in user:
+                return UserRole(user['role'])
+            return UserRole.STUDENT
+        except Exception as e:
+            logger.error(f"Error getting user role: {e}")
+            return UserRole.STUDENT
+
+    async def track_active_user(self, uid: str):
+        """Mark a user as active (listener attachment is blocking - runs in a worker thread)"""
+        if self.sync.listeners:
+            await asyncio.to_thread(self.sync.track_active_user, uid)
+
+    @timed(FIRESTORE_CALL_DURATION)
+    async def get_pomodoro_stats(self, uid: str) -> Dict[str, Any]:
+        """Get user's pomodoro statistics (see FirestoreService.get_pomodoro_stats)"""
+        if self.sync.listeners and self.sync.listeners.is_live(uid, "user"):
+            return pomodoro_stats(await self.get_user(uid))
+
+        if self.db is None:
+            return await asyncio.to_thread(self.sync.get_pomodoro_stats, uid)
+
+        try:
+            return pomodoro_stats(await self._read_pomodoro_fields(uid))
+
+        except Exception as e:
+            logger.error(f"Error getting pomodoro stats for user {uid}: {e}")
+            return pomodoro_stats(None)
+
+    @single_flight
+    async def _read_pomodoro_fields(self, uid: str) -> Optional[Dict[str, Any]]:
+        """Uncached read of the timer counters on users/{uid}"""
+        doc = await self.db.collection('users').document(uid).get(field_paths=list(POMODORO_FIELDS))
+        return doc.to_dict() if doc.exists else None
+
+    # =========================================================================
+    # TASK WRITES
+    # =========================================================================
+
+    @timed(FIRESTORE_CALL_DURATION)
+    async def add_task(self, uid: str, task_data: Dict[str, Any]) -> bool:
+        """Add a task to user's tasks sub-collection (see FirestoreService.add_task)"""
+        if self.db is None:
+            return await asyncio.to_thread(self.sync.add_task, uid, task_data)
+
+        try:
+            task_to_add = FirestoreService._task_document(task_data)
+
+            task_ref = self.db.collection('users').document(uid).collection('tasks').document()
+            await task_ref.set(task_to_add)
+            self.sync._tasks_added(uid, [(task_ref.id, task_to_add)])
+
+            logger.info(f"Task added successfully for user {uid}: {task_to_add['description']}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error adding task for user {uid}: {e}")
+            return False
+
+    @timed(FIRESTORE_CALL_DURATION)
+    async def add_tasks(self, uid: str, tasks: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Add several tasks with batched writes (see FirestoreService.add_tasks)
+
+        Returns:
+            Document ID per task, None for tasks whose batch failed
+        """
+        if self.db is None:
+            return await asyncio.to_thread(self.sync.add_tasks, uid, tasks)
+
+        task_ids: List[Optional[str]] = [None] * len(tasks)
+        for start, batch, written in self.sync._task_batches(self.db, uid, tasks):
+            try:
+                await batch.commit()
+            except Exception as e:
+                logger.error(f"Error adding {len(written)} tasks for user {uid}: {e}")
+                continue
+            task_ids[start:start + len(written)] = self.sync._tasks_added(uid, written)
+
+        logger.info(f"Batch added {sum(1 for task_id in task_ids if task_id)}/{len(tasks)} tasks for user {uid}")
+        return task_ids
+
+    @timed(FIRESTORE_CALL_DURATION)
+    async def update_task(self, uid: str, task_id: str, updates: Dict[str, Any]) -> bool:
+        """Update a task"""
+        if self.db is None:
+            return await asyncio.to_thread(self.sync.update_task, uid, task_id, updates)
+
+        try:
+            task_ref = self.db.collection('users').document(uid).collection('tasks').document(task_id)
+            await task_ref.update(updates)
+            self.sync.task_index.update_task(uid, task_id, updates)
+
+            logger.info(f"Task {task_id} updated for user {uid}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error updating task {task_id} for user {uid}: {e}")
+            return False
+
+    @timed(FIRESTORE_CALL_DURATION)
+    async def delete_task(self, uid: str, task_id: str) -> bool:
+        """Delete a task"""
+        if self.db is None:
+            return await asyncio.to_thread(self.sync.delete_task, uid, task_id)
+
+        try:
+            task_ref = self.db.collection('users').document(uid).collection('tasks').document(task_id)
+            await task_ref.delete()
+            self.sync.task_index.remove_task(uid, task_id)
+
+            logger.info(f"Task {task_id} deleted for user {uid}")
+            return True
+
+        except Exception as e:
+            logger.error(f"Error deleting task {task_id} for user {uid}: {e}")
+            return False
+
+    # =========================================================================
+    # TASK READS
+    # =========================================================================
+
+    @timed(FIRESTORE_CALL_DURATION)
+    async def get_user_tasks(self, uid: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Get user's most recently created tasks"""
+        if self.db is None:
+            return await asyncio.to_thread(self.sync.get_user_tasks, uid, limit)
+
+        try:
+            tasks_ref = self.db.collection('users').document(uid).collection('tasks')
+            query = tasks_ref.order_by('createdDate', direction=firestore.Query.DESCENDING).limit(limit)
+            tasks = await self._collect(query)
+
+            logger.info(f"Retrieved {len(tasks)} tasks for user {uid}")
+            return tasks
+
+        except Exception as e:
+            logger.error(f"Error getting tasks for user {uid}: {e}")
+            return []
+
+    async def _stream_tasks(
+        self,
+        uid: str,
+        plan: Dict[str, Any],
+        start_date: Optional[str],
+        end_date: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Run a planned task query (see FirestoreService._plan_task_query)"""
+        tasks_ref = self.db.collection('users').document(uid).collection('tasks')
+        return await self._collect(FirestoreService._task_query(tasks_ref, plan, start_date, end_date))
+
+    def needs_task_hydration(self, uid: str) -> bool:
+        """Whether a task query for the user would start with a full read of their tasks"""
+        return self.sync.needs_task_hydration(uid)
+
+    async def warm_task_index(self, uid: str) -> bool:
+        """Hydrate the user's task index ahead of a query (see prefetch.py)"""
+        if self.db is None:
+            return await asyncio.to_thread(self.sync._ensure_task_index, uid)
+        return await self._ensure_task_index(uid)
+
+    async def _ensure_task_index(self, uid: str) -> bool:
+        """Hydrate a user's shared task index on first access"""
+        ready = self.sync._task_index_ready(uid)
+        if ready is not None:
+            return ready
+
+        # Writes that land while the read is in flight make it stale
+        version = self.sync.task_index.version()
+        try:
+            tasks = await self._collect(self.db.collection('users').document(uid).collection('tasks'))
+        except Exception as e:
+            logger.warning(f"Could not hydrate task index for user {uid}, querying Firestore directly: {e}")
+            return False
+
+        return self.sync._install_task_index(uid, tasks, version)
+
+    @timed(FIRESTORE_CALL_DURATION)
+    @single_flight
+    async def query_tasks(
+        self,
+        uid: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        completed: Optional[bool] = None,
+        importance: Optional[bool] = None,
+        task_list: Optional[str] = None,
+        priority: Optional[str] = None,
+        limit: int = TASK_QUERY_LIMIT
+    ) -> List[Dict[str, Any]]:
+        """
+        Query user's tasks with filtering and sorting (same semantics as
+        FirestoreService.query_tasks: task index first, then pushed-down
+        Firestore predicates with a Python-side residual)
+        """
+        if self.db is None:
+            return await asyncio.to_thread(
+                self.sync.query_tasks, uid, start_date, end_date, completed, importance, task_list, priority, limit
+            )
+
+        try:
+            logger.info(f"Querying tasks for user {uid} with filters: start_date={start_date}, end_date={end_date}, "
+                       f"completed={completed}, importance={importance}, list={task_list}, priority={priority}")
+
+            equality = FirestoreService._task_filters(completed, importance, task_list, priority)
+
+            if await self._ensure_task_index(uid):
+                indexed = self.sync._indexed_tasks(
+                    uid, start_date=start_date, end_date=end_date, filters=equality, limit=limit
+                )
+                if indexed is not None:
+                    return indexed
+
+            plan = self.sync._plan_task_query(start_date, end_date, equality, limit)
+            try:
+                tasks = await self._stream_tasks(uid, plan, start_date, end_date)
+            except FailedPrecondition as index_error:
+                plan = FirestoreService._fallback_task_plan(plan, equality, index_error)
+                tasks = await self._stream_tasks(uid, plan, start_date, end_date)
+
+            return FirestoreService._finish_task_query(uid, tasks, plan, limit)
+
+        except Exception as e:
+            logger.error(f"Error querying tasks for user {uid}: {e}", exc_info=True)
+            return []
+
+    # =========================================================================
+    # QUIZ RESULTS
+    # =========================================================================
+
+    @timed(FIRESTORE_CALL_DURATION)
+    @single_flight
+    async def get_quiz_results(
+        self,
+        uid: str,
+        limit: int = QUIZ_RESULTS_LIMIT,
+        fields: Optional[Tuple[str, ...]] = None,
+        summary: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Get user's quiz results from paper_attempts sub-collection, newest
+        first (same ordering strategies, projection and summary mode as
+        FirestoreService.get_quiz_results)
+        """
+        if self.db is None:
+            return await asyncio.to_thread(self.sync.get_quiz_results, uid, limit, fields, summary)
+
+        try:
+            projection = quiz_projection(fields, summary)
+
+            live = self.sync._live_quiz_results(uid, limit, projection)
+            if live is not None:
+                return live
+
+            attempts_ref = FirestoreService._attempts_ref(self.db, uid, projection)
+
+            # Shares the sync service's memory of which ordering works
+            for strategy in self.sync.quiz_ordering.plan(QUIZ_RESULTS_SHAPE):
+                try:
+                    results = await self._collect(FirestoreService._ordered_attempts(attempts_ref, strategy, limit))
+                except Exception as order_error:
+                    self.sync._quiz_ordering_failed(strategy, order_error)
+                    continue
+                return self.sync._quiz_results_read(uid, strategy, results)
+            return []
+
+        except Exception as e:
+            logger.error(f"Error getting quiz results for user {uid}: {e}", exc_info=True)
+            return []
+
+    @timed(FIRESTORE_CALL_DURATION)
+    async def get_quiz_attempt(self, uid: str, attempt_id: str) -> Optional[Dict[str, Any]]:
+        """Get one full paper attempt, including selectedAnswers (None if not found)"""
+        if self.db is None:
+            return await asyncio.to_thread(self.sync.get_quiz_attempt, uid, attempt_id)
+
+        try:
+            doc = await self.db.collection('users').document(uid).collection('paper_attempts').document(attempt_id).get()
+            if not doc.exists:
+                return None
+            attempt = doc.to_dict()
+            attempt['id'] = doc.id
+            return attempt
+
+        except Exception as e:
+            logger.error(f"Error getting quiz attempt {attempt_id} for user {uid}: {e}")
+            return None
+
+
+# Global instance (shares caches with the sync firestore_service)
+async_firestore_service = AsyncFirestoreService(firestore_service)
@@ -0,0 +1,291 @@
+"""
+Confirmation Store Module
+Server-side storage of task confirmations awaiting the user's decision
+
+The task extractor stores every TaskConfirmation it produces here, keyed by
+taskId and scoped to the (userId, sessionId) of the chat request.
+/api/task/confirm then commits the stored task instead of relying on the
+frontend to re-post the full task body.
+
+Backends (CONFIRMATION_STORE_BACKEND):
+- "memory"    - per-process, bounded (total and per-user caps), TTL-expiring
+- "firestore" - shared by every worker through the task_confirmations
+                collection; expiresAt can back a Firestore TTL policy
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from firebase_admin import firestore
+
+from firestore_service import firestore_service
+from metrics import CONFIRMATION_STORE_OPERATIONS, CONFIRMATION_STORE_EVICTIONS
+
+logger = logging.getLogger(__name__)
+
+CONFIRMATION_STORE_BACKEND = os.getenv("CONFIRMATION_STORE_BACKEND", "memory").lower()
+CONFIRMATION_TTL_SECONDS = float(os.getenv("CONFIRMATION_TTL_SECONDS", "3600"))
+CONFIRMATION_MAX_ENTRIES = int(os.getenv("CONFIRMATION_MAX_ENTRIES", "10000"))
+CONFIRMATION_MAX_PER_USER = int(os.getenv("CONFIRMATION_MAX_PER_USER", "50"))
+
+CONFIRMATION_COLLECTION = "task_confirmations"
+
+
+class ConfirmationBackend(ABC):
+    """
+    Storage interface for confirmation entries
+
+    An entry is a dict with taskId, userId, sessionId, task (JSON-safe task
+    data) and expiresAt (epoch seconds).
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def put(self, entry: Dict[str, Any]):
+        """Store an entry, replacing any entry with the same taskId"""
+
+    @abstractmethod
+    def take(self, task_id: str, user_id: str, session_id: str, now: float) -> Optional[Dict[str, Any]]:
+        """
+        Atomically remove and return an entry
+
+        Returns None when the entry does not exist, has expired or belongs to
+        another user/session (foreign entries are left in place).
+        """
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class MemoryConfirmationBackend(ConfirmationBackend):
+    """Per-process backend with total and per-user entry caps"""
+
+    name = "memory"
+
+    def __init__(
+        self,
+        max_entries: int = CONFIRMATION_MAX_ENTRIES,
+        max_per_user: int = CONFIRMATION_MAX_PER_USER,
+        clock: Callable[[], float] = time.time
+    ):
+        self.max_entries = max(1, int(max_entries))
+        self.max_per_user = max(1, int(max_per_user))
+        self._clock = clock
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._by_user: Dict[str, "OrderedDict[str, None]"] = {}
+        self._lock = threading.Lock()
+
+    def put(self, entry: Dict[str, Any]):
+        task_id, user_id = entry["taskId"], entry["userId"]
+        with self._lock:
+            self._remove(task_id)
+            self._purge_expired(self._clock())
+
+            user_entries = self._by_user.setdefault(user_id, OrderedDict())
+            while len(user_entries) >= self.max_per_user:
+                self._remove(next(iter(user_entries)))
+                CONFIRMATION_STORE_EVICTIONS.inc(reason="user_cap")
+            while len(self._entries) >= self.max_entries:
+                self._remove(next(iter(self._entries)))
+                CONFIRMATION_STORE_EVICTIONS.inc(reason="capacity")
+
+            self._entries[task_id] = entry
+            self._by_user.setdefault(user_id, OrderedDict())[task_id] = None
+
+    def take(self, task_id, user_id, session_id, now):
+        with self._lock:
+            entry = self._entries.get(task_id)
+            if entry is None:
+                return None
+            if entry["expiresAt"] <= now:
+                self._remove(task_id)
+                CONFIRMATION_STORE_EVICTIONS.inc(reason="expired")
+                return None
+            if entry["userId"] != user_id or entry["sessionId"] != session_id:
+                return None
+            self._remove(task_id)
+            return entry
+
+    def _remove(self, task_id: str):
+        """Drop an entry from both indexes (caller holds the lock)"""
+        entry = self._entries.pop(task_id, None)
+        if entry is None:
+            return
+        user_entries = self._by_user.get(entry["userId"])
+        if user_entries is not None:
+            user_entries.pop(task_id, None)
+            if not user_entries:
+                del self._by_user[entry["userId"]]
+
+    def _purge_expired(self, now: float):
+        """
+        Drop expired entries from the front
+
+        Insertion order is expiresAt order: every entry is stored with the
+        store's TTL from the time of the put (restored entries included).
+        """
+        while self._entries:
+            task_id, entry = next(iter(self._entries.items()))
+            if entry["expiresAt"] > now:
+                break
+            self._remove(task_id)
+            CONFIRMATION_STORE_EVICTIONS.inc(reason="expired")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": self.name,
+                "size": len(self._entries),
+                "users": len(self._by_user),
+                "max_entries": self.max_entries,
+                "max_per_user": self.max_per_user,
+            }
+
+
+class FirestoreConfirmationBackend(ConfirmationBackend):
+    """Backend shared by every worker: one document per taskId"""
+
+    name = "firestore"
+
+    def __init__(self, db, collection: str = CONFIRMATION_COLLECTION):
+        self.db = db
+        self.collection = collection
+
+    def put(self, entry):
+        document = {
+            **entry,
+            # Timestamp field so a Firestore TTL policy can delete abandoned entries
+            "expiresAt": datetime.fromtimestamp(entry["expiresAt"], tz=timezone.utc),
+        }
+        self.db.collection(self.collection).document(entry["taskId"]).set(document)
+
+    def take(self, task_id, user_id, session_id, now):
+        ref = self.db.collection(self.collection).document(task_id)
+
+        @firestore.transactional
+        def take_in_transaction(transaction):
+            snapshot = ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            entry = snapshot.to_dict()
+            expires_at = entry.get("expiresAt")
+            entry["expiresAt"] = expires_at.timestamp() if hasattr(expires_at, "timestamp") else float(expires_at or 0)
+
+            if entry["expiresAt"] <= now:
+                transaction.delete(ref)
+                CONFIRMATION_STORE_EVICTIONS.inc(reason="expired")
+                return None
+            if entry.get("userId") != user_id or entry.get("sessionId") != session_id:
+                return None
+            transaction.delete(ref)
+            return entry
+
+        return take_in_transaction(self.db.transaction())
+
+    def stats(self):
+        return {"backend": self.name, "collection": self.collection}
+
+
+class ConfirmationStore:
+    """TTL and scoping rules on top of a ConfirmationBackend"""
+
+    def __init__(
+        self,
+        backend: ConfirmationBackend,
+        ttl: float = CONFIRMATION_TTL_SECONDS,
+        clock: Callable[[], float] = time.time
+    ):
+        self.backend = backend
+        self.ttl = float(ttl)
+        self._clock = clock
+
+    def put(self, user_id: str, session_id: str, confirmation) -> bool:
+        """
+        Store a TaskConfirmation until the user decides
+
+        Returns:
+            bool: True if stored (storage errors are logged, not raised, so
+            the chat response is still returned)
+        """
+        entry = {
+            "taskId": confirmation.taskId,
+            "userId": user_id,
+            "sessionId": session_id,
+            "task": json.loads(confirmation.task.json()),
+            "expiresAt": self._clock() + self.ttl,
+        }
+        return self._put(entry, "stored")
+
+    def take(self, user_id: str, session_id: str, task_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Remove a confirmation and return its entry
+
+        Returns:
+            The entry, or None if it is unknown, expired or not owned by this
+            user and session
+        """
+        try:
+            entry = self.backend.take(task_id, user_id, session_id, self._clock())
+        except Exception as e:
+            logger.error(f"Error reading task confirmation {task_id}: {e}")
+            entry = None
+
+        if entry is None:
+            CONFIRMATION_STORE_OPERATIONS.inc(operation="missing")
+        return entry
+
+    def take_many(self, user_id: str, session_id: str, task_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """take() for several taskIds, in order"""
+        return [self.take(user_id, session_id, task_id) for task_id in task_ids]
+
+    def restore(self, entry: Dict[str, Any]) -> bool:
+        """
+        Put back an entry whose commit failed, so the user can retry
+
+        The entry gets a fresh expiresAt: the memory backend relies on
+        entries arriving in expiresAt order to purge expired ones.
+        """
+        return self._put({**entry, "expiresAt": self._clock() + self.ttl}, "restored")
+
+    def restore_many(self, entries: List[Dict[str, Any]]) -> int:
+        """restore() for several entries; returns how many were stored again"""
+        return sum(1 for entry in entries if self.restore(entry))
+
+    def _put(self, entry: Dict[str, Any], operation: str) -> bool:
+        try:
+            self.backend.put(entry)
+        except Exception as e:
+            logger.error(f"Error storing task confirmation {entry['taskId']}: {e}")
+            return False
+        CONFIRMATION_STORE_OPERATIONS.inc(operation=operation)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Backend size/configuration and the store's TTL"""
+        return {**self.backend.stats(), "ttl_seconds": self.ttl}
+
+
+def create_confirmation_store(db=None) -> ConfirmationStore:
+    """Store with the backend selected by CONFIRMATION_STORE_BACKEND"""
+    if CONFIRMATION_STORE_BACKEND == "firestore":
+        if db is not None:
+            return ConfirmationStore(FirestoreConfirmationBackend(db))
+        logger.warning("Firestore not available - task confirmations kept in memory")
+    elif CONFIRMATION_STORE_BACKEND != "memory":
+        logger.warning(f"Unknown CONFIRMATION_STORE_BACKEND '{CONFIRMATION_STORE_BACKEND}', using memory")
+    return ConfirmationStore(MemoryConfirmationBackend())
+
+
+confirmation_store = create_confirmation_store(firestore_service.db)
@@ -0,0 +1,179 @@
+"""
+Data Compactor Module
+Renders knowledge retriever results into a dense, token-budgeted prompt block
+
+Only the fields an answer needs are projected (no document IDs, no
+selectedAnswers maps) and rows are rendered as pipe-separated lines under a
+single header. Rows that do not fit the token budget are summarized as
+"... and N more"; totals over all rows are kept in the block title.
+"""
+
+import os
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Maximum estimated tokens for the retrieved-data block of the answer prompt
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "800"))
+
+# Llama tokenizers average roughly four characters per token for English text
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer round trip)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def format_duration(seconds: Any) -> str:
+    """Seconds -> '5h 20m' / '12m' / '0m'"""
+    try:
+        seconds = int(seconds or 0)
+    except (TypeError, ValueError):
+        return "0m"
+    hours, minutes = divmod(seconds // 60, 60)
+    return f"{hours}h {minutes}m" if hours else f"{minutes}m"
+
+
+def _cell(value: Any) -> str:
+    """One table cell: no separators or newlines, '-' for missing values"""
+    if value is None or value == "":
+        return "-"
+    return str(value).replace("|", "/").replace("\n", " ").strip()
+
+
+def _task_row(task: Dict[str, Any]) -> str:
+    subtasks = task.get("subTasks") or []
+    if subtasks:
+        done = sum(1 for subtask in subtasks if isinstance(subtask, dict) and subtask.get("completed"))
+        subtask_cell = f"{done}/{len(subtasks)}"
+    else:
+        subtask_cell = "-"
+
+    return " | ".join([
+        _cell(task.get("dueDate")),
+        _cell(task.get("description")),
+        _cell(task.get("priority", "medium")),
+        _cell(task.get("list", "Personal")),
+        "done" if task.get("completed") else "open",
+        "yes" if task.get("importance") else "no",
+        subtask_cell,
+    ])
+
+
+def _quiz_row(attempt: Dict[str, Any]) -> str:
+    taken = attempt.get("createdAt") or attempt.get("timestamp")
+    percentage = attempt.get("percentage")
+    if isinstance(percentage, (int, float)):
+        percentage = f"{percentage:g}%"
+
+    return " | ".join([
+        _cell(str(taken)[:10] if taken else None),
+        _cell(attempt.get("subject")),
+        _cell(attempt.get("category")),
+        _cell(attempt.get("year")),
+        f"{_cell(attempt.get('score'))}/{_cell(attempt.get('totalQuestions'))}",
+        _cell(percentage),
+    ])
+
+
+def _task_summary(tasks: List[Dict[str, Any]]) -> str:
+    done = sum(1 for task in tasks if task.get("completed"))
+    return f"{len(tasks) - done} open, {done} done"
+
+
+def _quiz_summary(attempts: List[Dict[str, Any]]) -> str:
+    percentages = [a["percentage"] for a in attempts if isinstance(a.get("percentage"), (int, float))]
+    if not percentages:
+        return ""
+    return f"average {sum(percentages) / len(percentages):.1f}%"
+
+
+# query_type -> (item name, column header, row renderer, summary over all rows)
+TABLES: Dict[str, Tuple[str, str, Callable[[Dict[str, Any]], str], Callable[[List[Dict[str, Any]]], str]]] = {
+    "tasks": ("tasks", "due | description | priority | list | status | important | subtasks done", _task_row, _task_summary),
+    "quizzes": ("quiz attempts", "date | subject | category | year | score | percentage", _quiz_row, _quiz_summary),
+}
+
+
+def _render_rows(
+    item_name: str,
+    header: str,
+    rows: List[str],
+    summary: str,
+    token_budget: int
+) -> Tuple[str, int]:
+    """Header plus as many rows as fit the budget; returns (text, rows shown)"""
+    title = f"{item_name} ({len(rows)} total" + (f"; {summary})" if summary else ")")
+    lines = [title, header]
+    used = estimate_tokens("\n".join(lines))
+
+    shown = 0
+    for row in rows:
+        cost = estimate_tokens(row) + 1
+        remaining = len(rows) - shown - 1
+        # Keep room for the "... and N more" line unless this is the last row
+        reserve = estimate_tokens(f"... and {remaining} more {item_name}") + 1 if remaining else 0
+        if used + cost + reserve > token_budget:
+            break
+        lines.append(row)
+        used += cost
+        shown += 1
+
+    if shown < len(rows):
+        lines.append(f"... and {len(rows) - shown} more {item_name}")
+    return "\n".join(lines), shown
+
+
+def compact_retrieved_data(
+    query_type: Optional[str],
+    data: Any,
+    token_budget: int = RETRIEVAL_TOKEN_BUDGET
+) -> Dict[str, Any]:
+    """
+    Render retrieved data for the answer prompt
+
+    Args:
+        query_type: "tasks", "timer_stats" or "quizzes" (anything else is
+            rendered as compact JSON)
+        data: Rows returned by FirestoreService (list or dict)
+        token_budget: Maximum estimated tokens of the rendered block
+
+    Returns:
+        Dictionary with the rendered text, rows total/shown, estimated tokens
+        of the text and tokens saved versus the indented JSON dump
+    """
+    if data is None or data == [] or data == {}:
+        text = "No matching records."
+        total = shown = 0
+
+    elif query_type in TABLES and isinstance(data, list):
+        item_name, header, render_row, summarize = TABLES[query_type]
+        items = [item for item in data if isinstance(item, dict)]
+        rows = [render_row(item) for item in items]
+        text, shown = _render_rows(item_name, header, rows, summarize(items), token_budget)
+        total = len(rows)
+
+    elif query_type == "timer_stats" and isinstance(data, dict):
+        present_time = data.get("presentTime", 0)
+        text = (
+            f"completed pomodoros: {data.get('completedPomodoros', 0)}\n"
+            f"total study time: {present_time} seconds ({format_duration(present_time)})"
+        )
+        total = shown = 1
+
+    else:
+        text = json.dumps(data, separators=(",", ":"), default=str)
+        total = shown = len(data) if isinstance(data, (list, dict)) else 1
+        limit = token_budget * CHARS_PER_TOKEN
+        if len(text) > limit:
+            text = text[:limit] + " ... (truncated)"
+
+    tokens = estimate_tokens(text)
+    baseline = estimate_tokens(json.dumps(data, indent=2, default=str))
+    return {
+        "text": text,
+        "rows_total": total,
+        "rows_shown": shown,
+        "tokens": tokens,
+        "tokens_saved": max(baseline - tokens, 0),
+    }
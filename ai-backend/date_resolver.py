@@ -0,0 +1,299 @@
+"""
+Date Resolver Module
+Resolves natural language due dates into YYYY-MM-DD (Asia/Colombo timezone)
+
+Resolution order:
+1. Memo cache keyed by (normalized phrase, current local date) - entries
+   expire when the local date rolls over at midnight
+2. Regex fast path for the common phrases the task extractor emits: ISO dates,
+   today/tomorrow/yesterday, weekday names, "in N days/weeks", "Month D"
+3. dateparser fallback for the long tail
+"""
+
+import re
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime, date, timedelta
+from typing import Optional, Dict, Any
+
+import dateparser
+import pytz
+
+logger = logging.getLogger(__name__)
+
+SRI_LANKA_TZ = pytz.timezone('Asia/Colombo')
+
+# dateparser settings (RELATIVE_BASE is filled in per call)
+DATEPARSER_SETTINGS = {
+    'PREFER_DATES_FROM': 'future',  # Prefer future dates for ambiguous inputs
+    'TIMEZONE': 'Asia/Colombo',  # Sri Lanka timezone
+    'RETURN_AS_TIMEZONE_AWARE': True,  # Return timezone-aware datetime
+    'PARSERS': ['relative-time', 'absolute-time', 'timestamp'],  # Enable all parsers
+}
+DATEPARSER_RETRY_SETTINGS = {
+    'PREFER_DATES_FROM': 'future',
+    'TIMEZONE': 'Asia/Colombo',
+    'RETURN_AS_TIMEZONE_AWARE': True,
+}
+
+DATE_MEMO_MAX_ENTRIES = 2048
+
+WEEKDAYS = {
+    "monday": 0, "mon": 0,
+    "tuesday": 1, "tue": 1, "tues": 1,
+    "wednesday": 2, "wed": 2,
+    "thursday": 3, "thu": 3, "thur": 3, "thurs": 3,
+    "friday": 4, "fri": 4,
+    "saturday": 5, "sat": 5,
+    "sunday": 6, "sun": 6,
+}
+
+MONTHS = {
+    "january": 1, "jan": 1,
+    "february": 2, "feb": 2,
+    "march": 3, "mar": 3,
+    "april": 4, "apr": 4,
+    "may": 5,
+    "june": 6, "jun": 6,
+    "july": 7, "jul": 7,
+    "august": 8, "aug": 8,
+    "september": 9, "sep": 9, "sept": 9,
+    "october": 10, "oct": 10,
+    "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+}
+
+# Phrases that resolve relative to "today" (offset in days)
+RELATIVE_DAYS = {
+    "today": 0,
+    "tonight": 0,
+    "this morning": 0,
+    "this afternoon": 0,
+    "this evening": 0,
+    "tomorrow": 1,
+    "day after tomorrow": 2,
+    "the day after tomorrow": 2,
+    "yesterday": -1,
+}
+
+_WEEKDAY_NAMES = "|".join(sorted(WEEKDAYS, key=len, reverse=True))
+_MONTH_NAMES = "|".join(sorted(MONTHS, key=len, reverse=True))
+
+_ISO_DATE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})$")
+_WEEKDAY = re.compile(rf"^(?:by |on )?(?:next )?({_WEEKDAY_NAMES})$")
+_IN_N_UNITS = re.compile(r"^in (\d+|a|an|one) (day|days|week|weeks)$")
+_MONTH_DAY = re.compile(rf"^(?:by |on )?({_MONTH_NAMES}) (\d{{1,2}})(?:st|nd|rd|th)?$")
+_DAY_MONTH = re.compile(rf"^(?:by |on )?(?:the )?(\d{{1,2}})(?:st|nd|rd|th)? (?:of )?({_MONTH_NAMES})$")
+
+# Results for these depend on the time of day, not just the date - never memoized
+_TIME_OF_DAY = re.compile(r"\b(hours?|hrs?|minutes?|mins?|seconds?|secs?|now|noon|midnight|am|pm)\b|\d:\d")
+
+_NO_MATCH = object()
+
+
+def _normalize(date_str: str) -> str:
+    """Lowercase, trim trailing punctuation and collapse whitespace"""
+    text = date_str.strip().lower().rstrip(".!,")
+    text = text.replace(",", " ")
+    return re.sub(r"\s+", " ", text)
+
+
+def _fast_path(phrase: str, today: date) -> Any:
+    """
+    Resolve common phrases without dateparser
+
+    Mirrors dateparser's PREFER_DATES_FROM='future' behaviour: weekday names
+    resolve to the next occurrence strictly after today, month/day dates to
+    the next occurrence on or after today.
+
+    Returns:
+        YYYY-MM-DD string, or _NO_MATCH when the phrase needs dateparser
+    """
+    if phrase in RELATIVE_DAYS:
+        return (today + timedelta(days=RELATIVE_DAYS[phrase])).strftime("%Y-%m-%d")
+
+    match = _ISO_DATE.match(phrase)
+    if match:
+        try:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3))).strftime("%Y-%m-%d")
+        except ValueError:
+            return _NO_MATCH
+
+    match = _WEEKDAY.match(phrase)
+    if match:
+        days_ahead = (WEEKDAYS[match.group(1)] - today.weekday()) % 7 or 7
+        return (today + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
+
+    match = _IN_N_UNITS.match(phrase)
+    if match:
+        count = 1 if match.group(1) in ("a", "an", "one") else int(match.group(1))
+        days = count * 7 if match.group(2).startswith("week") else count
+        return (today + timedelta(days=days)).strftime("%Y-%m-%d")
+
+    month = day = None
+    match = _MONTH_DAY.match(phrase)
+    if match:
+        month, day = MONTHS[match.group(1)], int(match.group(2))
+    else:
+        match = _DAY_MONTH.match(phrase)
+        if match:
+            month, day = MONTHS[match.group(2)], int(match.group(1))
+
+    if month:
+        try:
+            candidate = date(today.year, month, day)
+            if candidate < today:
+                candidate = date(today.year + 1, month, day)
+        except ValueError:
+            # e.g. February 29 outside a leap year - let dateparser decide
+            return _NO_MATCH
+        return candidate.strftime("%Y-%m-%d")
+
+    return _NO_MATCH
+
+
+def _parse_with_dateparser(date_str: str, now: datetime) -> Optional[str]:
+    """Long-tail parsing with dateparser (slow)"""
+    parsed_date = dateparser.parse(
+        date_str,
+        settings={**DATEPARSER_SETTINGS, 'RELATIVE_BASE': now},
+        languages=['en']  # Explicitly set English language
+    )
+
+    # If dateparser failed, try removing "next" and parsing just the day name
+    # dateparser handles "wednesday" better than "next wednesday"
+    if not parsed_date and date_str.lower().startswith('next '):
+        day_name = date_str[5:].strip()  # Remove "next " prefix
+        parsed_date = dateparser.parse(
+            day_name,
+            settings={**DATEPARSER_RETRY_SETTINGS, 'RELATIVE_BASE': now},
+            languages=['en']
+        )
+
+    if parsed_date:
+        # Convert to Sri Lanka timezone if not already
+        if parsed_date.tzinfo is None:
+            parsed_date = SRI_LANKA_TZ.localize(parsed_date)
+        else:
+            parsed_date = parsed_date.astimezone(SRI_LANKA_TZ)
+
+        return parsed_date.strftime("%Y-%m-%d")
+
+    return None
+
+
+class _DateMemo:
+    """Memo of resolved phrases for the current local date"""
+
+    def __init__(self, maxsize: int = DATE_MEMO_MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._day: Optional[date] = None
+        self._data: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fast_path = 0
+        self.dateparser = 0
+
+    def get(self, phrase: str, today: date) -> Any:
+        with self._lock:
+            if self._day != today:
+                # Local midnight passed - every relative phrase may resolve differently
+                self._data.clear()
+                self._day = today
+            if phrase in self._data:
+                self._data.move_to_end(phrase)
+                self.hits += 1
+                return self._data[phrase]
+            self.misses += 1
+            return _NO_MATCH
+
+    def set(self, phrase: str, today: date, value: Optional[str]):
+        with self._lock:
+            if self._day != today:
+                return
+            self._data[phrase] = value
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def count(self, path: str):
+        with self._lock:
+            setattr(self, path, getattr(self, path) + 1)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._day = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "fast_path": self.fast_path,
+                "dateparser": self.dateparser
+            }
+
+
+_memo = _DateMemo()
+
+
+def parse_natural_date(date_str: str) -> Optional[str]:
+    """
+    Parse natural language dates into YYYY-MM-DD format.
+    Timezone: Asia/Colombo (Sri Lanka)
+
+    Supported formats:
+    - "today", "tonight", "this afternoon", "this evening" -> current date in Sri Lanka timezone
+    - "tomorrow" -> current date + 1 day
+    - "next monday", "next friday", etc. -> next occurrence of that day
+    - "November 29", "Dec 5", "Jan 15" -> specific date in current/next year
+    - "2025-11-29" -> already formatted, return as-is
+    - "in 3 days", "in a week" -> relative dates
+    - And many more natural language formats (via dateparser)
+
+    Args:
+        date_str: Natural language date string
+
+    Returns:
+        Date in YYYY-MM-DD format or None if parsing fails
+    """
+    if not date_str or not isinstance(date_str, str):
+        return None
+
+    now_sri_lanka = datetime.now(SRI_LANKA_TZ)
+    today = now_sri_lanka.date()
+    phrase = _normalize(date_str)
+    memoizable = not _TIME_OF_DAY.search(phrase)
+
+    if memoizable:
+        cached = _memo.get(phrase, today)
+        if cached is not _NO_MATCH:
+            return cached
+
+    result = _fast_path(phrase, today)
+    if result is not _NO_MATCH:
+        _memo.count("fast_path")
+    else:
+        _memo.count("dateparser")
+        result = _parse_with_dateparser(date_str.strip(), now_sri_lanka)
+        if result is None:
+            # Could not parse - log for debugging
+            logger.warning(f"Failed to parse date string: '{date_str}'")
+
+    if memoizable:
+        _memo.set(phrase, today, result)
+    return result
+
+
+def clear_date_cache():
+    """Drop all memoized date resolutions"""
+    _memo.clear()
+
+
+def get_date_cache_stats() -> Dict[str, Any]:
+    """Memo hits/misses and how often each resolution path was used"""
+    return _memo.stats()
@@ -6,14 +6,105 @@ Handles all Firebase/Firestore database operations
 import os
 import json
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator, Tuple
 from datetime import datetime
 import firebase_admin
 from firebase_admin import credentials, firestore
+from google.api_core.exceptions import FailedPrecondition
+from google.cloud.firestore_v1 import FieldFilter
 from models import Task, User, UserRole, SubTask
+from cache import TTLCache, MISSING
+from task_index import TaskIndexCache, TASK_FIELD_DEFAULTS
+from metrics import timed, FIRESTORE_CALL_DURATION
+from single_flight import single_flight
+from snapshot_listeners import SnapshotListenerManager, SNAPSHOT_LISTENERS_ENABLED
+from query_strategy import OrderingStrategyMemory
 
 logger = logging.getLogger(__name__)
 
+# User profile cache (roles almost never change, so one document read per
+# user per TTL window is enough)
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "300"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+
+# Timer counters on users/{uid} - the frontend increments them on every
+# pomodoro, so they are only read through the user cache while a snapshot
+# listener keeps that user's profile fresh
+POMODORO_FIELDS = ("completedPomodoros", "presentTime")
+
+# Per-user in-memory task index (repeat data queries are answered from memory)
+TASK_INDEX_ENABLED = os.getenv("TASK_INDEX_ENABLED", "true").lower() == "true"
+
+# The frontend adds and edits tasks straight in Firestore, so by default the
+# index only serves users whose tasks snapshot listener keeps it fresh
+# (SNAPSHOT_LISTENERS_ENABLED). With false, query_tasks also hydrates it with
+# a full read trusted for TASK_INDEX_TTL_SECONDS - only safe when every task
+# write goes through this backend.
+TASK_INDEX_REQUIRE_LISTENER = os.getenv("TASK_INDEX_REQUIRE_LISTENER", "true").lower() == "true"
+TASK_INDEX_TTL_SECONDS = float(os.getenv("TASK_INDEX_TTL_SECONDS", "300"))
+TASK_INDEX_MAX_BYTES = int(os.getenv("TASK_INDEX_MAX_BYTES", str(32 * 1024 * 1024)))
+
+# Maximum writes per Firestore batch commit
+FIRESTORE_BATCH_LIMIT = 500
+
+# Default row caps of query_tasks and get_quiz_results (answers built from
+# a capped read must not present it as complete)
+TASK_QUERY_LIMIT = 100
+QUIZ_RESULTS_LIMIT = 50
+
+# Equality filters that have a composite index together with a dueDate range
+# (mirrors firestore.indexes.json - keep both in sync)
+TASK_QUERY_INDEXES = [
+    frozenset({"completed"}),
+    frozenset({"importance"}),
+    frozenset({"list"}),
+    frozenset({"priority"}),
+    frozenset({"completed", "importance"}),
+    frozenset({"completed", "list"}),
+    frozenset({"completed", "priority"}),
+]
+
+# paper_attempts fields the quiz answers use: everything but the per-question
+# selectedAnswers map (get_quiz_results(summary=True) projects to these)
+QUIZ_SUMMARY_FIELDS = (
+    "paperId", "subject", "category", "year", "score",
+    "totalQuestions", "percentage", "createdAt", "timestamp",
+)
+
+# Always kept in a projection: results are sorted by them
+QUIZ_SORT_FIELDS = ("createdAt", "timestamp")
+
+# Quiz result orderings tried in turn: by createdAt (the actual field in the
+# database), by timestamp, then an unordered read sorted in Python
+QUIZ_ORDERING_STRATEGIES = (*QUIZ_SORT_FIELDS, "unordered")
+QUIZ_RESULTS_SHAPE = "paper_attempts"
+
+
+def quiz_projection(fields: Optional[Iterable[str]] = None, summary: bool = False) -> Optional[Tuple[str, ...]]:
+    """Fields to select for a quiz results read (None = full documents)"""
+    if summary and fields is None:
+        fields = QUIZ_SUMMARY_FIELDS
+    if fields is None:
+        return None
+    return tuple(dict.fromkeys([*fields, *QUIZ_SORT_FIELDS]))
+
+
+def pomodoro_stats(user: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Timer counters of a user document (zero when missing)"""
+    user = user or {}
+    return {field: user.get(field, 0) for field in POMODORO_FIELDS}
+
+
+def project_attempts(attempts: List[Dict[str, Any]], fields: Optional[Tuple[str, ...]]) -> List[Dict[str, Any]]:
+    """Apply a projection to attempts read elsewhere (e.g. the snapshot listener)"""
+    if fields is None:
+        return attempts
+    return [
+        {key: value for key, value in attempt.items() if key in fields or key == 'id'}
+        for attempt in attempts
+    ]
+
+
 class FirestoreService:
     """Service class for Firestore operations"""
     
@@ -36,9 +127,38 @@ class FirestoreService:
                 print(f"Failed to initialize Firebase: {e}")
                 
         self.db = firestore.client()
+        
+        # Bounded TTL + LRU cache of users/{uid} documents
+        self.user_cache = TTLCache(
+            maxsize=USER_CACHE_MAX_ENTRIES,
+            ttl=USER_CACHE_TTL_SECONDS,
+            name="user_profiles"
+        )
+        
+        # Per-user task indexes, LRU-evicted under a memory cap
+        self.task_index = TaskIndexCache(
+            max_bytes=TASK_INDEX_MAX_BYTES,
+            ttl=TASK_INDEX_TTL_SECONDS
+        )
+        
+        # Optional real-time listeners that keep the caches above fresh for
+        # recently active users (see snapshot_listeners.py)
+        self.listeners = (
+            SnapshotListenerManager(self.db, self.task_index, self.user_cache)
+            if SNAPSHOT_LISTENERS_ENABLED else None
+        )
+        
+        # Which quiz ordering works, so failed orderings are not retried on every call
+        self.quiz_ordering = OrderingStrategyMemory(QUIZ_ORDERING_STRATEGIES)
     
+    @timed(FIRESTORE_CALL_DURATION)
+    @single_flight
     def get_user(self, uid: str) -> Optional[Dict[str, Any]]:
-        """Get user document by UID"""
+        """Get user document by UID (served from the user cache when fresh)"""
+        cached = self.user_cache.get(uid, MISSING)
+        if cached is not MISSING:
+            return dict(cached) if cached is not None else None
+        
         try:
             if not self.db:
                 raise Exception("Firestore not initialized")
@@ -46,14 +166,67 @@ class FirestoreService:
             doc_ref = self.db.collection('users').document(uid)
             doc = doc_ref.get()
             
-            if doc.exists:
-                return doc.to_dict()
-            return None
+            user = doc.to_dict() if doc.exists else None
+            
+            # Missing users are cached too; read errors are not
+            self.user_cache.set(uid, user)
+            return dict(user) if user is not None else None
             
         except Exception as e:
             logger.error(f"Error getting user {uid}: {e}")
             return None
     
+    def invalidate_user(self, uid: str):
+        """Drop a cached user document (call after the profile or role changes)"""
+        if self.user_cache.invalidate(uid):
+            logger.info(f"Invalidated cached profile for user {uid}")
+    
+    def clear_user_cache(self):
+        """Drop all cached user documents"""
+        self.user_cache.clear()
+    
+    def get_user_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters of the user profile cache"""
+        return self.user_cache.stats()
+    
+    def invalidate_task_index(self, uid: str):
+        """Drop a user's task index (next query re-reads their tasks)"""
+        if self.task_index.invalidate(uid):
+            logger.info(f"Invalidated task index for user {uid}")
+    
+    def get_task_index_stats(self) -> Dict[str, Any]:
+        """Size and hit/miss/eviction counters of the task index"""
+        return {"require_listener": TASK_INDEX_REQUIRE_LISTENER, **self.task_index.stats()}
+    
+    def needs_task_hydration(self, uid: str) -> bool:
+        """Whether a task query for the user would start with a full read of their tasks"""
+        return self._task_index_ready(uid) is None
+    
+    def track_active_user(self, uid: str):
+        """Mark a user as active so their snapshot listeners stay attached"""
+        if not self.listeners:
+            return
+        try:
+            self.listeners.touch(uid)
+        except Exception as e:
+            logger.error(f"Error attaching snapshot listeners for user {uid}: {e}")
+    
+    def get_query_strategy_stats(self) -> Dict[str, Any]:
+        """Chosen quiz ordering, orderings being skipped and wasted queries"""
+        return self.quiz_ordering.stats()
+    
+    def get_listener_stats(self) -> Dict[str, Any]:
+        """Snapshot listener counters (enabled flag only when disabled)"""
+        if not self.listeners:
+            return {"enabled": False}
+        return {"enabled": True, **self.listeners.stats()}
+    
+    def close_listeners(self):
+        """Detach all snapshot listeners"""
+        if self.listeners:
+            self.listeners.close()
+    
+    @timed(FIRESTORE_CALL_DURATION)
     def get_user_role(self, uid: str) -> UserRole:
         """Get user role, defaults to STUDENT"""
         try:
@@ -65,6 +238,37 @@ class FirestoreService:
             logger.error(f"Error getting user role: {e}")
             return UserRole.STUDENT
     
+    @staticmethod
+    def _task_document(task_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Firestore document for a new task (defaults applied, subtasks as SubTask maps)"""
+        task_to_add = {
+            "description": task_data.get("description"),
+            "dueDate": task_data.get("dueDate"),
+            "priority": task_data.get("priority", "medium"),
+            "completed": task_data.get("completed", False),
+            "list": task_data.get("list", "Personal"),
+            "importance": task_data.get("importance", False),
+            "createdDate": datetime.now().isoformat()
+        }
+        
+        # Handle subtasks
+        if task_data.get("subTasks"):
+            if isinstance(task_data["subTasks"], list):
+                # Convert list of strings to SubTask objects
+                task_to_add["subTasks"] = [
+                    {"description": st, "completed": False} 
+                    for st in task_data["subTasks"]
+                ]
+            elif isinstance(task_data["subTasks"], str):
+                # Single string, convert to list
+                task_to_add["subTasks"] = [
+                    {"description": task_data["subTasks"], "completed": False}
+                ]
+        else:
+            task_to_add["subTasks"] = None
+        return task_to_add
+    
+    @timed(FIRESTORE_CALL_DURATION)
     def add_task(self, uid: str, task_data: Dict[str, Any]) -> bool:
         """
         Add a task to user's tasks sub-collection
@@ -80,36 +284,12 @@ class FirestoreService:
             if not self.db:
                 raise Exception("Firestore not initialized")
             
-            # Prepare task data
-            task_to_add = {
-                "description": task_data.get("description"),
-                "dueDate": task_data.get("dueDate"),
-                "priority": task_data.get("priority", "medium"),
-                "completed": task_data.get("completed", False),
-                "list": task_data.get("list", "Personal"),
-                "importance": task_data.get("importance", False),
-                "createdDate": datetime.now().isoformat()
-            }
-            
-            # Handle subtasks
-            if task_data.get("subTasks"):
-                if isinstance(task_data["subTasks"], list):
-                    # Convert list of strings to SubTask objects
-                    task_to_add["subTasks"] = [
-                        {"description": st, "completed": False} 
-                        for st in task_data["subTasks"]
-                    ]
-                elif isinstance(task_data["subTasks"], str):
-                    # Single string, convert to list
-                    task_to_add["subTasks"] = [
-                        {"description": task_data["subTasks"], "completed": False}
-                    ]
-            else:
-                task_to_add["subTasks"] = None
+            task_to_add = self._task_document(task_data)
             
             # Add to Firestore
             task_ref = self.db.collection('users').document(uid).collection('tasks').document()
             task_ref.set(task_to_add)
+            self._tasks_added(uid, [(task_ref.id, task_to_add)])
             
             logger.info(f"Task added successfully for user {uid}: {task_to_add['description']}")
             return True
@@ -118,6 +298,76 @@ class FirestoreService:
             logger.error(f"Error adding task for user {uid}: {e}")
             return False
     
+    @timed(FIRESTORE_CALL_DURATION)
+    def add_tasks(self, uid: str, tasks: List[Dict[str, Any]]) -> List[Optional[str]]:
+        """
+        Add several tasks with batched writes (one commit per
+        FIRESTORE_BATCH_LIMIT tasks instead of one round trip per task)
+        
+        Args:
+            uid: User ID
+            tasks: Task data dictionaries
+            
+        Returns:
+            Document ID per task, None for tasks whose batch failed
+        """
+        task_ids: List[Optional[str]] = [None] * len(tasks)
+        if not self.db:
+            logger.error(f"Error adding tasks for user {uid}: Firestore not initialized")
+            return task_ids
+        
+        for start, batch, written in self._task_batches(self.db, uid, tasks):
+            try:
+                batch.commit()
+            except Exception as e:
+                logger.error(f"Error adding {len(written)} tasks for user {uid}: {e}")
+                continue
+            task_ids[start:start + len(written)] = self._tasks_added(uid, written)
+        
+        logger.info(f"Batch added {sum(1 for task_id in task_ids if task_id)}/{len(tasks)} tasks for user {uid}")
+        return task_ids
+    
+    def _task_batches(
+        self,
+        db,
+        uid: str,
+        tasks: List[Dict[str, Any]]
+    ) -> Iterator[Tuple[int, Any, List[Tuple[str, Dict[str, Any]]]]]:
+        """
+        Batched writes of new task documents, FIRESTORE_BATCH_LIMIT per batch
+        (db is the sync or the async client; the caller commits each batch)
+        
+        Yields:
+            (index of the batch's first task, batch, [(document ID, document)])
+        """
+        tasks_ref = db.collection('users').document(uid).collection('tasks')
+        for start in range(0, len(tasks), FIRESTORE_BATCH_LIMIT):
+            batch = db.batch()
+            written = []
+            for task_data in tasks[start:start + FIRESTORE_BATCH_LIMIT]:
+                task_to_add = self._task_document(task_data)
+                task_ref = tasks_ref.document()
+                batch.set(task_ref, task_to_add)
+                written.append((task_ref.id, task_to_add))
+            yield start, batch, written
+    
+    def _tasks_added(self, uid: str, written: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """Index committed task documents; returns their document IDs"""
+        for task_id, task_to_add in written:
+            self.task_index.upsert_task(uid, {**task_to_add, "id": task_id})
+        return [task_id for task_id, _ in written]
+    
+    @staticmethod
+    def _collect(query) -> List[Dict[str, Any]]:
+        """Stream a query into dictionaries with their document id"""
+        documents = []
+        for doc in query.stream():
+            data = doc.to_dict()
+            data['id'] = doc.id
+            documents.append(data)
+        return documents
+    
+    @timed(FIRESTORE_CALL_DURATION)
     def get_user_tasks(self, uid: str, limit: int = 50) -> List[Dict[str, Any]]:
         """
         Get user's tasks
@@ -135,12 +385,7 @@ class FirestoreService:
             
             tasks_ref = self.db.collection('users').document(uid).collection('tasks')
             query = tasks_ref.order_by('createdDate', direction=firestore.Query.DESCENDING).limit(limit)
-            
-            tasks = []
-            for doc in query.stream():
-                task_data = doc.to_dict()
-                task_data['id'] = doc.id
-                tasks.append(task_data)
+            tasks = self._collect(query)
             
             logger.info(f"Retrieved {len(tasks)} tasks for user {uid}")
             return tasks
@@ -149,6 +394,207 @@ class FirestoreService:
             logger.error(f"Error getting tasks for user {uid}: {e}")
             return []
     
+    @staticmethod
+    def _task_filters(
+        completed: Optional[bool],
+        importance: Optional[bool],
+        task_list: Optional[str],
+        priority: Optional[str]
+    ) -> Dict[str, Any]:
+        """query_tasks arguments as equality filters (None = no filter)"""
+        return {
+            field: value
+            for field, value in (
+                ("completed", completed),
+                ("importance", importance),
+                ("list", task_list),
+                ("priority", priority),
+            )
+            if value is not None
+        }
+    
+    def _plan_task_query(
+        self,
+        start_date: Optional[str],
+        end_date: Optional[str],
+        equality: Dict[str, Any],
+        limit: int
+    ) -> Dict[str, Any]:
+        """
+        Decide which task predicates Firestore evaluates and which stay in Python
+        
+        Equality-only queries are served by Firestore's automatic single-field
+        indexes, so every predicate is pushed down. A dueDate range (with its
+        dueDate ordering) needs a composite index per equality combination:
+        the largest combination listed in TASK_QUERY_INDEXES is pushed down and
+        the remaining predicates are applied in Python.
+        
+        A filter whose value is the field's default (completed == False,
+        list == 'Personal', ...) always stays in Python: documents written
+        without the field must still match, and Firestore equality never
+        matches a missing field.
+        
+        The limit can only be pushed down when Firestore both filters and
+        orders the results; otherwise it is applied after filtering/sorting.
+        
+        Returns:
+            Dictionary with server-side equality filters, residual Python-side
+            filters, whether the dueDate range is pushed down and the
+            server-side limit (None = read every match)
+        """
+        defaulted = {
+            field: value for field, value in equality.items()
+            if field in TASK_FIELD_DEFAULTS and TASK_FIELD_DEFAULTS[field] == value
+        }
+        pushable = {field: value for field, value in equality.items() if field not in defaulted}
+        
+        if not (start_date or end_date):
+            return {"server": pushable, "residual": defaulted, "date_range": False, "limit": None}
+        
+        fields = frozenset(pushable)
+        best = max(
+            (combo for combo in TASK_QUERY_INDEXES if combo <= fields),
+            key=len,
+            default=frozenset()
+        )
+        residual = {
+            **defaulted,
+            **{field: value for field, value in pushable.items() if field not in best}
+        }
+        return {
+            "server": {field: value for field, value in pushable.items() if field in best},
+            "residual": residual,
+            "date_range": True,
+            "limit": None if residual else limit
+        }
+    
+    @staticmethod
+    def _fallback_task_plan(plan: Dict[str, Any], equality: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        """Plan to retry with after Firestore reported a missing index: dueDate range only"""
+        logger.warning(f"Missing Firestore index for task query {plan['server']}, "
+                       f"filtering in Python instead: {error}")
+        return {"server": {}, "residual": equality, "date_range": plan["date_range"], "limit": None}
+    
+    @staticmethod
+    def _task_query(
+        tasks_ref,
+        plan: Dict[str, Any],
+        start_date: Optional[str],
+        end_date: Optional[str]
+    ):
+        """Build a planned task query on a sync or async tasks collection reference"""
+        query = tasks_ref
+        
+        for field, value in plan["server"].items():
+            query = query.where(filter=FieldFilter(field, "==", value))
+        
+        if plan["date_range"]:
+            if start_date:
+                query = query.where(filter=FieldFilter("dueDate", ">=", start_date))
+            if end_date:
+                query = query.where(filter=FieldFilter("dueDate", "<=", end_date))
+            query = query.order_by("dueDate")
+        
+        if plan["limit"]:
+            query = query.limit(plan["limit"])
+        return query
+    
+    def _stream_tasks(
+        self,
+        uid: str,
+        plan: Dict[str, Any],
+        start_date: Optional[str],
+        end_date: Optional[str]
+    ) -> List[Dict[str, Any]]:
+        """Run a planned task query and return the matching documents"""
+        tasks_ref = self.db.collection('users').document(uid).collection('tasks')
+        return self._collect(self._task_query(tasks_ref, plan, start_date, end_date))
+    
+    @staticmethod
+    def _finish_task_query(
+        uid: str,
+        tasks: List[Dict[str, Any]],
+        plan: Dict[str, Any],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """Apply the plan's residual filters, the dueDate ordering and the limit in Python"""
+        logger.info(f"Fetched {len(tasks)} tasks from Firestore "
+                    f"(pushed down: {sorted(plan['server'])}, in Python: {sorted(plan['residual'])})")
+        
+        # Residual filters for combinations without a composite index
+        filtered_tasks = [
+            task for task in tasks
+            if all(task.get(field, TASK_FIELD_DEFAULTS[field]) == value
+                   for field, value in plan["residual"].items())
+        ]
+        
+        # Sort by dueDate (ascending), tasks without dueDate go to the end
+        if not plan["date_range"]:
+            filtered_tasks.sort(key=lambda x: x.get('dueDate') or '9999-12-31')
+        filtered_tasks = filtered_tasks[:limit]
+        
+        logger.info(f"Query returned {len(filtered_tasks)} filtered tasks for user {uid}")
+        
+        # Log a summary of returned tasks
+        if filtered_tasks:
+            logger.info(f"Sample tasks: {[{'desc': t.get('description', 'No desc')[:30], 'due': t.get('dueDate', 'No date'), 'completed': t.get('completed', False)} for t in filtered_tasks[:3]]}")
+        
+        return filtered_tasks
+    
+    def _task_index_ready(self, uid: str) -> Optional[bool]:
+        """
+        Whether a user's task index can serve queries, when that is known
+        without a read
+        
+        Returns:
+            True (indexed), False (index disabled, or only listeners may
+            hydrate it) or None (hydrate it with a full read first)
+        """
+        if not TASK_INDEX_ENABLED:
+            return False
+        if uid in self.task_index:
+            return True
+        if TASK_INDEX_REQUIRE_LISTENER:
+            return False
+        return None
+    
+    def _install_task_index(self, uid: str, tasks: List[Dict[str, Any]], version: int) -> bool:
+        """Install a hydration read taken after version(); False if stale or over the cap"""
+        logger.info(f"Hydrated task index for user {uid} with {len(tasks)} tasks")
+        return self.task_index.hydrate(uid, tasks, version=version)
+    
+    def _indexed_tasks(self, uid: str, **kwargs) -> Optional[List[Dict[str, Any]]]:
+        """Query a hydrated task index (None when the user is not indexed)"""
+        indexed = self.task_index.query(uid, **kwargs)
+        if indexed is not None:
+            logger.info(f"Query returned {len(indexed)} tasks from the task index for user {uid}")
+        return indexed
+    
+    def _ensure_task_index(self, uid: str) -> bool:
+        """
+        Hydrate a user's task index on first access
+        
+        Returns:
+            True if the user's tasks are indexed (False when the index is
+            disabled, only listeners may hydrate it, the read failed or the
+            tasks exceed the memory cap)
+        """
+        ready = self._task_index_ready(uid)
+        if ready is not None:
+            return ready
+        
+        # Writes that land while the read is in flight make it stale
+        version = self.task_index.version()
+        try:
+            tasks = self._collect(self.db.collection('users').document(uid).collection('tasks'))
+        except Exception as e:
+            logger.warning(f"Could not hydrate task index for user {uid}, querying Firestore directly: {e}")
+            return False
+        
+        return self._install_task_index(uid, tasks, version)
+    
+    @timed(FIRESTORE_CALL_DURATION)
+    @single_flight
     def query_tasks(
         self, 
         uid: str, 
@@ -158,12 +604,18 @@ class FirestoreService:
         importance: Optional[bool] = None,
         task_list: Optional[str] = None,
         priority: Optional[str] = None,
-        limit: int = 100
+        limit: int = TASK_QUERY_LIMIT
     ) -> List[Dict[str, Any]]:
         """
         Query user's tasks with filtering and sorting.
-        Since Firestore has limitations on compound queries without specific indexes,
-        we fetch tasks and filter in Python.
+        Served from the user's in-memory task index while a snapshot listener
+        keeps it fresh (or, with TASK_INDEX_REQUIRE_LISTENER=false, after one
+        full read on first access). Otherwise predicates are pushed
+        down to Firestore as where clauses wherever an index exists (see
+        _plan_task_query and firestore.indexes.json); only predicates without
+        a matching composite index are filtered in Python.
+        If Firestore reports a missing index (e.g. indexes not deployed yet),
+        the query is retried with the dueDate range alone.
         
         Args:
             uid: User ID
@@ -173,7 +625,7 @@ class FirestoreService:
             importance: Filter by importance status (True/False/None for all)
             task_list: Filter by list name ("Personal", "Work", "Study", or None for all)
             priority: Filter by priority ("low", "medium", "high", or None for all)
-            limit: Maximum number of tasks to fetch initially
+            limit: Maximum number of tasks to return
             
         Returns:
             List of task dictionaries sorted by dueDate (ascending)
@@ -185,85 +637,37 @@ class FirestoreService:
             logger.info(f"Querying tasks for user {uid} with filters: start_date={start_date}, end_date={end_date}, "
                        f"completed={completed}, importance={importance}, list={task_list}, priority={priority}")
             
-            # Fetch all user tasks (or up to limit)
-            tasks_ref = self.db.collection('users').document(uid).collection('tasks')
-            query = tasks_ref.limit(limit)
-            
-            tasks = []
-            for doc in query.stream():
-                task_data = doc.to_dict()
-                task_data['id'] = doc.id
-                tasks.append(task_data)
-            
-            logger.info(f"Fetched {len(tasks)} total tasks from Firestore")
-            
-            # Filter in Python
-            filtered_tasks = []
-            for task in tasks:
-                should_include = True
-                
-                # Date range filtering
-                if start_date and task.get('dueDate'):
-                    if task['dueDate'] < start_date:
-                        should_include = False
-                        logger.debug(f"Filtered out task (dueDate {task['dueDate']} < start_date {start_date}): {task.get('description', 'No description')}")
-                
-                if should_include and end_date and task.get('dueDate'):
-                    if task['dueDate'] > end_date:
-                        should_include = False
-                        logger.debug(f"Filtered out task (dueDate {task['dueDate']} > end_date {end_date}): {task.get('description', 'No description')}")
-                
-                # For date range queries, skip tasks without due dates
-                if should_include and (start_date or end_date) and not task.get('dueDate'):
-                    should_include = False
-                    logger.debug(f"Filtered out task (no dueDate for date range query): {task.get('description', 'No description')}")
-                
-                # Completion status filtering
-                if should_include and completed is not None:
-                    if task.get('completed', False) != completed:
-                        should_include = False
-                        logger.debug(f"Filtered out task (completed={task.get('completed', False)} != {completed}): {task.get('description', 'No description')}")
-                
-                # Importance filtering
-                if should_include and importance is not None:
-                    if task.get('importance', False) != importance:
-                        should_include = False
-                        logger.debug(f"Filtered out task (importance={task.get('importance', False)} != {importance}): {task.get('description', 'No description')}")
-                
-                # List filtering
-                if should_include and task_list is not None:
-                    if task.get('list', 'Personal') != task_list:
-                        should_include = False
-                        logger.debug(f"Filtered out task (list={task.get('list', 'Personal')} != {task_list}): {task.get('description', 'No description')}")
-                
-                # Priority filtering
-                if should_include and priority is not None:
-                    if task.get('priority', 'medium') != priority:
-                        should_include = False
-                        logger.debug(f"Filtered out task (priority={task.get('priority', 'medium')} != {priority}): {task.get('description', 'No description')}")
-                
-                if should_include:
-                    filtered_tasks.append(task)
-            
-            # Sort by dueDate (ascending), tasks without dueDate go to the end
-            filtered_tasks.sort(key=lambda x: x.get('dueDate') or '9999-12-31')
+            equality = self._task_filters(completed, importance, task_list, priority)
             
-            logger.info(f"Query returned {len(filtered_tasks)} filtered tasks for user {uid}")
+            if self._ensure_task_index(uid):
+                indexed = self._indexed_tasks(
+                    uid, start_date=start_date, end_date=end_date, filters=equality, limit=limit
+                )
+                if indexed is not None:
+                    return indexed
             
-            # Log a summary of returned tasks
-            if filtered_tasks:
-                logger.info(f"Sample tasks: {[{'desc': t.get('description', 'No desc')[:30], 'due': t.get('dueDate', 'No date'), 'completed': t.get('completed', False)} for t in filtered_tasks[:3]]}")
+            plan = self._plan_task_query(start_date, end_date, equality, limit)
+            try:
+                tasks = self._stream_tasks(uid, plan, start_date, end_date)
+            except FailedPrecondition as index_error:
+                plan = self._fallback_task_plan(plan, equality, index_error)
+                tasks = self._stream_tasks(uid, plan, start_date, end_date)
             
-            return filtered_tasks
+            return self._finish_task_query(uid, tasks, plan, limit)
             
         except Exception as e:
             logger.error(f"Error querying tasks for user {uid}: {e}", exc_info=True)
             return []
     
+    @timed(FIRESTORE_CALL_DURATION)
     def get_pomodoro_stats(self, uid: str) -> Dict[str, Any]:
         """
         Get user's pomodoro statistics
         
+        The counters change on every pomodoro, so they come from the user
+        cache only while a snapshot listener keeps it fresh; otherwise the
+        two fields are read from Firestore (the role lookup stays cached)
+        
         Args:
             uid: User ID
             
@@ -271,25 +675,42 @@ class FirestoreService:
             Dictionary with pomodoro stats
         """
         try:
-            user = self.get_user(uid)
-            if user:
-                return {
-                    "completedPomodoros": user.get("completedPomodoros", 0),
-                    "presentTime": user.get("presentTime", 0)
-                }
-            return {"completedPomodoros": 0, "presentTime": 0}
+            if self.listeners and self.listeners.is_live(uid, "user"):
+                return pomodoro_stats(self.get_user(uid))
+            return pomodoro_stats(self._read_pomodoro_fields(uid))
             
         except Exception as e:
             logger.error(f"Error getting pomodoro stats for user {uid}: {e}")
-            return {"completedPomodoros": 0, "presentTime": 0}
+            return pomodoro_stats(None)
     
-    def get_quiz_results(self, uid: str, limit: int = 50) -> List[Dict[str, Any]]:
+    @single_flight
+    def _read_pomodoro_fields(self, uid: str) -> Optional[Dict[str, Any]]:
+        """Uncached read of the timer counters on users/{uid}"""
+        if not self.db:
+            raise Exception("Firestore not initialized")
+        
+        doc = self.db.collection('users').document(uid).get(field_paths=list(POMODORO_FIELDS))
+        return doc.to_dict() if doc.exists else None
+    
+    @timed(FIRESTORE_CALL_DURATION)
+    @single_flight
+    def get_quiz_results(
+        self,
+        uid: str,
+        limit: int = QUIZ_RESULTS_LIMIT,
+        fields: Optional[Tuple[str, ...]] = None,
+        summary: bool = False
+    ) -> List[Dict[str, Any]]:
         """
         Get user's quiz results from paper_attempts sub-collection
         
         Args:
             uid: User ID
             limit: Maximum number of results to retrieve
+            fields: Only read these fields (Firestore select); createdAt and
+                timestamp are always included for sorting
+            summary: Read QUIZ_SUMMARY_FIELDS only, skipping the per-question
+                selectedAnswers map (use get_quiz_attempt for a full document)
             
         Returns:
             List of paper attempt dictionaries sorted by createdAt (if available)
@@ -298,56 +719,98 @@ class FirestoreService:
             if not self.db:
                 raise Exception("Firestore not initialized")
             
-            attempts_ref = self.db.collection('users').document(uid).collection('paper_attempts')
+            projection = quiz_projection(fields, summary)
             
-            # Try to order by createdAt (the actual field name in the database)
-            # Fall back to timestamp, and finally to unordered fetch
-            try:
-                # First try: order by createdAt (actual field in database)
-                query = attempts_ref.order_by('createdAt', direction=firestore.Query.DESCENDING).limit(limit)
-                results = []
-                for doc in query.stream():
-                    attempt_data = doc.to_dict()
-                    attempt_data['id'] = doc.id
-                    results.append(attempt_data)
-                logger.info(f"Retrieved {len(results)} quiz results (ordered by createdAt) for user {uid}")
-            except Exception as order_error:
-                logger.warning(f"Could not order by createdAt, trying timestamp: {order_error}")
+            live = self._live_quiz_results(uid, limit, projection)
+            if live is not None:
+                return live
+            
+            attempts_ref = self._attempts_ref(self.db, uid, projection)
+            
+            # Orderings that failed recently are skipped (see query_strategy.py)
+            for strategy in self.quiz_ordering.plan(QUIZ_RESULTS_SHAPE):
                 try:
-                    # Second try: order by timestamp (for future compatibility)
-                    query = attempts_ref.order_by('timestamp', direction=firestore.Query.DESCENDING).limit(limit)
-                    results = []
-                    for doc in query.stream():
-                        attempt_data = doc.to_dict()
-                        attempt_data['id'] = doc.id
-                        results.append(attempt_data)
-                    logger.info(f"Retrieved {len(results)} quiz results (ordered by timestamp) for user {uid}")
-                except Exception as timestamp_error:
-                    # Final fallback: fetch without ordering
-                    logger.warning(f"Could not order by timestamp either, fetching unordered: {timestamp_error}")
-                    query = attempts_ref.limit(limit)
-                    results = []
-                    for doc in query.stream():
-                        attempt_data = doc.to_dict()
-                        attempt_data['id'] = doc.id
-                        results.append(attempt_data)
-                    
-                    # Sort in Python by createdAt or timestamp if available
-                    results.sort(key=lambda x: x.get('createdAt') or x.get('timestamp') or '', reverse=True)
-                    logger.info(f"Retrieved {len(results)} quiz results (unordered fetch, sorted in Python) for user {uid}")
-            
-            # Log sample data for debugging if results exist
-            if results:
-                logger.info(f"Sample quiz result: {json.dumps(results[0], indent=2, default=str)}")
-            else:
-                logger.info(f"No quiz results found for user {uid}")
-            
-            return results
+                    results = self._collect(self._ordered_attempts(attempts_ref, strategy, limit))
+                except Exception as order_error:
+                    self._quiz_ordering_failed(strategy, order_error)
+                    continue
+                return self._quiz_results_read(uid, strategy, results)
+            return []
             
         except Exception as e:
             logger.error(f"Error getting quiz results for user {uid}: {e}", exc_info=True)
             return []
     
+    def _live_quiz_results(
+        self,
+        uid: str,
+        limit: int,
+        projection: Optional[Tuple[str, ...]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Quiz results from the snapshot listener, or None when none covers this user"""
+        live = self.listeners.get_quiz_attempts(uid) if self.listeners else None
+        if live is None:
+            return None
+        logger.info(f"Retrieved {len(live[:limit])} quiz results (live listener) for user {uid}")
+        return project_attempts(live[:limit], projection)
+    
+    @staticmethod
+    def _attempts_ref(db, uid: str, projection: Optional[Tuple[str, ...]]):
+        """paper_attempts of a user on a sync or async client, projected if requested"""
+        attempts_ref = db.collection('users').document(uid).collection('paper_attempts')
+        return attempts_ref.select(projection) if projection is not None else attempts_ref
+    
+    @staticmethod
+    def _ordered_attempts(attempts_ref, strategy: str, limit: int):
+        """Newest-first attempts query for an ordering strategy ("unordered" sorts in Python)"""
+        if strategy == "unordered":
+            return attempts_ref.limit(limit)
+        return attempts_ref.order_by(strategy, direction=firestore.Query.DESCENDING).limit(limit)
+    
+    def _quiz_ordering_failed(self, strategy: str, error: Exception):
+        """Record a failed ordering; the final fallback has nothing left to try, so it re-raises"""
+        if strategy == self.quiz_ordering.strategies[-1]:
+            raise error
+        self.quiz_ordering.record_failure(QUIZ_RESULTS_SHAPE, strategy, error)
+    
+    def _quiz_results_read(self, uid: str, strategy: str, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Finish a successful quiz read: sort unordered results and note the strategy"""
+        if strategy == "unordered":
+            results.sort(key=lambda x: x.get('createdAt') or x.get('timestamp') or '', reverse=True)
+        self.quiz_ordering.record_success(QUIZ_RESULTS_SHAPE, strategy)
+        logger.info(f"Retrieved {len(results)} quiz results (ordering: {strategy}) for user {uid}")
+        if not results:
+            logger.info(f"No quiz results found for user {uid}")
+        return results
+    
+    @timed(FIRESTORE_CALL_DURATION)
+    def get_quiz_attempt(self, uid: str, attempt_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get one full paper attempt (including selectedAnswers)
+        
+        Args:
+            uid: User ID
+            attempt_id: paper_attempts document ID
+            
+        Returns:
+            Attempt dictionary with its id, or None if not found
+        """
+        try:
+            if not self.db:
+                raise Exception("Firestore not initialized")
+            
+            doc = self.db.collection('users').document(uid).collection('paper_attempts').document(attempt_id).get()
+            if not doc.exists:
+                return None
+            attempt = doc.to_dict()
+            attempt['id'] = doc.id
+            return attempt
+            
+        except Exception as e:
+            logger.error(f"Error getting quiz attempt {attempt_id} for user {uid}: {e}")
+            return None
+    
+    @timed(FIRESTORE_CALL_DURATION)
     def update_task(self, uid: str, task_id: str, updates: Dict[str, Any]) -> bool:
         """
         Update a task
@@ -366,6 +829,7 @@ class FirestoreService:
             
             task_ref = self.db.collection('users').document(uid).collection('tasks').document(task_id)
             task_ref.update(updates)
+            self.task_index.update_task(uid, task_id, updates)
             
             logger.info(f"Task {task_id} updated for user {uid}")
             return True
@@ -374,6 +838,7 @@ class FirestoreService:
             logger.error(f"Error updating task {task_id} for user {uid}: {e}")
             return False
     
+    @timed(FIRESTORE_CALL_DURATION)
     def delete_task(self, uid: str, task_id: str) -> bool:
         """
         Delete a task
@@ -391,6 +856,7 @@ class FirestoreService:
             
             task_ref = self.db.collection('users').document(uid).collection('tasks').document(task_id)
             task_ref.delete()
+            self.task_index.remove_task(uid, task_id)
             
             logger.info(f"Task {task_id} deleted for user {uid}")
             return True
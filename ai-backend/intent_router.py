@@ -0,0 +1,324 @@
+"""
+Intent Router Module
+Deterministic (zero-LLM) intent pre-classifier that runs in front of the LLM router.
+
+Most chat traffic is trivially classifiable ("hi", "thanks", "show my tasks",
+"how many pomodoros", "add a task to ..."). Keyword/pattern rules resolve those
+messages without a Groq round trip; anything the rules are unsure about falls
+back to the LLM router node.
+
+The LLM router's confident answers are kept in a shared classification cache
+keyed on the normalized message. The router prompt contains nothing but the
+message, so cached classifications are safe to reuse across users.
+"""
+
+import os
+import re
+import threading
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Minimum rule confidence required to skip the LLM router
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "true").lower() == "true"
+FAST_ROUTER_MIN_CONFIDENCE = float(os.getenv("FAST_ROUTER_MIN_CONFIDENCE", "0.85"))
+
+# Shared cache of LLM router classifications (normalized message -> intent)
+ROUTER_CACHE_ENABLED = os.getenv("ROUTER_CACHE_ENABLED", "true").lower() == "true"
+ROUTER_CACHE_TTL_SECONDS = float(os.getenv("ROUTER_CACHE_TTL_SECONDS", "3600"))
+ROUTER_CACHE_MAX_ENTRIES = int(os.getenv("ROUTER_CACHE_MAX_ENTRIES", "4096"))
+ROUTER_CACHE_MIN_CONFIDENCE = float(os.getenv("ROUTER_CACHE_MIN_CONFIDENCE", "0.9"))
+
+# Longer messages are rarely repeated verbatim - not worth a cache slot
+ROUTER_CACHE_MAX_MESSAGE_CHARS = 200
+
+# Messages longer than this (in words) lose confidence per extra word:
+# long messages tend to mix intents and deserve the LLM's judgement
+LONG_MESSAGE_WORDS = 12
+LONG_MESSAGE_PENALTY = 0.03
+
+# Confidence deducted when rules for different intents match the same message
+AMBIGUITY_PENALTY = 0.3
+
+# Advice phrasing ("how many pomodoros should I do", "my quiz scores are bad, any tips")
+# mentions the user's data without asking for it - leave those to the LLM router
+NOT_ADVICE = r"(?!.*\b(should|shall|ought|tips?|advice|best|ideal|recommend\w*|suggest\w*|improve|better|bad)\b)"
+
+# (rule name, intent, pattern, confidence) - patterns run against the normalized message
+INTENT_RULES: List[Tuple[str, str, str, float]] = [
+    # small_talk
+    ("greeting", "small_talk",
+     r"^(hi+|hello+|hey+|hiya|yo|howdy|greetings|good (morning|afternoon|evening|day))( there| studymate| buddy| friend)?$", 0.97),
+    ("thanks", "small_talk",
+     r"^(thanks|thank you|thank u|thx|ty|cheers)( (so|very) much| a lot)?( for (the|your) help)?$", 0.97),
+    ("how_are_you", "small_talk",
+     r"^(how are you|how's it going|how are things|what's up|sup)( doing)?( today)?$", 0.95),
+    ("capabilities", "small_talk",
+     r"^(what can you do|who are you|what are you|how do you work|help)$", 0.92),
+    ("farewell", "small_talk",
+     r"^(bye|goodbye|bye bye|see you|see ya|good ?night|later)$", 0.95),
+    ("acknowledgement", "small_talk",
+     r"^(ok|okay|cool|great|nice|awesome|got it|sounds good)$", 0.9),
+
+    # data_query
+    ("show_tasks", "data_query",
+     r"^(can you )?(show|list|display|view|get|see)( me)?( all)?( of)? my( \w+)* (tasks|to-?dos)\b", 0.95),
+    ("what_tasks", "data_query",
+     r"^(what|which) (tasks|to-?dos)\b", 0.93),
+    ("whats_due", "data_query",
+     r"^(what's|what is|whats|what are|what do i have) (due|overdue|pending)"
+     r"( (today|tonight|tomorrow|soon|this \w+|next \w+|on \w+|by \w+|before \w+|for (me|today|tomorrow|this \w+|next \w+)))*$", 0.95),
+    ("my_pending_tasks", "data_query",
+     r"^(what are )?my (overdue|pending|completed|incomplete|important|upcoming) tasks$", 0.93),
+    ("do_i_have", "data_query",
+     r"^(do i have|have i got) (any )?(tasks|to-?dos|anything due)\b", 0.9),
+    ("pomodoro_count", "data_query",
+     r"^" + NOT_ADVICE + r"how many pomodoros?( (have|did) i\b.*| (today|so far|this week|this month|in total))?$", 0.96),
+    ("study_time", "data_query",
+     r"\bhow (much|long)( time)? (have|did) i (study|studied)\b", 0.93),
+    ("timer_stats", "data_query",
+     r"^" + NOT_ADVICE + r".*\bmy (pomodoro|study|timer|focus) (stats|statistics|count|time|history)\b", 0.92),
+    ("quiz_results", "data_query",
+     r"^" + NOT_ADVICE + r"((show|list|get|see|view)( me)? |what (are|were) )?my( recent| latest| last)? (quiz|paper|exam) "
+     r"(scores?|results?|marks?|attempts?)( (so far|this week|this month|recently))?$", 0.93),
+    ("quiz_performance", "data_query",
+     r"^how did i do (on|in) (my )?(quiz|quizzes|papers?|exams?)\b", 0.93),
+
+    # tool_use
+    ("create_task", "tool_use",
+     r"^(please )?(add|create|make|set up|schedule) (a |an |another |one more |the )?(new )?(task|to-?do|reminder)\b", 0.96),
+    ("remind_me", "tool_use",
+     r"^(please )?remind me to\b", 0.95),
+    ("add_to_list", "tool_use",
+     r"^(please )?add .+ to my (tasks|task list|list|to-?do list)$", 0.95),
+    ("need_to_with_date", "tool_use",
+     r"^i (need|have|want|'ve got|got) to (?!(see|know|check|view|find out)\b).+\b(today|tonight|tomorrow|by|before|next|this (week|weekend|month|evening|afternoon)|in \d+ (days?|weeks?))\b", 0.86),
+]
+
+_PUNCTUATION = re.compile(r"[!?.,;:~]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace"""
+    text = (message or "").lower().replace("’", "'")
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class IntentPreClassifier:
+    """Rule-based intent classifier with confidence scores and path statistics"""
+
+    def __init__(
+        self,
+        rules: List[Tuple[str, str, str, float]] = None,
+        min_confidence: float = FAST_ROUTER_MIN_CONFIDENCE,
+        enabled: bool = FAST_ROUTER_ENABLED
+    ):
+        self.rules = [
+            (name, intent, re.compile(pattern), confidence)
+            for name, intent, pattern, confidence in (rules or INTENT_RULES)
+        ]
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._total = 0
+        self._fast_path: Dict[str, int] = {}
+        self._fallback: Dict[str, int] = {}
+        self._rule_hits: Dict[str, int] = {}
+
+    def classify(self, message: str, has_pending_tasks: bool = False) -> Dict[str, Any]:
+        """
+        Classify a message without calling the LLM
+
+        Args:
+            message: Raw user message
+            has_pending_tasks: Whether the session has tasks awaiting follow-up
+                information (short replies like "tomorrow" are then ambiguous)
+
+        Returns:
+            Dictionary with intent (None when unsure), confidence, matched rule
+            and the path taken ("fast_path" or "llm_fallback")
+        """
+        if not self.enabled:
+            return self._result(None, 0.0, None, "disabled")
+
+        if has_pending_tasks:
+            return self._result(None, 0.0, None, "pending_tasks")
+
+        text = normalize_message(message)
+        if not text:
+            return self._result(None, 0.0, None, "no_match")
+
+        # Best confidence per intent across all matching rules
+        best: Dict[str, Tuple[float, str]] = {}
+        for name, intent, pattern, confidence in self.rules:
+            if pattern.search(text) and confidence > best.get(intent, (0.0, None))[0]:
+                best[intent] = (confidence, name)
+
+        if not best:
+            return self._result(None, 0.0, None, "no_match")
+
+        intent, (confidence, rule) = max(best.items(), key=lambda item: item[1][0])
+
+        if len(best) > 1:
+            confidence -= AMBIGUITY_PENALTY
+
+        words = len(text.split())
+        if words > LONG_MESSAGE_WORDS:
+            confidence -= (words - LONG_MESSAGE_WORDS) * LONG_MESSAGE_PENALTY
+
+        confidence = round(max(confidence, 0.0), 3)
+
+        if confidence < self.min_confidence:
+            reason = "ambiguous" if len(best) > 1 else "low_confidence"
+            return self._result(None, confidence, rule, reason)
+
+        return self._result(intent, confidence, rule, None)
+
+    def _result(
+        self,
+        intent: Optional[str],
+        confidence: float,
+        rule: Optional[str],
+        fallback_reason: Optional[str]
+    ) -> Dict[str, Any]:
+        """Record statistics for a classification and build the result"""
+        with self._lock:
+            self._total += 1
+            if intent:
+                self._fast_path[intent] = self._fast_path.get(intent, 0) + 1
+                self._rule_hits[rule] = self._rule_hits.get(rule, 0) + 1
+            else:
+                self._fallback[fallback_reason] = self._fallback.get(fallback_reason, 0) + 1
+
+        return {
+            "intent": intent,
+            "confidence": confidence,
+            "rule": rule,
+            "path": "fast_path" if intent else "llm_fallback",
+            "fallback_reason": fallback_reason
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Report how often each path fired"""
+        with self._lock:
+            fast_total = sum(self._fast_path.values())
+            return {
+                "enabled": self.enabled,
+                "min_confidence": self.min_confidence,
+                "total": self._total,
+                "fast_path": {"total": fast_total, "by_intent": dict(self._fast_path)},
+                "llm_fallback": {"total": self._total - fast_total, "by_reason": dict(self._fallback)},
+                "rule_hits": dict(self._rule_hits),
+                "fast_path_ratio": round(fast_total / self._total, 3) if self._total else 0.0
+            }
+
+    def reset_stats(self):
+        """Clear all counters"""
+        with self._lock:
+            self._total = 0
+            self._fast_path.clear()
+            self._fallback.clear()
+            self._rule_hits.clear()
+
+
+class ClassificationCache:
+    """Shared LRU + TTL cache of confident LLM router classifications"""
+    
+    def __init__(
+        self,
+        maxsize: int = ROUTER_CACHE_MAX_ENTRIES,
+        ttl: float = ROUTER_CACHE_TTL_SECONDS,
+        min_confidence: float = ROUTER_CACHE_MIN_CONFIDENCE,
+        enabled: bool = ROUTER_CACHE_ENABLED
+    ):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl, name="router_classifications")
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+        
+        self._lock = threading.Lock()
+        self._stored = 0
+        self._rejected = 0
+        self._bypassed = 0
+    
+    @staticmethod
+    def _key(message: str) -> Optional[str]:
+        key = normalize_message(message)
+        if not key or len(key) > ROUTER_CACHE_MAX_MESSAGE_CHARS:
+            return None
+        return key
+    
+    def get(self, message: str, bypass: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached classification
+        
+        Args:
+            message: Raw user message
+            bypass: Skip the lookup for this request (counted in the stats)
+            
+        Returns:
+            Dictionary with intent and confidence, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        if bypass:
+            with self._lock:
+                self._bypassed += 1
+            return None
+        
+        key = self._key(message)
+        if key is None:
+            return None
+        
+        cached = self.cache.get(key)
+        return dict(cached) if cached else None
+    
+    def put(self, message: str, intent: str, confidence: Any) -> bool:
+        """Store a router classification if it is confident enough; returns True if stored"""
+        if not self.enabled:
+            return False
+        
+        key = self._key(message)
+        try:
+            confidence = float(confidence)
+        except (TypeError, ValueError):
+            confidence = 0.0
+        
+        if key is None or intent not in ("small_talk", "tool_use", "data_query") or confidence < self.min_confidence:
+            with self._lock:
+                self._rejected += 1
+            return False
+        
+        self.cache.set(key, {"intent": intent, "confidence": confidence})
+        with self._lock:
+            self._stored += 1
+        return True
+    
+    def clear(self):
+        """Drop all cached classifications"""
+        self.cache.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rate and store/reject (low confidence, too long) /bypass counters"""
+        with self._lock:
+            counters = {
+                "stored": self._stored,
+                "rejected": self._rejected,
+                "bypassed": self._bypassed
+            }
+        return {
+            "enabled": self.enabled,
+            "min_confidence": self.min_confidence,
+            **self.cache.stats(),
+            **counters
+        }
+
+
+# Global instances
+intent_pre_classifier = IntentPreClassifier()
+classification_cache = ClassificationCache()
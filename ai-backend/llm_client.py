@@ -0,0 +1,299 @@
+"""
+LLM Client Module
+Process-wide factory for Groq chat models sharing one pooled HTTP client
+
+Every ChatGroq built by StudyMateAgent and TaskExtractor used to create its
+own groq SDK client, and with it its own httpx connection pool with default
+limits. The factory builds one httpx.Client (sync graph paths) and one
+httpx.AsyncClient (async/streaming paths) with tunable pool limits and
+keep-alive, hands them to every ChatGroq, and can open connections to the
+Groq API at startup so the first requests skip the TLS handshake.
+
+Pool statistics (in use, idle, saturated waits) are reported by stats() for
+/health and exported as gauges on /metrics.
+"""
+
+import os
+import asyncio
+import threading
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+from langchain_groq import ChatGroq
+
+from metrics import LLM_HTTP_POOL_CONNECTIONS, LLM_HTTP_POOL_WAITS
+
+logger = logging.getLogger(__name__)
+
+GROQ_API_BASE = os.getenv("GROQ_API_BASE") or "https://api.groq.com"
+
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "20"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "10"))
+LLM_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+LLM_HTTP_CONNECT_TIMEOUT = float(os.getenv("LLM_HTTP_CONNECT_TIMEOUT", "5"))
+LLM_HTTP_TIMEOUT = float(os.getenv("LLM_HTTP_TIMEOUT", "60"))
+LLM_HTTP_WARM_CONNECTIONS = int(os.getenv("LLM_HTTP_WARM_CONNECTIONS", "2"))
+
+
+class _PoolCounters:
+    """In-flight and saturated-wait counters for one client (thread-safe)"""
+
+    def __init__(self, name: str, max_connections: int):
+        self.name = name
+        self.max_connections = max_connections
+        self.in_flight = 0
+        self.requests = 0
+        self.waits = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            # Every connection is busy: this request queues in the pool
+            if self.in_flight >= self.max_connections:
+                self.waits += 1
+                LLM_HTTP_POOL_WAITS.inc(client=self.name)
+            self.in_flight += 1
+            self.requests += 1
+
+    def finish(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+class _CountingResponseStream(httpx.SyncByteStream):
+    """Keeps the request counted as in use until its (possibly streamed) body is closed"""
+
+    def __init__(self, stream: httpx.SyncByteStream, counters: _PoolCounters):
+        self._stream = stream
+        self._counters = counters
+        self._closed = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self):
+        try:
+            self._stream.close()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._counters.finish()
+
+
+class _AsyncCountingResponseStream(httpx.AsyncByteStream):
+    """Async counterpart of _CountingResponseStream"""
+
+    def __init__(self, stream: httpx.AsyncByteStream, counters: _PoolCounters):
+        self._stream = stream
+        self._counters = counters
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._counters.finish()
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    """HTTPTransport that tracks requests in flight"""
+
+    def __init__(self, counters: _PoolCounters, **kwargs):
+        super().__init__(**kwargs)
+        self.counters = counters
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.counters.start()
+        try:
+            response = super().handle_request(request)
+        except BaseException:
+            self.counters.finish()
+            raise
+        response.stream = _CountingResponseStream(response.stream, self.counters)
+        return response
+
+    def connection_states(self) -> Dict[str, int]:
+        connections = list(self._pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"open": len(connections), "idle": idle}
+
+
+class _AsyncCountingTransport(httpx.AsyncHTTPTransport):
+    """AsyncHTTPTransport that tracks requests in flight"""
+
+    def __init__(self, counters: _PoolCounters, **kwargs):
+        super().__init__(**kwargs)
+        self.counters = counters
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.counters.start()
+        try:
+            response = await super().handle_async_request(request)
+        except BaseException:
+            self.counters.finish()
+            raise
+        response.stream = _AsyncCountingResponseStream(response.stream, self.counters)
+        return response
+
+    def connection_states(self) -> Dict[str, int]:
+        connections = list(self._pool.connections)
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"open": len(connections), "idle": idle}
+
+
+class LLMClientFactory:
+    """
+    Builds ChatGroq models on shared, pooled HTTP clients
+
+    The clients are created lazily on first use, so importing this module
+    does not open sockets.
+    """
+
+    def __init__(
+        self,
+        base_url: str = GROQ_API_BASE,
+        max_connections: int = LLM_HTTP_MAX_CONNECTIONS,
+        max_keepalive: int = LLM_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry: float = LLM_HTTP_KEEPALIVE_EXPIRY,
+        connect_timeout: float = LLM_HTTP_CONNECT_TIMEOUT,
+        timeout: float = LLM_HTTP_TIMEOUT
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.limits = httpx.Limits(
+            max_connections=max(1, int(max_connections)),
+            max_keepalive_connections=max(0, int(max_keepalive)),
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self._sync_counters = _PoolCounters("sync", self.limits.max_connections)
+        self._async_counters = _PoolCounters("async", self.limits.max_connections)
+        self._sync_client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    @property
+    def sync_client(self) -> httpx.Client:
+        """Shared client for blocking calls (invoke)"""
+        with self._lock:
+            if self._sync_client is None or self._sync_client.is_closed:
+                self._sync_client = httpx.Client(
+                    transport=_CountingTransport(self._sync_counters, limits=self.limits),
+                    timeout=self.timeout
+                )
+            return self._sync_client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        """Shared client for async calls (ainvoke, astream)"""
+        with self._lock:
+            if self._async_client is None or self._async_client.is_closed:
+                self._async_client = httpx.AsyncClient(
+                    transport=_AsyncCountingTransport(self._async_counters, limits=self.limits),
+                    timeout=self.timeout
+                )
+            return self._async_client
+
+    def chat_model(self, groq_api_key: str, **kwargs) -> ChatGroq:
+        """ChatGroq using the shared clients (kwargs as for ChatGroq)"""
+        return ChatGroq(
+            groq_api_key=groq_api_key,
+            http_client=self.sync_client,
+            http_async_client=self.async_client,
+            **kwargs
+        )
+
+    async def warm_up(self, connections: int = LLM_HTTP_WARM_CONNECTIONS) -> int:
+        """
+        Open keep-alive connections to the Groq API (TCP + TLS) before traffic
+
+        Any HTTP response - even 401/404 - leaves an established connection in
+        the pool. Failures are logged, never raised, so startup continues when
+        the API is unreachable.
+
+        Returns:
+            int: Number of connections opened (async and sync pools combined)
+        """
+        connections = min(max(0, int(connections)), self.limits.max_keepalive_connections)
+        if not connections:
+            return 0
+
+        url = f"{self.base_url}/openai/v1/models"
+
+        async def warm_async() -> bool:
+            try:
+                await self.async_client.head(url)
+                return True
+            except httpx.HTTPError as e:
+                logger.warning(f"LLM connection warm-up failed (async): {e}")
+                return False
+
+        def warm_sync() -> bool:
+            try:
+                self.sync_client.head(url)
+                return True
+            except httpx.HTTPError as e:
+                logger.warning(f"LLM connection warm-up failed (sync): {e}")
+                return False
+
+        # Concurrent requests so each one opens its own connection
+        results = await asyncio.gather(
+            *(warm_async() for _ in range(connections)),
+            *(asyncio.to_thread(warm_sync) for _ in range(connections))
+        )
+        opened = sum(results)
+        logger.info(f"Warmed {opened} LLM HTTP connection(s) to {self.base_url}")
+        return opened
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool limits plus in-use/idle connections and saturated waits per client"""
+        return {
+            "max_connections": self.limits.max_connections,
+            "max_keepalive_connections": self.limits.max_keepalive_connections,
+            "keepalive_expiry_seconds": self.limits.keepalive_expiry,
+            "sync": self._client_stats(self._sync_client, self._sync_counters),
+            "async": self._client_stats(self._async_client, self._async_counters),
+        }
+
+    def collect_metrics(self):
+        """Copy the current pool state into the /metrics gauges"""
+        for name, client, counters in (
+            ("sync", self._sync_client, self._sync_counters),
+            ("async", self._async_client, self._async_counters),
+        ):
+            stats = self._client_stats(client, counters)
+            LLM_HTTP_POOL_CONNECTIONS.set(stats["in_use"], client=name, state="in_use")
+            LLM_HTTP_POOL_CONNECTIONS.set(stats["idle"], client=name, state="idle")
+
+    @staticmethod
+    def _client_stats(client, counters: _PoolCounters) -> Dict[str, int]:
+        states = {"open": 0, "idle": 0}
+        if client is not None and not client.is_closed:
+            states = client._transport.connection_states()
+        return {
+            "in_use": counters.in_flight,
+            "idle": states["idle"],
+            "open": states["open"],
+            "requests": counters.requests,
+            "waits": counters.waits,
+        }
+
+    async def aclose(self):
+        """Close both clients (application shutdown)"""
+        with self._lock:
+            sync_client, self._sync_client = self._sync_client, None
+            async_client, self._async_client = self._async_client, None
+        if async_client is not None:
+            await async_client.aclose()
+        if sync_client is not None:
+            sync_client.close()
+
+
+# Global factory instance
+llm_client_factory = LLMClientFactory()
@@ -0,0 +1,322 @@
+"""
+LLM Call Policy Module
+Deadline budget, jittered exponential-backoff retries and hedged requests
+for the agent's LLM calls
+
+Every chat request gets one deadline (LLM_REQUEST_BUDGET_SECONDS) stored in
+the graph state, so the router and the downstream node share a single
+budget instead of each waiting on the SDK defaults. Within that budget:
+
+- each attempt gets a timeout of min(LLM_ATTEMPT_TIMEOUT_SECONDS, remaining)
+- transient failures (timeouts, connection errors, 429, 5xx) are retried with
+  full-jitter exponential backoff, but only while the backoff plus a minimal
+  attempt still fits in the remaining budget
+- hedged nodes (LLM_HEDGE_NODES, latency-critical JSON calls such as the
+  router) fire a second identical request when the first has not answered
+  after the node's observed p95 latency, and take whichever answers first
+
+Streamed answers (FINAL_RESPONSE_TAG calls of /api/chat/stream requests)
+are neither hedged nor retried: a second request, or a retry after a failure
+partway through, would emit its tokens into the same SSE stream and the
+client would see duplicated text. Their failures are raised as they are.
+"""
+
+import os
+import time
+import random
+import asyncio
+import threading
+import contextvars
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Any, Callable, Deque, Dict, Optional
+
+import httpx
+import groq
+
+from metrics import LLM_RETRIES, LLM_HEDGED_REQUESTS, LLM_DEADLINE_EXCEEDED
+
+logger = logging.getLogger(__name__)
+
+LLM_REQUEST_BUDGET_SECONDS = float(os.getenv("LLM_REQUEST_BUDGET_SECONDS", "25"))
+LLM_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "12"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.25"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "2"))
+LLM_HEDGE_NODES = frozenset(
+    node.strip() for node in os.getenv("LLM_HEDGE_NODES", "router,classify_and_act").split(",") if node.strip()
+)
+LLM_HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", "1.5"))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "0.2"))
+
+# An attempt with less time than this left is not worth starting
+MIN_ATTEMPT_SECONDS = 0.5
+
+# Latency samples kept per node for the hedge delay (p95)
+LATENCY_WINDOW = 200
+MIN_LATENCY_SAMPLES = 20
+
+# Errors worth another attempt; 4xx other than 429 will fail the same way again
+TRANSIENT_ERRORS = (
+    groq.APITimeoutError,
+    groq.APIConnectionError,
+    groq.RateLimitError,
+    groq.InternalServerError,
+    httpx.TransportError,
+    asyncio.TimeoutError,
+    TimeoutError,
+)
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """The request's LLM budget ran out before an attempt succeeded"""
+
+
+def _is_transient(error: BaseException) -> bool:
+    if isinstance(error, LLMDeadlineExceeded):
+        return False
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    # Other status errors: retry server-side failures only
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+class LLMCallPolicy:
+    """
+    Runs LLM calls under a deadline with retries and optional hedging
+
+    Deadlines are time.monotonic() values; new_deadline() creates the one a
+    request carries in its graph state.
+    """
+
+    def __init__(
+        self,
+        budget: float = LLM_REQUEST_BUDGET_SECONDS,
+        attempt_timeout: float = LLM_ATTEMPT_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base: float = LLM_RETRY_BASE_SECONDS,
+        retry_max: float = LLM_RETRY_MAX_SECONDS,
+        hedge_nodes=LLM_HEDGE_NODES,
+        hedge_default_delay: float = LLM_HEDGE_DEFAULT_DELAY_SECONDS,
+        hedge_min_delay: float = LLM_HEDGE_MIN_DELAY_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.budget = float(budget)
+        self.attempt_timeout = float(attempt_timeout)
+        self.max_retries = max(0, int(max_retries))
+        self.retry_base = float(retry_base)
+        self.retry_max = float(retry_max)
+        self.hedge_nodes = frozenset(hedge_nodes)
+        self.hedge_default_delay = float(hedge_default_delay)
+        self.hedge_min_delay = float(hedge_min_delay)
+        self._clock = clock
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    # ------------------------------------------------------------------
+    # Deadline and delays
+    # ------------------------------------------------------------------
+
+    def new_deadline(self) -> float:
+        """Deadline for a request starting now"""
+        return self._clock() + self.budget
+
+    def remaining(self, deadline: Optional[float]) -> float:
+        """Seconds left before the deadline (the full budget if there is none)"""
+        if deadline is None:
+            return self.budget
+        return deadline - self._clock()
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (1-based)"""
+        return random.uniform(0, min(self.retry_max, self.retry_base * (2 ** (attempt - 1))))
+
+    def hedge_delay(self, node: str) -> float:
+        """The node's p95 attempt latency (a default until enough samples exist)"""
+        with self._lock:
+            samples = sorted(self._latencies.get(node, ()))
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return self.hedge_default_delay
+        p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+        return max(self.hedge_min_delay, p95)
+
+    def should_hedge(self, node: str) -> bool:
+        return node in self.hedge_nodes
+
+    def _record_latency(self, node: str, seconds: float):
+        with self._lock:
+            window = self._latencies.get(node)
+            if window is None:
+                window = self._latencies[node] = deque(maxlen=LATENCY_WINDOW)
+            window.append(seconds)
+
+    def _attempt_timeout(self, node: str, deadline: Optional[float]) -> float:
+        remaining = self.remaining(deadline)
+        if remaining < MIN_ATTEMPT_SECONDS:
+            LLM_DEADLINE_EXCEEDED.inc(node=node)
+            raise LLMDeadlineExceeded(f"LLM budget exhausted before {node} call")
+        return min(self.attempt_timeout, remaining)
+
+    def _retry_delay(self, node: str, deadline: Optional[float], attempt: int, error: BaseException) -> Optional[float]:
+        """Backoff before the next attempt, or None if the error should be raised"""
+        if attempt > self.max_retries or not _is_transient(error):
+            return None
+        delay = self.backoff(attempt)
+        if self.remaining(deadline) - delay < MIN_ATTEMPT_SECONDS:
+            LLM_DEADLINE_EXCEEDED.inc(node=node)
+            return None
+        LLM_RETRIES.inc(node=node, reason=type(error).__name__)
+        logger.warning(f"LLM call in {node} failed ({type(error).__name__}: {error}); retry {attempt} in {delay:.2f}s")
+        return delay
+
+    # ------------------------------------------------------------------
+    # Sync
+    # ------------------------------------------------------------------
+
+    def invoke(
+        self,
+        llm,
+        messages,
+        node: str,
+        deadline: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        retry: bool = True
+    ):
+        """
+        llm.invoke(messages) with per-attempt timeouts, retries and optional hedging
+
+        retry=False makes a single attempt (calls whose output is streamed to
+        the client as it arrives).
+        """
+        hedge = self.should_hedge(node) if hedge is None else hedge
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(node, deadline)
+            try:
+                if hedge:
+                    return self._hedged_invoke(llm, messages, node, timeout)
+                return self._timed_invoke(llm, messages, node, timeout)
+            except Exception as e:
+                attempt += 1
+                delay = self._retry_delay(node, deadline, attempt, e) if retry else None
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    def _timed_invoke(self, llm, messages, node: str, timeout: float):
+        start = self._clock()
+        # Per-request timeout is passed through ChatGroq to the groq SDK
+        response = llm.invoke(messages, timeout=timeout)
+        self._record_latency(node, self._clock() - start)
+        return response
+
+    def _hedged_invoke(self, llm, messages, node: str, timeout: float):
+        executor = self._hedge_executor()
+        # Copy the context so callbacks and LangGraph run metadata follow the call
+        primary = executor.submit(contextvars.copy_context().run, self._timed_invoke, llm, messages, node, timeout)
+        delay = min(self.hedge_delay(node), timeout)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+
+        hedge_timeout = max(MIN_ATTEMPT_SECONDS, timeout - delay)
+        secondary = executor.submit(contextvars.copy_context().run, self._timed_invoke, llm, messages, node, hedge_timeout)
+        pending = {primary, secondary}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    LLM_HEDGED_REQUESTS.inc(node=node, winner="primary" if future is primary else "hedge")
+                    # A blocking call cannot be interrupted; the loser's result is discarded
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _hedge_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="llm-hedge")
+            return self._executor
+
+    # ------------------------------------------------------------------
+    # Async
+    # ------------------------------------------------------------------
+
+    async def ainvoke(
+        self,
+        llm,
+        messages,
+        node: str,
+        deadline: Optional[float] = None,
+        hedge: Optional[bool] = None,
+        retry: bool = True
+    ):
+        """Async variant of invoke (the losing hedge request is cancelled)"""
+        hedge = self.should_hedge(node) if hedge is None else hedge
+        attempt = 0
+        while True:
+            timeout = self._attempt_timeout(node, deadline)
+            try:
+                if hedge:
+                    return await self._hedged_ainvoke(llm, messages, node, timeout)
+                return await self._timed_ainvoke(llm, messages, node, timeout)
+            except Exception as e:
+                attempt += 1
+                delay = self._retry_delay(node, deadline, attempt, e) if retry else None
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    async def _timed_ainvoke(self, llm, messages, node: str, timeout: float):
+        start = self._clock()
+        # wait_for bounds the whole call (the SDK timeout applies per read)
+        response = await asyncio.wait_for(llm.ainvoke(messages, timeout=timeout), timeout)
+        self._record_latency(node, self._clock() - start)
+        return response
+
+    async def _hedged_ainvoke(self, llm, messages, node: str, timeout: float):
+        primary = asyncio.ensure_future(self._timed_ainvoke(llm, messages, node, timeout))
+        pending = {primary}
+        error = None
+        # Covers the first wait too: a caller cancelled before the hedge
+        # fires (client disconnect, cancelled prefetch) must not orphan primary
+        try:
+            delay = min(self.hedge_delay(node), timeout)
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            hedge_timeout = max(MIN_ATTEMPT_SECONDS, timeout - delay)
+            secondary = asyncio.ensure_future(self._timed_ainvoke(llm, messages, node, hedge_timeout))
+            pending = {primary, secondary}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        LLM_HEDGED_REQUESTS.inc(node=node, winner="primary" if task is primary else "hedge")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """Configuration and the current hedge delay per observed node"""
+        with self._lock:
+            nodes = list(self._latencies)
+        return {
+            "budget_seconds": self.budget,
+            "attempt_timeout_seconds": self.attempt_timeout,
+            "max_retries": self.max_retries,
+            "hedge_nodes": sorted(self.hedge_nodes),
+            "hedge_delay_seconds": {node: round(self.hedge_delay(node), 3) for node in nodes},
+        }
+
+
+# Global policy instance
+llm_call_policy = LLMCallPolicy()
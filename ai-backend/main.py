@@ -4,18 +4,28 @@ Implements Router-First Agentic Architecture with LangGraph
 """
 
 import os
-from fastapi import FastAPI, HTTPException
+import json
+import time
+import asyncio
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from dotenv import load_dotenv
 import logging
 
 from models import (
     ChatMessage, ChatResponse, ErrorResponse,
-    TaskConfirmationRequest, UserRole
+    TaskConfirmationRequest, TaskBatchConfirmationRequest, UserRole
 )
 from agent import StudyMateAgent
 from firestore_service import firestore_service
+from async_firestore_service import async_firestore_service
+from intent_router import intent_pre_classifier, classification_cache
+from confirmation_store import confirmation_store
+from llm_client import llm_client_factory
+from llm_policy import llm_call_policy
+from single_flight import flights
+from metrics import registry as metrics_registry, HTTP_REQUEST_DURATION, CONFIRMATION_STORE_OPERATIONS
 
 # Load environment variables
 load_dotenv(override=True)
@@ -50,6 +60,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Observe request latency per route template (e.g. /api/chat)"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            endpoint=getattr(route, "path", "unmatched"),
+            method=request.method,
+            status=str(status)
+        )
+
 # Initialize agent
 groq_api_key = os.getenv("GROQ_API_KEY")
 if not groq_api_key:
@@ -83,7 +111,59 @@ async def health_check():
         "status": "healthy",
         "groq_configured": groq_api_key is not None,
         "agent_ready": agent is not None,
-        "firestore_ready": firestore_service.db is not None
+        "graph_mode": agent.graph_mode if agent else None,
+        "firestore_ready": firestore_service.db is not None,
+        "user_cache": firestore_service.get_user_cache_stats(),
+        "task_index": firestore_service.get_task_index_stats(),
+        "snapshot_listeners": firestore_service.get_listener_stats(),
+        "query_strategies": firestore_service.get_query_strategy_stats(),
+        "confirmation_store": confirmation_store.stats(),
+        "sessions": agent.memory.stats() if agent and agent.memory else None,
+        "llm_http_pool": llm_client_factory.stats(),
+        "llm_policy": llm_call_policy.stats(),
+        "single_flight": flights.stats()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics (text exposition format)"""
+    llm_client_factory.collect_metrics()
+    return PlainTextResponse(
+        metrics_registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+def validate_chat_message(message: ChatMessage):
+    """Reject empty messages and missing user IDs"""
+    if not message.message or not message.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    
+    if not message.userId:
+        raise HTTPException(status_code=400, detail="User ID is required")
+
+def build_chat_response(result: dict) -> ChatResponse:
+    """Build the API response model from the agent's result dictionary"""
+    return ChatResponse(
+        response=result.get("response", "I'm here to help!"),
+        tasks=result.get("tasks", []),
+        pendingTasks=result.get("pendingTasks", []),
+        taskConfirmations=result.get("taskConfirmations", []),
+        needsFollowUp=result.get("needsFollowUp", False),
+        followUpQuestion=result.get("followUpQuestion"),
+        sessionId=result.get("sessionId"),
+        intentType=result.get("intentType")
+    )
+
+def format_sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.get("/api/router/stats")
+async def router_stats():
+    """Report how often the zero-LLM fast path, the classification cache and the LLM router fired"""
+    return {
+        **intent_pre_classifier.get_stats(),
+        "classification_cache": classification_cache.get_stats()
     }
 
 @app.post("/api/chat", response_model=ChatResponse)
@@ -105,34 +185,25 @@ async def chat_with_ai(message: ChatMessage):
             )
         
         # Validate input
-        if not message.message or not message.message.strip():
-            raise HTTPException(status_code=400, detail="Message cannot be empty")
-        
-        if not message.userId:
-            raise HTTPException(status_code=400, detail="User ID is required")
+        validate_chat_message(message)
         
         logger.info(f"Processing message from user {message.userId}: {message.message[:100]}...")
         
-        # Process through agent
-        result = agent.process_message(
+        # Keep this user's snapshot listeners attached (no-op when disabled)
+        await async_firestore_service.track_active_user(message.userId)
+        
+        # Process through agent (async path - does not block the event loop)
+        result = await agent.process_message_async(
             user_message=message.message,
             user_id=message.userId,
             session_id=message.sessionId,
-            conversation_history=message.conversationHistory or [],
-            pending_tasks=message.pendingTasks or []
+            conversation_history=message.conversationHistory,
+            pending_tasks=message.pendingTasks,
+            bypass_cache=message.bypassCache
         )
         
         # Build response
-        response = ChatResponse(
-            response=result.get("response", "I'm here to help!"),
-            tasks=result.get("tasks", []),
-            pendingTasks=result.get("pendingTasks", []),
-            taskConfirmations=result.get("taskConfirmations", []),
-            needsFollowUp=result.get("needsFollowUp", False),
-            followUpQuestion=result.get("followUpQuestion"),
-            sessionId=result.get("sessionId"),
-            intentType=result.get("intentType")
-        )
+        response = build_chat_response(result)
         
         logger.info(
             f"Response generated - Intent: {result.get('intentType')}, "
@@ -149,12 +220,65 @@ async def chat_with_ai(message: ChatMessage):
         logger.error(f"Unexpected error in chat endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@app.post("/api/chat/stream")
+async def chat_with_ai_stream(message: ChatMessage):
+    """
+    Streaming chat endpoint - Server-Sent Events
+    
+    Events:
+    1. "intent" - classified intent, sent as soon as routing finishes
+    2. "token"  - chunks of the final answer as the LLM generates them
+    3. "done"   - full ChatResponse (taskConfirmations, pendingTasks, needsFollowUp, ...)
+    """
+    if not agent:
+        raise HTTPException(
+            status_code=500,
+            detail="AI service is not available. Please check GROQ_API_KEY configuration."
+        )
+    
+    validate_chat_message(message)
+    
+    logger.info(f"Streaming message from user {message.userId}: {message.message[:100]}...")
+    
+    await async_firestore_service.track_active_user(message.userId)
+    
+    async def event_stream():
+        try:
+            async for event in agent.stream_message(
+                user_message=message.message,
+                user_id=message.userId,
+                session_id=message.sessionId,
+                conversation_history=message.conversationHistory,
+                pending_tasks=message.pendingTasks,
+                bypass_cache=message.bypassCache
+            ):
+                if event["event"] == "done":
+                    result = event["data"]
+                    logger.info(
+                        f"Stream complete - Intent: {result.get('intentType')}, "
+                        f"Confirmations: {len(result.get('taskConfirmations', []))}"
+                    )
+                    yield format_sse("done", build_chat_response(result).dict())
+                else:
+                    yield format_sse(event["event"], event["data"])
+        except Exception as e:
+            logger.error(f"Unexpected error in chat stream: {e}", exc_info=True)
+            yield format_sse("error", {"error": "Internal server error"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/api/task/confirm")
 async def confirm_task(request: TaskConfirmationRequest):
     """
     Task confirmation endpoint - HITL (Human-in-the-Loop)
     
     User clicks "confirm" or "discard" for a task
+    The task is read from the server-side confirmation store (scoped to the
+    userId and sessionId of the chat request that proposed it)
     If confirmed: adds to Firestore (RBAC enforced - students only)
     """
     try:
@@ -166,30 +290,130 @@ async def confirm_task(request: TaskConfirmationRequest):
             f"Action: {request.action}, TaskID: {request.taskId}"
         )
         
+        # Store calls may hit Firestore (shared backend) - run in a worker thread
+        entry = await asyncio.to_thread(
+            confirmation_store.take, request.userId, request.sessionId, request.taskId
+        )
+        
         if request.action == "discard":
+            if entry is not None:
+                CONFIRMATION_STORE_OPERATIONS.inc(operation="discarded")
             return {
                 "success": True,
                 "message": "Task discarded successfully",
                 "action": "discarded"
             }
         
-        # For confirmation, we need to retrieve the task from session
-        # In production, you'd store confirmations in a temporary cache/db
-        # For now, return a placeholder response
+        if entry is None:
+            raise HTTPException(status_code=404, detail="Task confirmation not found or expired")
         
-        # TODO: Implement proper task confirmation storage and retrieval
-        logger.warning("Task confirmation storage not yet implemented")
+        success = await agent.confirm_task_async(request.userId, request.taskId, entry["task"])
+        if not success:
+            # Keep the confirmation so the user can retry
+            await asyncio.to_thread(confirmation_store.restore, entry)
+            raise HTTPException(status_code=500, detail="Failed to add task")
         
+        CONFIRMATION_STORE_OPERATIONS.inc(operation="confirmed")
         return {
             "success": True,
-            "message": "Task confirmation received. Full implementation pending.",
-            "action": "confirmed"
+            "message": "Task added successfully",
+            "action": "confirmed",
+            "task": entry["task"]
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error in task confirmation: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/task/confirm-batch")
+async def confirm_tasks_batch(request: TaskBatchConfirmationRequest):
+    """
+    Batch task confirmation endpoint - HITL (Human-in-the-Loop)
+    
+    Confirms every stored confirmation in taskIds and adds every task body in
+    tasks with one role check and batched Firestore writes
+    Returns a result per item, in request order (taskIds first, then tasks)
+    """
+    try:
+        if not agent:
+            raise HTTPException(status_code=500, detail="AI service not available")
+        if not request.taskIds and not request.tasks:
+            raise HTTPException(status_code=400, detail="taskIds or tasks is required")
+        if request.taskIds and not request.sessionId:
+            raise HTTPException(status_code=400, detail="sessionId is required to confirm taskIds")
+        
+        logger.info(
+            f"Batch task confirmation request - User: {request.userId}, "
+            f"TaskIDs: {len(request.taskIds)}, Tasks: {len(request.tasks)}"
+        )
+        
+        # Store calls may hit Firestore (shared backend) - run in a worker thread
+        entries = []
+        if request.taskIds:
+            entries = await asyncio.to_thread(
+                confirmation_store.take_many, request.userId, request.sessionId, request.taskIds
+            )
+        
+        results = []
+        to_add = []  # (result, task data, store entry)
+        for task_id, entry in zip(request.taskIds, entries):
+            result = {"taskId": task_id}
+            results.append(result)
+            if entry is None:
+                result.update(success=False, status="not_found")
+            else:
+                to_add.append((result, entry["task"], entry))
+        for index, task in enumerate(request.tasks):
+            result = {"index": index}
+            results.append(result)
+            to_add.append((result, json.loads(task.json()), None))
+        
+        # One role check and batched writes for every accepted task
+        taken = [entry for _, _, entry in to_add if entry is not None]
+        task_ids = []
+        try:
+            if to_add:
+                task_ids = await agent.confirm_tasks_async(request.userId, [task for _, task, _ in to_add])
+        except Exception:
+            # Keep the confirmations so the user can retry
+            if taken:
+                await asyncio.to_thread(confirmation_store.restore_many, taken)
+            raise
+        if task_ids is None:
+            if taken:
+                await asyncio.to_thread(confirmation_store.restore_many, taken)
+            raise HTTPException(status_code=403, detail="Only students can add tasks")
+        
+        failed = []
+        for (result, _, entry), firestore_id in zip(to_add, task_ids):
+            if firestore_id:
+                result.update(success=True, status="added", id=firestore_id)
+                if entry is not None:
+                    CONFIRMATION_STORE_OPERATIONS.inc(operation="confirmed")
+            else:
+                result.update(success=False, status="failed")
+                if entry is not None:
+                    failed.append(entry)
+        
+        # Keep confirmations whose write failed so the user can retry
+        if failed:
+            await asyncio.to_thread(confirmation_store.restore_many, failed)
+        
+        added = sum(1 for result in results if result["success"])
+        return {
+            "success": added == len(results),
+            "message": f"Added {added} of {len(results)} tasks",
+            "results": results
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in batch task confirmation: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/task/add")
 async def add_task_directly(task_data: dict, user_id: str):
     """
@@ -200,15 +424,15 @@ async def add_task_directly(task_data: dict, user_id: str):
         if not firestore_service.db:
             raise HTTPException(status_code=500, detail="Firestore not available")
         
-        # Check user role
-        user_role = firestore_service.get_user_role(user_id)
+        # Check user role (async Firestore client)
+        user_role = await async_firestore_service.get_user_role(user_id)
         if user_role != UserRole.STUDENT:
             raise HTTPException(
                 status_code=403,
                 detail="Only students can add tasks"
             )
         
-        success = firestore_service.add_task(user_id, task_data)
+        success = await async_firestore_service.add_task(user_id, task_data)
         
         if success:
             return {
@@ -241,6 +465,20 @@ async def global_exception_handler(request, exc):
 # STARTUP
 # ============================================================================
 
+@app.on_event("startup")
+async def startup():
+    """Open keep-alive connections to the LLM API before the first chat request"""
+    if agent:
+        await llm_client_factory.warm_up()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Detach Firestore snapshot listeners, close the session checkpoint store and the LLM HTTP clients"""
+    await asyncio.to_thread(firestore_service.close_listeners)
+    if agent and agent.memory:
+        agent.memory.close()
+    await llm_client_factory.aclose()
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -0,0 +1,397 @@
+"""
+Metrics Module
+In-process counters and latency histograms exposed at /metrics in the
+Prometheus text exposition format (version 0.0.4)
+
+Instruments:
+- HTTP request latency per endpoint
+- LangGraph node latency per node
+- LLM call latency and prompt/completion tokens per node
+- Firestore call latency per FirestoreService method
+- Intent distribution and JSON parse failures
+- Retrieved-data prompt tokens (rendered and saved by compaction)
+- Task confirmation store operations and evictions
+- Shared LLM HTTP connection pool usage
+- LLM retries, hedged requests and exhausted deadline budgets
+- Speculative prefetch outcomes
+- Single-flight coalescing of concurrent identical reads
+- Ordering strategy per collection shape and queries wasted on failed orderings
+"""
+
+import time
+import threading
+import functools
+import inspect
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+
+# Latency buckets in seconds (LLM calls take seconds, cached reads microseconds)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: Any) -> str:
+    """Escape a label value for the text exposition format"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: Iterable[Tuple[str, Any]]) -> str:
+    pairs = list(pairs)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """Base class: a named family of label-keyed series"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key in sorted(self._series):
+                lines.extend(self._render_series(list(zip(self.labelnames, key)), self._series[key]))
+        return lines
+
+    def _render_series(self, labels: List[Tuple[str, str]], value: Any) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def _render_series(self, labels, value):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Gauge(_Metric):
+    """Value per label set that can go up and down"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = value
+
+    def get(self, **labels) -> float:
+        with self._lock:
+            return self._series.get(self._key(labels), 0)
+
+    def _render_series(self, labels, value):
+        return [f"{self.name}{_format_labels(labels)} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """Cumulative bucket counts, sum and count per label set"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def get(self, **labels) -> Optional[Dict[str, Any]]:
+        """Sum and count of one series (None if never observed)"""
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            return {"sum": series["sum"], "count": series["count"]} if series else None
+
+    def _render_series(self, labels, series):
+        lines = [
+            f"{self.name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {count}"
+            for bound, count in zip(self.buckets, series["buckets"])
+        ]
+        lines.append(f"{self.name}_sum{_format_labels(labels)} {_format_value(series['sum'])}")
+        lines.append(f"{self.name}_count{_format_labels(labels)} {series['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in registration order"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        """Reset every series (tests)"""
+        for metric in self._metrics:
+            metric.clear()
+
+
+# Global registry and instruments
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    "studymate_http_request_duration_seconds",
+    "HTTP request latency (streaming responses: time to first byte)",
+    ["endpoint", "method", "status"]
+)
+GRAPH_NODE_DURATION = registry.histogram(
+    "studymate_graph_node_duration_seconds",
+    "LangGraph node execution time",
+    ["node"]
+)
+LLM_CALL_DURATION = registry.histogram(
+    "studymate_llm_call_duration_seconds",
+    "LLM call latency by calling graph node",
+    ["node", "outcome"]
+)
+LLM_TOKENS = registry.counter(
+    "studymate_llm_tokens_total",
+    "LLM tokens by calling graph node",
+    ["node", "type"]
+)
+FIRESTORE_CALL_DURATION = registry.histogram(
+    "studymate_firestore_call_duration_seconds",
+    "FirestoreService / AsyncFirestoreService method latency (including cache hits)",
+    ["method"]
+)
+INTENT_TOTAL = registry.counter(
+    "studymate_intent_total",
+    "Classified chat intents by classification path",
+    ["intent", "source"]
+)
+JSON_PARSE_FAILURES = registry.counter(
+    "studymate_json_parse_failures_total",
+    "LLM responses that could not be parsed as JSON",
+    ["node"]
+)
+DATA_ANSWERS = registry.counter(
+    "studymate_data_answers_total",
+    "Data query answers by path (template = no answer LLM call)",
+    ["query_type", "path"]
+)
+RETRIEVAL_PROMPT_TOKENS = registry.counter(
+    "studymate_retrieval_prompt_tokens_total",
+    "Estimated tokens of retrieved data in answer prompts (rendered) and tokens saved versus raw JSON (saved)",
+    ["query_type", "kind"]
+)
+
+CONFIRMATION_STORE_OPERATIONS = registry.counter(
+    "studymate_confirmation_store_operations_total",
+    "Task confirmation store writes and lookups (missing = unknown, expired or foreign taskId)",
+    ["operation"]
+)
+CONFIRMATION_STORE_EVICTIONS = registry.counter(
+    "studymate_confirmation_store_evictions_total",
+    "Task confirmations dropped before a decision (expired, capacity, user_cap)",
+    ["reason"]
+)
+LLM_HTTP_POOL_CONNECTIONS = registry.gauge(
+    "studymate_llm_http_pool_connections",
+    "Connections of the shared LLM HTTP client pool by state (in_use, idle)",
+    ["client", "state"]
+)
+LLM_HTTP_POOL_WAITS = registry.counter(
+    "studymate_llm_http_pool_waits_total",
+    "LLM HTTP requests started while every pooled connection was in use",
+    ["client"]
+)
+LLM_RETRIES = registry.counter(
+    "studymate_llm_retries_total",
+    "LLM calls retried after a transient error, per node and error type",
+    ["node", "reason"]
+)
+LLM_HEDGED_REQUESTS = registry.counter(
+    "studymate_llm_hedged_requests_total",
+    "LLM calls that fired a hedge request, per node and which request answered first",
+    ["node", "winner"]
+)
+LLM_DEADLINE_EXCEEDED = registry.counter(
+    "studymate_llm_deadline_exceeded_total",
+    "LLM calls abandoned because the request's deadline budget ran out",
+    ["node"]
+)
+PREFETCH_RESULTS = registry.counter(
+    "studymate_prefetch_results_total",
+    "Speculative per-request reads by kind and outcome (used, unused, cancelled, failed, skipped)",
+    ["kind", "outcome"]
+)
+SINGLE_FLIGHT_CALLS = registry.counter(
+    "studymate_single_flight_calls_total",
+    "Coalesced reads per method: leader (ran the read) or joined (shared an in-flight read)",
+    ["method", "role"]
+)
+QUERY_STRATEGY_READS = registry.counter(
+    "studymate_query_strategy_reads_total",
+    "Reads served per collection shape by ordering strategy",
+    ["shape", "strategy"]
+)
+QUERY_STRATEGY_WASTED = registry.counter(
+    "studymate_query_strategy_wasted_queries_total",
+    "Queries that failed before a working ordering strategy was reached",
+    ["shape", "strategy"]
+)
+
+
+def timed(histogram: Histogram, label: str = "method") -> Callable:
+    """Decorator observing a function's wall time, labelled with its name (coroutines are awaited)"""
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    histogram.observe(time.perf_counter() - start, **{label: func.__name__})
+            return async_wrapper
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, **{label: func.__name__})
+        return wrapper
+    return decorator
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    LangChain callback recording LLM call latency and token usage
+
+    The calling node is read from the "langgraph_node" run metadata that
+    LangGraph propagates to calls made inside a node.
+    """
+
+    def __init__(self):
+        self._runs: Dict[UUID, Tuple[float, str]] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, metadata: Optional[Dict[str, Any]]):
+        node = (metadata or {}).get("langgraph_node", "none")
+        with self._lock:
+            self._runs[run_id] = (time.perf_counter(), node)
+
+    def _finish(self, run_id: UUID) -> Optional[Tuple[float, str]]:
+        with self._lock:
+            started = self._runs.pop(run_id, None)
+        if started is None:
+            return None
+        return time.perf_counter() - started[0], started[1]
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, metadata)
+
+    def on_llm_end(self, response: LLMResult, *, run_id, **kwargs):
+        finished = self._finish(run_id)
+        if finished is None:
+            return
+        duration, node = finished
+        LLM_CALL_DURATION.observe(duration, node=node, outcome="success")
+
+        prompt_tokens, completion_tokens = self._token_usage(response)
+        if prompt_tokens:
+            LLM_TOKENS.inc(prompt_tokens, node=node, type="prompt")
+        if completion_tokens:
+            LLM_TOKENS.inc(completion_tokens, node=node, type="completion")
+
+    def on_llm_error(self, error: BaseException, *, run_id, **kwargs):
+        finished = self._finish(run_id)
+        if finished is not None:
+            duration, node = finished
+            LLM_CALL_DURATION.observe(duration, node=node, outcome="error")
+
+    @staticmethod
+    def _token_usage(response: LLMResult) -> Tuple[int, int]:
+        """Prompt/completion tokens from llm_output or the message usage metadata"""
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        if usage:
+            return usage.get("prompt_tokens", 0) or 0, usage.get("completion_tokens", 0) or 0
+
+        for generations in response.generations:
+            for generation in generations:
+                metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if metadata:
+                    return metadata.get("input_tokens", 0), metadata.get("output_tokens", 0)
+        return 0, 0
+
+
+llm_metrics_callback = LLMMetricsCallback()
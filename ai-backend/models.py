@@ -129,13 +129,20 @@ class TaskConfirmation(BaseModel):
 # CHAT API MODELS
 # ============================================================================
 
+# Request size limits (history and pending tasks are restored server-side per
+# sessionId, so clients only need to send the new message)
+MAX_MESSAGE_CHARS = 4000
+MAX_HISTORY_MESSAGES = 50
+MAX_PENDING_TASKS = 20
+
 class ChatMessage(BaseModel):
     """Incoming chat message from client"""
-    message: str
+    message: str = Field(..., max_length=MAX_MESSAGE_CHARS)
     userId: str
     sessionId: Optional[str] = None
-    conversationHistory: Optional[List[Dict[str, str]]] = None
-    pendingTasks: Optional[List[Dict[str, Any]]] = None  # Pending tasks from previous interaction
+    conversationHistory: Optional[List[Dict[str, str]]] = Field(None, max_length=MAX_HISTORY_MESSAGES)  # Omit to use the session's history
+    pendingTasks: Optional[List[Dict[str, Any]]] = Field(None, max_length=MAX_PENDING_TASKS)  # Omit to use the session's pending tasks
+    bypassCache: bool = False  # Skip the shared classification cache for this request
 
 class ChatResponse(BaseModel):
     """Response from chat endpoint"""
@@ -155,6 +162,18 @@ class TaskConfirmationRequest(BaseModel):
     taskId: str
     action: Literal["confirm", "discard"]
 
+# Items per batch confirmation list (every taskId is a store take - a
+# Firestore transaction on the shared backend; a user holds at most
+# CONFIRMATION_MAX_PER_USER confirmations, 50 by default)
+MAX_BATCH_TASKS = 50
+
+class TaskBatchConfirmationRequest(BaseModel):
+    """Confirm several tasks at once: stored confirmations and/or full task bodies"""
+    userId: str
+    sessionId: Optional[str] = None  # Required with taskIds
+    taskIds: List[str] = Field([], max_length=MAX_BATCH_TASKS)  # Confirmations kept server-side
+    tasks: List[TaskData] = Field([], max_length=MAX_BATCH_TASKS)  # Task bodies to add directly
+
 # ============================================================================
 # LANGGRAPH STATE MODEL
 # ============================================================================
@@ -0,0 +1,137 @@
+"""
+Prefetch Module
+Speculative, request-scoped reads started while the router LLM call is in flight
+
+A data question used to be four serial round trips: role lookup, router
+LLM call, analysis LLM call, Firestore query. The async chat paths now open
+a RequestPrefetch before running the graph:
+
+- "profile": the users/{uid} document (role) into the
+  shared user cache, started immediately (one document read)
+- "tasks":   hydration of the user's task index, a read of the whole tasks
+  subcollection. It starts only once routing classifies the message as an
+  intent that reads tasks (on_intent), so greetings and small talk never pay
+  for it; it overlaps the analysis LLM call. Skipped when the index is warm
+  or only snapshot listeners hydrate it (TASK_INDEX_REQUIRE_LISTENER).
+
+Nodes that need the data await the prefetch (prefetch_for(state)) instead
+of issuing their own read. When the request finishes, prefetches that are
+still running are cancelled.
+"""
+
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from async_firestore_service import async_firestore_service
+from metrics import PREFETCH_RESULTS
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+
+# Intents whose nodes read the user's task index
+TASK_INTENTS = frozenset({"data_query"})
+
+# Prefetches of the requests currently running, by request_id
+_active: Dict[str, "RequestPrefetch"] = {}
+
+
+class RequestPrefetch:
+    """Speculative reads for one chat request"""
+
+    def __init__(self, user_id: str, service=async_firestore_service):
+        self.user_id = user_id
+        self.service = service
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._used = set()
+        self._skipped = set()
+
+    def start(self):
+        """Fire the profile read (task hydration waits for the intent)"""
+        self._spawn("profile", lambda: self.service.get_user(self.user_id))
+
+    def on_intent(self, intent: Optional[str]):
+        """
+        Act on the classified intent: hydrate a cold task index for intents
+        that read tasks, cancel a hydration the final intent does not need
+        """
+        if intent is None:
+            return
+        task = self._tasks.get("tasks")
+        if intent not in TASK_INTENTS:
+            if task is not None and not task.done():
+                task.cancel()
+            return
+        if task is not None or "tasks" in self._skipped:
+            return
+        if not self.service.needs_task_hydration(self.user_id):
+            self._skipped.add("tasks")
+            PREFETCH_RESULTS.inc(kind="tasks", outcome="skipped")
+        else:
+            self._spawn("tasks", lambda: self.service.warm_task_index(self.user_id))
+
+    def _spawn(self, kind: str, factory: Callable[[], Awaitable[Any]]):
+        self._tasks[kind] = asyncio.ensure_future(factory())
+
+    async def wait(self, kind: str) -> Any:
+        """
+        Result of a prefetch (waiting for it if still running)
+
+        Returns None when the kind was not prefetched or failed; callers then
+        read the data themselves.
+        """
+        task = self._tasks.get(kind)
+        if task is None:
+            return None
+        self._used.add(kind)
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():
+                return None
+            raise
+        except Exception as e:
+            logger.warning(f"Prefetch of {kind} for user {self.user_id} failed: {e}")
+            return None
+
+    async def close(self):
+        """Cancel prefetches nobody needed that are still running; record outcomes"""
+        for kind, task in self._tasks.items():
+            if not task.done():
+                task.cancel()
+                outcome = "cancelled"
+            elif task.cancelled():
+                outcome = "cancelled"
+            elif task.exception() is not None:
+                outcome = "failed"
+            else:
+                outcome = "used" if kind in self._used else "unused"
+            PREFETCH_RESULTS.inc(kind=kind, outcome=outcome)
+        pending = [task for task in self._tasks.values() if not task.done()]
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+def prefetch_for(state: dict) -> Optional[RequestPrefetch]:
+    """The prefetch of the request a graph state belongs to (None on sync paths)"""
+    return _active.get(state.get("request_id"))
+
+
+@asynccontextmanager
+async def request_prefetch(request_id: str, user_id: str):
+    """Start prefetching for a request; cancel what is left when the block exits"""
+    if not PREFETCH_ENABLED:
+        yield None
+        return
+
+    prefetch = RequestPrefetch(user_id)
+    prefetch.start()
+    _active[request_id] = prefetch
+    try:
+        yield prefetch
+    finally:
+        _active.pop(request_id, None)
+        await prefetch.close()
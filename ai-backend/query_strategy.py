@@ -0,0 +1,101 @@
+"""
+Query Strategy Module
+Remembers which ordering strategy works for a collection shape
+
+Some reads have a fallback chain: get_quiz_results orders paper_attempts by
+createdAt, then by timestamp, then reads unordered and sorts in Python.
+Without memory, every call pays for the orderings that cannot work (missing
+index or field) before reaching the one that does. An OrderingStrategyMemory
+records each failed ordering per shape and skips it until its TTL expires,
+then probes it again in case the index has been deployed since.
+
+Only errors that describe the query itself (FailedPrecondition: missing
+index, InvalidArgument) are remembered; a transient error still falls
+through to the next strategy for that call but is retried on the next one.
+"""
+
+import os
+import time
+import threading
+import logging
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from google.api_core.exceptions import FailedPrecondition, InvalidArgument
+
+from metrics import QUERY_STRATEGY_READS, QUERY_STRATEGY_WASTED
+
+logger = logging.getLogger(__name__)
+
+# How long a failed ordering is skipped before it is tried again
+QUERY_STRATEGY_RETRY_TTL_SECONDS = float(os.getenv("QUERY_STRATEGY_RETRY_TTL_SECONDS", "3600"))
+
+# Errors that will repeat on every call until the collection or its indexes change
+PERMANENT_QUERY_ERRORS = (FailedPrecondition, InvalidArgument)
+
+
+class OrderingStrategyMemory:
+    """
+    Failed and chosen ordering strategies per collection shape
+
+    ``strategies`` are tried in order; the last one is the fallback that is
+    always attempted (it needs no index), so it is never skipped.
+    """
+
+    def __init__(
+        self,
+        strategies: Sequence[str],
+        ttl: float = QUERY_STRATEGY_RETRY_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.strategies = tuple(strategies)
+        self.ttl = float(ttl)
+        self._clock = clock
+        self._failed: Dict[Tuple[str, str], float] = {}
+        self._chosen: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.wasted_queries = 0
+
+    def plan(self, shape: str) -> List[str]:
+        """Strategies to try for a shape, in order, without recently failed ones"""
+        now = self._clock()
+        with self._lock:
+            for key in [key for key, expires_at in self._failed.items() if expires_at <= now]:
+                del self._failed[key]
+            skipped = {strategy for (failed_shape, strategy) in self._failed if failed_shape == shape}
+        return [s for s in self.strategies[:-1] if s not in skipped] + [self.strategies[-1]]
+
+    def record_failure(self, shape: str, strategy: str, error: BaseException):
+        """Count a wasted query; remember the strategy as failed if the error is permanent"""
+        remembered = isinstance(error, PERMANENT_QUERY_ERRORS)
+        with self._lock:
+            self.wasted_queries += 1
+            if remembered:
+                self._failed[(shape, strategy)] = self._clock() + self.ttl
+        QUERY_STRATEGY_WASTED.inc(shape=shape, strategy=strategy)
+        if remembered:
+            logger.warning(f"{shape}: ordering by {strategy} failed ({error}); skipped for {self.ttl:.0f}s")
+        else:
+            logger.warning(f"{shape}: ordering by {strategy} failed ({error})")
+
+    def record_success(self, shape: str, strategy: str):
+        """Note the strategy that served a read"""
+        with self._lock:
+            previous = self._chosen.get(shape)
+            self._chosen[shape] = strategy
+        QUERY_STRATEGY_READS.inc(shape=shape, strategy=strategy)
+        if previous != strategy:
+            logger.info(f"{shape}: reads now served by ordering strategy {strategy}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Chosen strategy per shape, orderings currently skipped and wasted queries"""
+        now = self._clock()
+        with self._lock:
+            return {
+                "ttl_seconds": self.ttl,
+                "chosen": dict(self._chosen),
+                "skipped": {
+                    f"{shape}/{strategy}": round(expires_at - now, 1)
+                    for (shape, strategy), expires_at in self._failed.items() if expires_at > now
+                },
+                "wasted_queries": self.wasted_queries,
+            }
@@ -0,0 +1,446 @@
+"""
+Session Checkpointer Module
+Durable LangGraph checkpoints keyed by chat session
+
+The compiled graph checkpoints its state per session thread, so a client
+only has to send the new message: the previous turn's conversation history
+and pending tasks are restored from the thread's latest checkpoint.
+
+Backends (SESSION_CHECKPOINTER):
+- "memory" - SQLite database in memory (per process, lost on restart)
+- "sqlite" - SQLite file at SESSION_SQLITE_PATH (survives restarts, shared by
+             workers on the same host)
+- "none"   - no checkpointing; clients resend history and pending tasks
+
+Retention is bounded: each thread keeps its newest SESSION_CHECKPOINTS_RETAINED
+checkpoints, threads idle for longer than SESSION_TTL_SECONDS are deleted,
+and at most SESSION_MAX_SESSIONS threads are kept (least recently active
+evicted first).
+"""
+
+import os
+import time
+import sqlite3
+import asyncio
+import threading
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.serde.types import TASKS
+
+logger = logging.getLogger(__name__)
+
+SESSION_CHECKPOINTER = os.getenv("SESSION_CHECKPOINTER", "memory").lower()
+SESSION_SQLITE_PATH = os.getenv("SESSION_SQLITE_PATH", "sessions.sqlite3")
+SESSION_TTL_SECONDS = float(os.getenv("SESSION_TTL_SECONDS", "86400"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+SESSION_CHECKPOINTS_RETAINED = int(os.getenv("SESSION_CHECKPOINTS_RETAINED", "2"))
+
+# Conversation messages carried over from checkpoints (the prompts use the last 8)
+SESSION_MAX_HISTORY_MESSAGES = int(os.getenv("SESSION_MAX_HISTORY_MESSAGES", "16"))
+
+# Minimum time between expiry sweeps triggered by writes
+SWEEP_INTERVAL_SECONDS = 60.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SessionSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpoint saver on SQLite with bounded retention
+
+    One connection is shared by all threads and guarded by a lock; the async
+    methods run the sync ones in a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        ttl: float = SESSION_TTL_SECONDS,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        retain: int = SESSION_CHECKPOINTS_RETAINED,
+        clock: Callable[[], float] = time.time
+    ):
+        super().__init__()
+        self.path = path
+        self.ttl = float(ttl)
+        self.max_sessions = max(1, int(max_sessions))
+        self.retain = max(1, int(retain))
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._last_sweep = clock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        self.expired = 0
+        self.evicted = 0
+
+    # ------------------------------------------------------------------
+    # BaseCheckpointSaver interface
+    # ------------------------------------------------------------------
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+
+        with self._lock:
+            if self._expired(thread_id):
+                self._delete_threads([thread_id])
+                self.expired += 1
+                return None
+
+            if checkpoint_id:
+                row = self.conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                    "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)
+                ).fetchone()
+            else:
+                row = self.conn.execute(
+                    "SELECT checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata "
+                    "FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns)
+                ).fetchone()
+            if row is None:
+                return None
+            return self._load_tuple(thread_id, checkpoint_ns, row)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query = (
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            "metadata_type, metadata FROM checkpoints"
+        )
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            tuples = []
+            for thread_id, checkpoint_ns, *row in self.conn.execute(query, params).fetchall():
+                checkpoint_tuple = self._load_tuple(thread_id, checkpoint_ns, row)
+                if filter and not all(checkpoint_tuple.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                tuples.append(checkpoint_tuple)
+                if limit is not None and len(tuples) >= limit:
+                    break
+        yield from tuples
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        saved = checkpoint.copy()
+        saved.pop("pending_sends", None)
+        checkpoint_type, checkpoint_blob = self.serde.dumps_typed(saved)
+        metadata_type, metadata_blob = self.serde.dumps_typed(metadata)
+
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                    checkpoint_type, checkpoint_blob, metadata_type, metadata_blob
+                )
+            )
+            self._prune_thread(thread_id, checkpoint_ns)
+            self._touch(thread_id)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_blob = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id, checkpoint_ns, checkpoint_id, task_id,
+                WRITES_IDX_MAP.get(channel, idx), channel, value_type, value_blob
+            ))
+
+        with self._lock:
+            self.conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        tuples = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint_tuple in tuples:
+            yield checkpoint_tuple
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[Tuple[str, Any]], task_id: str) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id)
+
+    # ------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------
+
+    def delete_session(self, thread_id: str) -> bool:
+        """Drop every checkpoint of a thread; returns True if it existed"""
+        with self._lock:
+            return self._delete_threads([thread_id]) > 0
+
+    def expire_sessions(self) -> int:
+        """Delete threads idle for longer than the TTL; returns how many"""
+        with self._lock:
+            return self._sweep(self._clock())
+
+    def stats(self) -> Dict[str, Any]:
+        """Stored threads/checkpoints, configuration and expiry counters"""
+        with self._lock:
+            sessions = self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            checkpoints = self.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+        return {
+            "backend": "memory" if self.path == ":memory:" else "sqlite",
+            "sessions": sessions,
+            "checkpoints": checkpoints,
+            "max_sessions": self.max_sessions,
+            "ttl_seconds": self.ttl,
+            "checkpoints_retained": self.retain,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+    def _load_tuple(self, thread_id: str, checkpoint_ns: str, row) -> CheckpointTuple:
+        """CheckpointTuple from a checkpoints row (caller holds the lock)"""
+        checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint_blob, metadata_type, metadata_blob = row
+        writes = self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id)
+        ).fetchall()
+        sends = []
+        if parent_checkpoint_id:
+            sends = self.conn.execute(
+                "SELECT type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? AND channel = ? "
+                "ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, parent_checkpoint_id, TASKS)
+            ).fetchall()
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **self.serde.loads_typed((checkpoint_type, checkpoint_blob)),
+                "pending_sends": [self.serde.loads_typed(send) for send in sends],
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": parent_checkpoint_id,
+                }
+            } if parent_checkpoint_id else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+        )
+
+    def _expired(self, thread_id: str) -> bool:
+        row = self.conn.execute("SELECT updated_at FROM sessions WHERE thread_id = ?", (thread_id,)).fetchone()
+        return row is not None and self._clock() - row[0] > self.ttl
+
+    def _prune_thread(self, thread_id: str, checkpoint_ns: str):
+        """Keep the newest `retain` checkpoints of a thread (and their writes)"""
+        cutoff = self.conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.retain - 1)
+        ).fetchone()
+        if cutoff is None:
+            return
+        for table in ("checkpoints", "writes"):
+            self.conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                (thread_id, checkpoint_ns, cutoff[0])
+            )
+
+    def _touch(self, thread_id: str):
+        """Record activity; evicts the least recently active threads and sweeps expired ones"""
+        now = self._clock()
+        is_new = self.conn.execute(
+            "INSERT OR IGNORE INTO sessions VALUES (?, ?)", (thread_id, now)
+        ).rowcount == 1
+        if not is_new:
+            self.conn.execute("UPDATE sessions SET updated_at = ? WHERE thread_id = ?", (now, thread_id))
+            return
+
+        if now - self._last_sweep >= SWEEP_INTERVAL_SECONDS:
+            self._sweep(now)
+
+        overflow = self.conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+        if overflow > 0:
+            oldest = [
+                row[0] for row in self.conn.execute(
+                    "SELECT thread_id FROM sessions WHERE thread_id != ? ORDER BY updated_at LIMIT ?",
+                    (thread_id, overflow)
+                )
+            ]
+            self.evicted += self._delete_threads(oldest)
+
+    def _sweep(self, now: float) -> int:
+        self._last_sweep = now
+        idle = [
+            row[0] for row in self.conn.execute(
+                "SELECT thread_id FROM sessions WHERE updated_at < ?", (now - self.ttl,)
+            )
+        ]
+        deleted = self._delete_threads(idle)
+        self.expired += deleted
+        if deleted:
+            logger.info(f"Expired {deleted} idle chat sessions")
+        return deleted
+
+    def _delete_threads(self, thread_ids) -> int:
+        """Delete threads and everything checkpointed for them (caller holds the lock)"""
+        deleted = 0
+        for thread_id in thread_ids:
+            for table in ("checkpoints", "writes"):
+                self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            deleted += self.conn.execute("DELETE FROM sessions WHERE thread_id = ?", (thread_id,)).rowcount
+        return deleted
+
+
+def session_context(
+    previous: Dict[str, Any],
+    conversation_history: Optional[List[Dict[str, str]]] = None,
+    pending_tasks: Optional[List[Dict[str, Any]]] = None
+) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]]]:
+    """
+    Conversation history and pending tasks for the next turn
+
+    Values sent by the client take precedence; otherwise they are rebuilt
+    from the session's last checkpointed state (its history plus its final
+    exchange), keeping the last SESSION_MAX_HISTORY_MESSAGES messages.
+    """
+    if conversation_history is None and previous.get("user_message"):
+        conversation_history = list(previous.get("conversation_history") or [])
+        conversation_history.append({"role": "user", "content": previous["user_message"]})
+        if previous.get("response"):
+            conversation_history.append({"role": "assistant", "content": previous["response"]})
+
+    if pending_tasks is None:
+        pending_tasks = [
+            pending.dict() if hasattr(pending, 'dict') else pending
+            for pending in previous.get("pending_tasks") or []
+        ]
+
+    return (conversation_history or [])[-SESSION_MAX_HISTORY_MESSAGES:], pending_tasks
+
+
+def create_session_saver() -> Optional[SessionSaver]:
+    """Saver for the backend selected by SESSION_CHECKPOINTER (None = no checkpointing)"""
+    if SESSION_CHECKPOINTER == "none":
+        return None
+    if SESSION_CHECKPOINTER == "sqlite":
+        return SessionSaver(SESSION_SQLITE_PATH)
+    if SESSION_CHECKPOINTER != "memory":
+        logger.warning(f"Unknown SESSION_CHECKPOINTER '{SESSION_CHECKPOINTER}', using memory")
+    return SessionSaver(":memory:")
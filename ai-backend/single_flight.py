@@ -0,0 +1,186 @@
+"""
+Single-Flight Module
+Coalesces concurrent identical reads into one in-flight call
+
+Double-clicks, frontend retries and several open tabs send bursts of the
+same request. With the single_flight decorator, a call whose key (method +
+normalised arguments) is already in flight does not start a second
+Firestore read: it waits for the running call and receives a copy of its
+result (or its exception).
+
+Works for blocking methods (callers in different threads) and coroutines
+(callers in one event loop). Each key counts the callers that joined it;
+totals per method are exported as studymate_single_flight_calls_total.
+"""
+
+import os
+import copy
+import asyncio
+import inspect
+import functools
+import threading
+import logging
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from metrics import SINGLE_FLIGHT_CALLS
+
+logger = logging.getLogger(__name__)
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+
+class _Call:
+    """One in-flight call shared by its leader and every joined caller"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.joined = 0
+
+
+class SingleFlight:
+    """In-flight call tables for threads (sync) and the event loop (async)"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._async_calls: Dict[Hashable, Tuple[asyncio.Future, list]] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.joined = 0
+
+    def do(self, key: Hashable, method: str, func: Callable[[], Any]) -> Any:
+        """Run func() unless the same key is in flight; then wait for and share its result"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                call.joined += 1
+                self.joined += 1
+
+        if not leader:
+            SINGLE_FLIGHT_CALLS.inc(method=method, role="joined")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # Callers may mutate what they get back
+            return copy.deepcopy(call.result)
+
+        SINGLE_FLIGHT_CALLS.inc(method=method, role="leader")
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+            if call.joined:
+                logger.info(f"Single-flight {method}: {call.joined} concurrent caller(s) joined one read")
+
+        # Joiners copy call.result on their threads: the leader's caller gets
+        # a copy too, so mutating it cannot race with their deepcopy
+        return copy.deepcopy(call.result) if call.joined else call.result
+
+    async def ado(self, key: Hashable, method: str, factory: Callable[[], Any]) -> Any:
+        """Async variant of do(): factory() returns the coroutine to share"""
+        entry = self._async_calls.get(key)
+        if entry is not None and not entry[0].done():
+            future, joined = entry
+            joined[0] += 1
+            with self._lock:
+                self.joined += 1
+            SINGLE_FLIGHT_CALLS.inc(method=method, role="joined")
+            # wait() never cancels the shared call, and raises CancelledError
+            # only when this joiner itself is cancelled
+            await asyncio.wait({future})
+            if future.cancelled():
+                # The leader was cancelled (e.g. an unused prefetch): run the call ourselves
+                return await self.ado(key, method, factory)
+            return copy.deepcopy(future.result())
+
+        future = asyncio.ensure_future(factory())
+        joined = [0]
+        self._async_calls[key] = (future, joined)
+        with self._lock:
+            self.leaders += 1
+        SINGLE_FLIGHT_CALLS.inc(method=method, role="leader")
+        try:
+            # Cancelling the leader cancels the shared call; joiners then retry
+            result = await future
+        finally:
+            if self._async_calls.get(key, (None,))[0] is future:
+                del self._async_calls[key]
+            if joined[0]:
+                logger.info(f"Single-flight {method}: {joined[0]} concurrent caller(s) joined one read")
+
+        # Joiners copy the shared result when they resume, possibly after
+        # the leader's caller: keep that one off the shared object
+        return copy.deepcopy(result) if joined[0] else result
+
+    def stats(self) -> Dict[str, Any]:
+        """Leader/joined totals and the keys currently in flight with their joined callers"""
+        with self._lock:
+            in_flight = {repr(key[1:]): call.joined for key, call in self._calls.items()}
+            leaders, joined = self.leaders, self.joined
+        in_flight.update({
+            repr(key[1:]): entry[1][0] for key, entry in list(self._async_calls.items()) if not entry[0].done()
+        })
+        return {
+            "enabled": SINGLE_FLIGHT_ENABLED,
+            "leaders": leaders,
+            "joined": joined,
+            "in_flight": in_flight,
+        }
+
+
+# Shared by every decorated method
+flights = SingleFlight()
+
+
+def _freeze(value: Any) -> Hashable:
+    """Hashable form of an argument (lists such as projected fields become tuples)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def single_flight(func: Callable) -> Callable:
+    """
+    Decorator coalescing concurrent calls with equal arguments
+
+    The key is (instance, method name, arguments with defaults applied), so
+    query_tasks(uid) and query_tasks(uid, limit=100) share one call.
+    """
+    signature = inspect.signature(func)
+    method = func.__name__
+
+    def key_for(args, kwargs) -> Hashable:
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        arguments = bound.arguments
+        owner = arguments.pop("self", None)
+        return (id(owner), method) + tuple(sorted((name, _freeze(value)) for name, value in arguments.items()))
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            if not SINGLE_FLIGHT_ENABLED:
+                return await func(*args, **kwargs)
+            return await flights.ado(key_for(args, kwargs), method, lambda: func(*args, **kwargs))
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not SINGLE_FLIGHT_ENABLED:
+            return func(*args, **kwargs)
+        return flights.do(key_for(args, kwargs), method, lambda: func(*args, **kwargs))
+    return wrapper
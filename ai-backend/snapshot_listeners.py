@@ -0,0 +1,291 @@
+"""
+Snapshot Listeners Module
+Keeps backend caches fresh with Firestore real-time listeners
+
+The frontend writes tasks, paper attempts and profile fields straight to
+Firestore, bypassing FirestoreService. For recently active users this module
+attaches on_snapshot watchers to:
+- users/{uid}/tasks           -> task index (hydrated from the initial snapshot)
+- users/{uid}/paper_attempts  -> live quiz attempts
+- users/{uid}                 -> user profile cache
+
+While a user's watchers are live their cache entries never expire; watchers
+of users idle for longer than LISTENER_IDLE_SECONDS are detached and the
+entries they maintained are dropped.
+
+Works against any client exposing the google-cloud-firestore on_snapshot API
+(production, the Firestore emulator via FIRESTORE_EMULATOR_HOST, or an
+in-process fake).
+"""
+
+import os
+import math
+import time
+import threading
+import logging
+from typing import Optional, List, Dict, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_LISTENERS_ENABLED = os.getenv("SNAPSHOT_LISTENERS_ENABLED", "false").lower() == "true"
+LISTENER_IDLE_SECONDS = float(os.getenv("LISTENER_IDLE_SECONDS", "900"))
+LISTENER_MAX_USERS = int(os.getenv("LISTENER_MAX_USERS", "200"))
+
+# Minimum time between idle sweeps triggered by touch()
+SWEEP_INTERVAL_SECONDS = 30.0
+
+WATCHED_KINDS = ("tasks", "paper_attempts", "user")
+
+
+class _UserWatch:
+    """Watch handles and live state of one user"""
+
+    def __init__(self, last_active: float):
+        self.last_active = last_active
+        self.watches: Dict[str, Any] = {}
+        self.live: set = set()  # kinds whose initial snapshot has arrived
+        self.attempts: Dict[str, Dict[str, Any]] = {}
+
+
+class SnapshotListenerManager:
+    """Attaches, feeds and detaches per-user Firestore snapshot listeners"""
+
+    def __init__(
+        self,
+        db,
+        task_index,
+        user_cache,
+        idle_seconds: float = LISTENER_IDLE_SECONDS,
+        max_users: int = LISTENER_MAX_USERS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.db = db
+        self.task_index = task_index
+        self.user_cache = user_cache
+        self.idle_seconds = idle_seconds
+        self.max_users = max(1, int(max_users))
+        self._clock = clock
+        self._users: Dict[str, _UserWatch] = {}
+        self._lock = threading.RLock()
+        self._last_sweep = clock()
+
+        self.attached = 0
+        self.detached = 0
+        self.events = {kind: 0 for kind in WATCHED_KINDS}
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def touch(self, uid: str):
+        """Record activity for a user, attaching their watchers if needed"""
+        if not uid:
+            return
+
+        now = self._clock()
+        stale = []
+        with self._lock:
+            user = self._users.get(uid)
+            if user is not None and self._healthy(user):
+                user.last_active = now
+            else:
+                if user is not None:
+                    # A watch stopped (e.g. stream error) - start over
+                    stale.append(self._pop(uid))
+                stale.extend(self._attach(uid, now))
+
+            if now - self._last_sweep >= SWEEP_INTERVAL_SECONDS:
+                stale.extend(self._pop_idle(now))
+
+        self._unsubscribe(stale)
+
+    def detach(self, uid: str) -> bool:
+        """Stop a user's watchers and drop the cache entries they maintained"""
+        with self._lock:
+            user = self._pop(uid)
+        self._unsubscribe([user])
+        return user is not None
+
+    def detach_idle(self) -> int:
+        """Detach watchers of users idle for longer than idle_seconds"""
+        with self._lock:
+            idle = self._pop_idle(self._clock())
+        self._unsubscribe(idle)
+        return len(idle)
+
+    def close(self):
+        """Detach every watcher (application shutdown)"""
+        with self._lock:
+            users = [self._pop(uid) for uid in list(self._users)]
+        self._unsubscribe(users)
+
+    def _attach(self, uid: str, now: float) -> List[_UserWatch]:
+        """Start a user's watchers; returns users evicted to make room"""
+        evicted = []
+        while len(self._users) >= self.max_users:
+            oldest = min(self._users, key=lambda key: self._users[key].last_active)
+            evicted.append(self._pop(oldest))
+
+        user = _UserWatch(now)
+        self._users[uid] = user
+        user_ref = self.db.collection('users').document(uid)
+
+        try:
+            user.watches["tasks"] = user_ref.collection('tasks').on_snapshot(
+                lambda snapshot, changes, read_time: self._on_tasks(uid, user, snapshot, changes)
+            )
+            user.watches["paper_attempts"] = user_ref.collection('paper_attempts').on_snapshot(
+                lambda snapshot, changes, read_time: self._on_attempts(uid, user, snapshot, changes)
+            )
+            user.watches["user"] = user_ref.on_snapshot(
+                lambda snapshot, changes, read_time: self._on_user(uid, user, snapshot)
+            )
+        except Exception as e:
+            logger.error(f"Failed to attach snapshot listeners for user {uid}: {e}")
+            evicted.append(self._pop(uid))
+            return evicted
+
+        self.attached += 1
+        logger.info(f"Attached snapshot listeners for user {uid}")
+        return evicted
+
+    def _pop(self, uid: str) -> Optional[_UserWatch]:
+        """Forget a user (caller holds the lock) and drop the entries it kept fresh"""
+        user = self._users.pop(uid, None)
+        if user is None:
+            return None
+
+        # Without a watcher these entries would go stale forever
+        if "tasks" in user.live:
+            self.task_index.invalidate(uid)
+        if "user" in user.live:
+            self.user_cache.invalidate(uid)
+
+        self.detached += 1
+        logger.info(f"Detached snapshot listeners for user {uid}")
+        return user
+
+    def _pop_idle(self, now: float) -> List[_UserWatch]:
+        self._last_sweep = now
+        idle = [
+            uid for uid, user in self._users.items()
+            if now - user.last_active > self.idle_seconds
+        ]
+        return [self._pop(uid) for uid in idle]
+
+    @staticmethod
+    def _unsubscribe(users: List[Optional[_UserWatch]]):
+        """
+        Stop watch streams outside the lock: unsubscribe joins the watch
+        thread, which may be waiting for the lock inside a callback
+        """
+        for user in users:
+            if user is None:
+                continue
+            for kind, watch in user.watches.items():
+                try:
+                    watch.unsubscribe()
+                except Exception as e:
+                    logger.warning(f"Error detaching {kind} listener: {e}")
+
+    @staticmethod
+    def _healthy(user: _UserWatch) -> bool:
+        return all(getattr(watch, "is_active", True) for watch in user.watches.values())
+
+    # ------------------------------------------------------------------
+    # Snapshot callbacks (run on the Firestore watch threads)
+    # ------------------------------------------------------------------
+
+    def _current(self, uid: str, user: _UserWatch) -> bool:
+        """Ignore callbacks from watchers that were already detached"""
+        return self._users.get(uid) is user
+
+    def _on_tasks(self, uid: str, user: _UserWatch, snapshot, changes):
+        with self._lock:
+            if not self._current(uid, user):
+                return
+            self.events["tasks"] += 1
+
+            if "tasks" not in user.live:
+                tasks = [{**doc.to_dict(), "id": doc.id} for doc in snapshot]
+                if self.task_index.hydrate(uid, tasks, ttl=math.inf):
+                    user.live.add("tasks")
+                return
+
+            for change in changes:
+                doc = change.document
+                if change.type.name == "REMOVED":
+                    self.task_index.remove_task(uid, doc.id)
+                else:
+                    self.task_index.upsert_task(uid, {**doc.to_dict(), "id": doc.id})
+
+    def _on_attempts(self, uid: str, user: _UserWatch, snapshot, changes):
+        with self._lock:
+            if not self._current(uid, user):
+                return
+            self.events["paper_attempts"] += 1
+
+            if "paper_attempts" not in user.live:
+                user.attempts = {doc.id: {**doc.to_dict(), "id": doc.id} for doc in snapshot}
+                user.live.add("paper_attempts")
+                return
+
+            for change in changes:
+                doc = change.document
+                if change.type.name == "REMOVED":
+                    user.attempts.pop(doc.id, None)
+                else:
+                    user.attempts[doc.id] = {**doc.to_dict(), "id": doc.id}
+
+    def _on_user(self, uid: str, user: _UserWatch, snapshot):
+        with self._lock:
+            if not self._current(uid, user):
+                return
+            self.events["user"] += 1
+
+            # Document watches deliver a list with the current snapshot
+            for doc in snapshot:
+                self.user_cache.set(uid, doc.to_dict() if doc.exists else None, ttl=math.inf)
+            user.live.add("user")
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def get_quiz_attempts(self, uid: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Live paper attempts of a user, newest first
+
+        Returns:
+            Copies of the attempts, or None when no live listener covers the user
+        """
+        with self._lock:
+            user = self._users.get(uid)
+            if user is None or "paper_attempts" not in user.live:
+                return None
+            attempts = [dict(attempt) for attempt in user.attempts.values()]
+
+        attempts.sort(key=lambda x: x.get('createdAt') or x.get('timestamp') or '', reverse=True)
+        return attempts
+
+    def is_live(self, uid: str, kind: str) -> bool:
+        """Whether the initial snapshot of a user's watcher has arrived"""
+        with self._lock:
+            user = self._users.get(uid)
+            return user is not None and kind in user.live
+
+    def stats(self) -> Dict[str, Any]:
+        """Attached users and listener event counters"""
+        with self._lock:
+            return {
+                "users": len(self._users),
+                "max_users": self.max_users,
+                "idle_seconds": self.idle_seconds,
+                "live": {
+                    kind: sum(1 for user in self._users.values() if kind in user.live)
+                    for kind in WATCHED_KINDS
+                },
+                "attached": self.attached,
+                "detached": self.detached,
+                "events": dict(self.events)
+            }
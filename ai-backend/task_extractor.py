@@ -1,10 +1,14 @@
 import os
 import json
 import re
+import sys
+import time
 import uuid
+import threading
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
-from langchain_groq import ChatGroq
+from typing import List, Dict, Any, Callable, Optional
+from llm_client import llm_client_factory
 from langchain.schema import HumanMessage, SystemMessage
 from models import TaskData, PendingTask
 import logging
@@ -13,13 +17,26 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+EXTRACTOR_SESSION_TTL_SECONDS = float(os.getenv("EXTRACTOR_SESSION_TTL_SECONDS", "3600"))
+EXTRACTOR_MAX_SESSIONS = int(os.getenv("EXTRACTOR_MAX_SESSIONS", "1000"))
+EXTRACTOR_HISTORY_MESSAGES = int(os.getenv("EXTRACTOR_HISTORY_MESSAGES", "20"))
+EXTRACTOR_MAX_PENDING_TASKS = int(os.getenv("EXTRACTOR_MAX_PENDING_TASKS", "20"))
+
 class ConversationSession:
     """Manages conversation context and pending tasks"""
-    def __init__(self, session_id: str, user_id: str):
+    def __init__(
+        self,
+        session_id: str,
+        user_id: str,
+        max_history: int = EXTRACTOR_HISTORY_MESSAGES,
+        max_pending_tasks: int = EXTRACTOR_MAX_PENDING_TASKS
+    ):
         self.session_id = session_id
         self.user_id = user_id
-        self.conversation_history: List[Dict[str, str]] = []
+        # Ring buffer: the oldest message is dropped once max_history is reached
+        self.conversation_history: "deque[Dict[str, str]]" = deque(maxlen=max(1, int(max_history)))
         self.pending_tasks: List[Dict[str, Any]] = []
+        self.max_pending_tasks = max(1, int(max_pending_tasks))
         self.created_at = datetime.now()
         self.last_updated = datetime.now()
     
@@ -33,8 +50,19 @@ class ConversationSession:
         self.last_updated = datetime.now()
     
     def add_pending_task(self, task_data: Dict[str, Any]):
-        """Add a task that's waiting for more information"""
+        """Add a task that's waiting for more information (oldest dropped when full)"""
         self.pending_tasks.append(task_data)
+        del self.pending_tasks[:-self.max_pending_tasks]
+        self.last_updated = datetime.now()
+    
+    def set_pending_tasks(self, tasks: List[Dict[str, Any]]):
+        """
+        Replace the pending tasks with the model's current list
+
+        The model sees every pending task in its context and returns the ones
+        still incomplete, so each turn's list supersedes the previous one.
+        """
+        self.pending_tasks = list(tasks)[-self.max_pending_tasks:]
         self.last_updated = datetime.now()
     
     def update_pending_task(self, index: int, updates: Dict[str, Any]):
@@ -46,7 +74,7 @@ class ConversationSession:
     def get_conversation_context(self) -> str:
         """Get formatted conversation history"""
         context = "Previous conversation:\n"
-        for msg in self.conversation_history[-6:]:  # Last 6 messages (3 exchanges)
+        for msg in list(self.conversation_history)[-6:]:  # Last 6 messages (3 exchanges)
             role = "User" if msg["role"] == "user" else "Assistant"
             context += f"{role}: {msg['content']}\n"
         
@@ -56,43 +84,135 @@ class ConversationSession:
                 context += f"{i+1}. {json.dumps(task)}\n"
         
         return context
+    
+    def approx_bytes(self) -> int:
+        """Approximate memory held by the history and pending tasks"""
+        size = sys.getsizeof(self.conversation_history) + sys.getsizeof(self.pending_tasks)
+        for msg in self.conversation_history:
+            size += sys.getsizeof(msg) + sum(sys.getsizeof(value) for value in msg.values())
+        for task in self.pending_tasks:
+            size += sys.getsizeof(task) + sum(sys.getsizeof(value) for value in task.values())
+        return size
+
+class ConversationSessionStore:
+    """
+    Bounded, expiring store of ConversationSessions
+
+    Sessions are kept in an OrderedDict in least-recently-used order. With a
+    single TTL that is also expiry order, so expired sessions are purged from
+    the front and LRU eviction pops the front: every operation is O(1)
+    amortised instead of scanning all sessions.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = EXTRACTOR_MAX_SESSIONS,
+        ttl: float = EXTRACTOR_SESSION_TTL_SECONDS,
+        max_history: int = EXTRACTOR_HISTORY_MESSAGES,
+        max_pending_tasks: int = EXTRACTOR_MAX_PENDING_TASKS,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_sessions = max(1, int(max_sessions))
+        self.ttl = float(ttl)
+        self.max_history = max_history
+        self.max_pending_tasks = max_pending_tasks
+        self._clock = clock
+        # session_id -> (session, last access time)
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.evictions = 0
+        self.expirations = 0
+
+    def get_or_create(self, user_id: str, session_id: Optional[str] = None) -> ConversationSession:
+        """
+        Return the user's session (refreshing its LRU position) or a new one
+
+        A session_id owned by another user is not shared: a fresh session with
+        a new id is created instead.
+        """
+        with self._lock:
+            now = self._clock()
+            self._purge_expired(now)
+
+            entry = self._sessions.get(session_id) if session_id else None
+            if entry is not None and entry[0].user_id == user_id:
+                session = entry[0]
+                session.last_updated = datetime.now()
+                self._sessions[session_id] = (session, now)
+                self._sessions.move_to_end(session_id)
+                return session
+
+            if entry is not None:
+                session_id = None
+            session = ConversationSession(
+                session_id or str(uuid.uuid4()),
+                user_id,
+                max_history=self.max_history,
+                max_pending_tasks=self.max_pending_tasks
+            )
+            self._sessions[session.session_id] = (session, now)
+
+            while len(self._sessions) > self.max_sessions:
+                evicted_id, _ = self._sessions.popitem(last=False)
+                self.evictions += 1
+                logger.debug(f"Evicted least recently used session: {evicted_id}")
+
+            return session
+
+    def discard(self, session_id: str) -> bool:
+        """Drop a session; returns True if it was present"""
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def _purge_expired(self, now: float):
+        """Drop expired sessions from the front (caller holds the lock)"""
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl:
+                break
+            del self._sessions[session_id]
+            self.expirations += 1
+            logger.info(f"Cleaned up expired session: {session_id}")
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            return entry is not None and self._clock() - entry[1] <= self.ttl
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        """Session counts, configuration, eviction counters and approximate memory use"""
+        with self._lock:
+            sessions = [session for session, _ in self._sessions.values()]
+            return {
+                "size": len(sessions),
+                "max_sessions": self.max_sessions,
+                "ttl_seconds": self.ttl,
+                "max_history_messages": self.max_history,
+                "max_pending_tasks": self.max_pending_tasks,
+                "history_messages": sum(len(session.conversation_history) for session in sessions),
+                "pending_tasks": sum(len(session.pending_tasks) for session in sessions),
+                "approx_bytes": sum(session.approx_bytes() for session in sessions),
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
 
 class TaskExtractor:
     def __init__(self, groq_api_key: str):
-        self.llm = ChatGroq(
-            groq_api_key=groq_api_key,
+        self.llm = llm_client_factory.chat_model(
+            groq_api_key,
             model_name="llama-3.1-8b-instant",
             temperature=0.1,
         )
-        self.sessions: Dict[str, ConversationSession] = {}
+        self.sessions = ConversationSessionStore()
         
     def _get_or_create_session(self, user_id: str, session_id: str = None) -> ConversationSession:
-        """Get existing session or create new one"""
-        if session_id and session_id in self.sessions:
-            session = self.sessions[session_id]
-            # Update last_updated time
-            session.last_updated = datetime.now()
-            return session
-        
-        # Create new session
-        new_session_id = session_id or str(uuid.uuid4())
-        session = ConversationSession(new_session_id, user_id)
-        self.sessions[new_session_id] = session
-        
-        # Clean up old sessions (older than 1 hour)
-        self._cleanup_old_sessions()
-        
-        return session
-    def _cleanup_old_sessions(self):
-        """Remove sessions older than 1 hour"""
-        current_time = datetime.now()
-        expired_sessions = [
-            sid for sid, session in self.sessions.items()
-            if (current_time - session.last_updated).total_seconds() > 3600
-        ]
-        for sid in expired_sessions:
-            del self.sessions[sid]
-            logger.info(f"Cleaned up expired session: {sid}")
+        """Get existing session or create new one (expired/LRU sessions are dropped by the store)"""
+        return self.sessions.get_or_create(user_id, session_id)
         
     def _create_system_prompt(self) -> str:
         return """You are an AI task assistant that helps users organize their work and plans into structured tasks.
@@ -380,12 +500,15 @@ Remember:
                         }
                         
                         valid_pending_tasks.append(pending_task)
-                        session.add_pending_task(pending_task)
                         
                     except Exception as e:
                         logger.error(f"Error validating pending task: {e}")
                         continue
                 
+                # The model returns every still-incomplete task, so replace
+                # rather than append (appending grew the list without bound)
+                session.set_pending_tasks(valid_pending_tasks)
+                
                 parsed_response["tasks"] = valid_tasks
                 parsed_response["pendingTasks"] = valid_pending_tasks
                 parsed_response["sessionId"] = session.session_id
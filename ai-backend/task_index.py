@@ -0,0 +1,379 @@
+"""
+Task Index Module
+Per-user in-memory index of users/{uid}/tasks for repeat data queries
+
+Each hydrated user gets a UserTaskIndex:
+- tasks sorted by dueDate, so date ranges resolve by binary search
+- secondary maps (field value -> task IDs) for list, priority, completed and
+  importance, so filters resolve by set intersection
+
+TaskIndexCache holds the per-user indexes, evicting the least recently used
+users once the estimated memory footprint exceeds its cap. Writes are
+versioned even for users that are not hydrated, so a full read that raced
+with a write is not installed (see TaskIndexCache.version).
+"""
+
+import time
+import bisect
+import threading
+import logging
+from collections import OrderedDict
+from typing import Optional, List, Dict, Any, Callable
+
+logger = logging.getLogger(__name__)
+
+# Values assumed for task fields that are missing from a document
+TASK_FIELD_DEFAULTS = {
+    "completed": False,
+    "importance": False,
+    "list": "Personal",
+    "priority": "medium",
+}
+
+# Users whose last write version is remembered; older writes are folded
+# into a single floor (hydrations started before it are refused)
+WRITE_VERSION_MAX_USERS = 4096
+
+# Rough per-task bookkeeping overhead (dict, sorted list entry, set entries)
+TASK_OVERHEAD_BYTES = 400
+
+# Values that can be applied to an indexed task as-is; anything else
+# (e.g. Firestore sentinels like DELETE_FIELD) forces re-hydration
+PLAIN_VALUE_TYPES = (str, int, float, bool, type(None), list, dict)
+
+
+def _estimate_size(task: Dict[str, Any]) -> int:
+    """Approximate memory footprint of one indexed task in bytes"""
+    return len(repr(task)) + TASK_OVERHEAD_BYTES
+
+
+class UserTaskIndex:
+    """Sorted and secondary indexes over one user's tasks"""
+
+    def __init__(self, tasks: List[Dict[str, Any]]):
+        self.tasks: Dict[str, Dict[str, Any]] = {}
+        self._by_due: List[tuple] = []  # sorted (dueDate, task_id)
+        self._undated: set = set()
+        self._by_field: Dict[str, Dict[Any, set]] = {field: {} for field in TASK_FIELD_DEFAULTS}
+        self._sizes: Dict[str, int] = {}
+        self.size_bytes = 0
+
+        for task in tasks:
+            self.upsert(task)
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def upsert(self, task: Dict[str, Any]) -> int:
+        """
+        Insert or replace a task (must carry its document ID under 'id')
+
+        Returns:
+            Change in estimated size (bytes)
+        """
+        task_id = task["id"]
+        before = self.size_bytes
+        self.remove(task_id)
+
+        task = dict(task)
+        self.tasks[task_id] = task
+
+        due = task.get("dueDate")
+        if isinstance(due, str) and due:
+            bisect.insort(self._by_due, (due, task_id))
+        else:
+            self._undated.add(task_id)
+
+        for field, default in TASK_FIELD_DEFAULTS.items():
+            value = task.get(field, default)
+            self._by_field[field].setdefault(value, set()).add(task_id)
+
+        self._sizes[task_id] = _estimate_size(task)
+        self.size_bytes += self._sizes[task_id]
+        return self.size_bytes - before
+
+    def remove(self, task_id: str) -> int:
+        """
+        Remove a task if present
+
+        Returns:
+            Change in estimated size (bytes, zero or negative)
+        """
+        task = self.tasks.pop(task_id, None)
+        if task is None:
+            return 0
+
+        due = task.get("dueDate")
+        if isinstance(due, str) and due:
+            position = bisect.bisect_left(self._by_due, (due, task_id))
+            if position < len(self._by_due) and self._by_due[position] == (due, task_id):
+                del self._by_due[position]
+        else:
+            self._undated.discard(task_id)
+
+        for field, default in TASK_FIELD_DEFAULTS.items():
+            value = task.get(field, default)
+            ids = self._by_field[field].get(value)
+            if ids is not None:
+                ids.discard(task_id)
+                if not ids:
+                    del self._by_field[field][value]
+
+        size = self._sizes.pop(task_id, 0)
+        self.size_bytes -= size
+        return -size
+
+    def query(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        filters: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Same semantics as FirestoreService.query_tasks: date ranges exclude
+        tasks without a dueDate, results are sorted by dueDate ascending with
+        undated tasks last
+
+        Args:
+            start_date: Inclusive lower dueDate bound (YYYY-MM-DD)
+            end_date: Inclusive upper dueDate bound (YYYY-MM-DD)
+            filters: Equality filters on completed/importance/list/priority
+            limit: Maximum number of tasks to return
+
+        Returns:
+            Copies of the matching task dictionaries
+        """
+        allowed = None
+        for field, value in (filters or {}).items():
+            ids = self._by_field[field].get(value, set())
+            allowed = set(ids) if allowed is None else allowed & ids
+            if not allowed:
+                return []
+
+        if start_date or end_date:
+            low = bisect.bisect_left(self._by_due, (start_date,)) if start_date else 0
+            # "\uffff" sorts after every task ID, so end_date itself is included
+            high = bisect.bisect_right(self._by_due, (end_date, "\uffff")) if end_date else len(self._by_due)
+            ordered = [task_id for _, task_id in self._by_due[low:high]]
+        else:
+            ordered = [task_id for _, task_id in self._by_due] + sorted(self._undated)
+
+        results = []
+        for task_id in ordered:
+            if allowed is not None and task_id not in allowed:
+                continue
+            results.append(dict(self.tasks[task_id]))
+            if limit and len(results) >= limit:
+                break
+        return results
+
+
+class TaskIndexCache:
+    """
+    Per-user task indexes with a TTL and an LRU memory cap
+
+    The TTL bounds staleness from writes that bypass the backend (the
+    frontend writes tasks to Firestore directly).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_bytes = max(1, int(max_bytes))
+        self.ttl = float(ttl)
+        self._clock = clock
+        self._indexes: "OrderedDict[str, tuple]" = OrderedDict()  # uid -> (index, expires_at)
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+
+        # Write versions: a global sequence and the last write per user
+        self._write_seq = 0
+        self._last_write: "OrderedDict[str, int]" = OrderedDict()
+        self._forgotten_write = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.hydrations = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+        self.stale_hydrations = 0
+
+    def query(self, uid: str, **kwargs) -> Optional[List[Dict[str, Any]]]:
+        """
+        Query a user's index (arguments as UserTaskIndex.query)
+
+        Returns:
+            Matching tasks, or None when the user is not hydrated
+        """
+        with self._lock:
+            entry = self._indexes.get(uid)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            index, expires_at = entry
+            if expires_at <= self._clock():
+                self._drop(uid)
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._indexes.move_to_end(uid)
+            self.hits += 1
+            return index.query(**kwargs)
+
+    def version(self) -> int:
+        """
+        Write version to take before a hydration read starts
+
+        Pass it to hydrate(): if any write for the user was recorded after
+        it (upsert/update/remove/invalidate, hydrated or not), the read may
+        predate that write and is not installed.
+        """
+        with self._lock:
+            return self._write_seq
+
+    def hydrate(
+        self,
+        uid: str,
+        tasks: List[Dict[str, Any]],
+        ttl: Optional[float] = None,
+        version: Optional[int] = None
+    ) -> bool:
+        """
+        Build a user's index from a full read of their tasks
+
+        Args:
+            uid: User ID
+            tasks: Every task document of the user (with 'id')
+            ttl: Override the default TTL (e.g. while a snapshot listener
+                keeps the index fresh)
+            version: version() taken before the read started (None for reads
+                known to be consistent, such as a listener's snapshot)
+
+        Returns:
+            False if the user's tasks alone exceed the memory cap, or a write
+            landed while the read was in flight (not indexed)
+        """
+        index = UserTaskIndex(tasks)
+        with self._lock:
+            if version is not None and self._last_write.get(uid, self._forgotten_write) > version:
+                self.stale_hydrations += 1
+                logger.info(f"Task index for user {uid} not installed: a write landed during the read")
+                return False
+
+            self._drop(uid)
+            if index.size_bytes > self.max_bytes:
+                self.rejected += 1
+                logger.info(f"Task index for user {uid} ({index.size_bytes} bytes) exceeds the cap, not indexed")
+                return False
+
+            self._indexes[uid] = (index, self._clock() + (self.ttl if ttl is None else ttl))
+            self.size_bytes += index.size_bytes
+            self.hydrations += 1
+            self._evict()
+            return True
+
+    def upsert_task(self, uid: str, task: Dict[str, Any]):
+        """Insert or replace a task in a hydrated user's index"""
+        with self._lock:
+            self._record_write(uid)
+            entry = self._indexes.get(uid)
+            if entry is None:
+                return
+            self.size_bytes += entry[0].upsert(task)
+            self._evict()
+
+    def update_task(self, uid: str, task_id: str, updates: Dict[str, Any]):
+        """Apply a partial update to a hydrated user's task"""
+        with self._lock:
+            self._record_write(uid)
+            entry = self._indexes.get(uid)
+            if entry is None:
+                return
+
+            index = entry[0]
+            task = index.tasks.get(task_id)
+            plain = all(
+                "." not in field and isinstance(value, PLAIN_VALUE_TYPES)
+                for field, value in updates.items()
+            )
+            if task is None or not plain:
+                # Unknown task or non-literal update - re-read on next query
+                self._drop(uid)
+                return
+
+            self.size_bytes += index.upsert({**task, **updates})
+            self._evict()
+
+    def remove_task(self, uid: str, task_id: str):
+        """Remove a task from a hydrated user's index"""
+        with self._lock:
+            self._record_write(uid)
+            entry = self._indexes.get(uid)
+            if entry is not None:
+                self.size_bytes += entry[0].remove(task_id)
+
+    def invalidate(self, uid: str) -> bool:
+        """Drop a user's index; returns True if it was present"""
+        with self._lock:
+            self._record_write(uid)
+            return self._drop(uid)
+
+    def clear(self):
+        """Drop every index (counters are kept)"""
+        with self._lock:
+            self._indexes.clear()
+            self.size_bytes = 0
+
+    def __contains__(self, uid: str) -> bool:
+        with self._lock:
+            entry = self._indexes.get(uid)
+            return entry is not None and entry[1] > self._clock()
+
+    def _record_write(self, uid: str):
+        self._write_seq += 1
+        self._last_write[uid] = self._write_seq
+        self._last_write.move_to_end(uid)
+        while len(self._last_write) > WRITE_VERSION_MAX_USERS:
+            _, seq = self._last_write.popitem(last=False)
+            self._forgotten_write = max(self._forgotten_write, seq)
+
+    def _drop(self, uid: str) -> bool:
+        entry = self._indexes.pop(uid, None)
+        if entry is None:
+            return False
+        self.size_bytes -= entry[0].size_bytes
+        return True
+
+    def _evict(self):
+        """Evict least recently used users until under the memory cap"""
+        while self.size_bytes > self.max_bytes and len(self._indexes) > 1:
+            uid = next(iter(self._indexes))
+            self._drop(uid)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, configuration and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "users": len(self._indexes),
+                "tasks": sum(len(index) for index, _ in self._indexes.values()),
+                "size_bytes": self.size_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hydrations": self.hydrations,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "rejected": self.rejected,
+                "stale_hydrations": self.stale_hydrations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
@@ -0,0 +1,83 @@
+"""
+Micro-benchmark for due date resolution
+
+Compares the dateparser-only path (previous behaviour of parse_natural_date)
+with the memoized fast-path resolver.
+
+Usage: python test/benchmark_date_parsing.py [iterations]
+"""
+
+import os
+import sys
+import time
+import logging
+from datetime import datetime
+
+# Add parent directory to path to allow imports from 'ai-backend'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import date_resolver
+from date_resolver import parse_natural_date, clear_date_cache, get_date_cache_stats, SRI_LANKA_TZ
+
+# Silence "Failed to parse date string" warnings for the long-tail phrases
+logging.getLogger("date_resolver").setLevel(logging.ERROR)
+
+# Due date phrases as the task extractor typically emits them
+PHRASES = [
+    "today", "tomorrow", "next Friday", "monday", "in 3 days", "in a week",
+    "November 29", "Dec 5", "2025-11-29", "by friday", "in 2 weeks", "Jan 15",
+    "end of the month", "next month",  # long tail - handled by dateparser
+]
+
+
+def run(label: str, fn, iterations: int) -> float:
+    """Resolve every phrase `iterations` times and report throughput"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for phrase in PHRASES:
+            fn(phrase)
+    elapsed = time.perf_counter() - start
+    calls = iterations * len(PHRASES)
+    rate = calls / elapsed
+    print(f"{label:<38} {calls:>7} calls  {elapsed:8.3f}s  {rate:12,.0f} calls/s")
+    return rate
+
+
+def dateparser_only(phrase: str):
+    """Previous behaviour: dateparser on every call"""
+    return date_resolver._parse_with_dateparser(phrase, datetime.now(SRI_LANKA_TZ))
+
+
+def fast_path_no_memo(phrase: str):
+    """Fast path + dateparser fallback, memo cleared before every call"""
+    clear_date_cache()
+    return parse_natural_date(phrase)
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    print("=" * 80)
+    print("Date Resolution Benchmark")
+    print("=" * 80)
+
+    # Show how each phrase resolves (fast path vs dateparser)
+    for phrase in PHRASES:
+        fast = parse_natural_date(phrase)
+        slow = dateparser_only(phrase)
+        print(f"  {phrase!r:<22} -> {fast}  (dateparser: {slow})")
+    print()
+
+    baseline = run("dateparser only (before)", dateparser_only, iterations)
+    cold = run("fast path, no memo", fast_path_no_memo, iterations)
+    clear_date_cache()
+    warm = run("fast path + memo (after)", parse_natural_date, iterations)
+
+    print()
+    print(f"Speed-up without memo: {cold / baseline:6.1f}x")
+    print(f"Speed-up with memo:    {warm / baseline:6.1f}x")
+    print(f"Memo stats: {get_date_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
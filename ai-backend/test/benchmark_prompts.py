@@ -0,0 +1,81 @@
+"""
+Micro-benchmark for prompt assembly
+
+Compares rendering every prompt from scratch on each request (previous
+behaviour of the agent's f-string prompts: timezone lookup, date math and
+interpolation of the multi-kilobyte templates) with the prompt registry,
+which renders the date-dependent parts once per day and appends small
+per-request suffixes.
+
+Usage: python test/benchmark_prompts.py [iterations]
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+# Add parent directory to path to allow imports from 'ai-backend'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from prompts import PromptRegistry, SRI_LANKA_TZ
+
+PENDING_TASKS = [
+    {"description": "Study for math exam", "list": "Study", "priority": "high", "missingFields": ["dueDate"]},
+]
+
+ANSWER_DATA = (
+    "tasks (2 total; 2 open, 0 done)\n"
+    "due | description | priority | list | status | important | subtasks done\n"
+    "2025-11-27 | Submit report | high | Work | open | no | -\n"
+    "2025-11-29 | Finish the project report | medium | Work | open | no | -"
+)
+
+
+def build_request_prompts(registry: PromptRegistry):
+    """Prompts one request of each node type assembles"""
+    dates = registry.dates()
+    registry.task_extractor_system_prompt(PENDING_TASKS)
+    registry.analysis_prompt("What's due tomorrow?", dates)
+    registry.answer_prompt("What's due tomorrow?", ANSWER_DATA, dates)
+    registry.fused_system_prompt(PENDING_TASKS)
+
+
+def run(label: str, registry: PromptRegistry, iterations: int, cold: bool) -> float:
+    """Assemble the request prompts `iterations` times and report CPU per request"""
+    start = time.process_time()
+    for _ in range(iterations):
+        if cold:
+            registry.clear()
+        build_request_prompts(registry)
+    elapsed = time.process_time() - start
+    per_request = elapsed / iterations * 1e6
+    print(f"{label:<38} {iterations:>7} requests  {elapsed:8.3f}s CPU  {per_request:10.1f} µs/request")
+    return per_request
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    print("=" * 80)
+    print("Prompt Assembly Benchmark")
+    print("=" * 80)
+
+    registry = PromptRegistry(clock=lambda: datetime.now(SRI_LANKA_TZ))
+    print(f"  task extractor system prompt: {len(registry.task_extractor_system_prompt(PENDING_TASKS)):>6} chars")
+    print(f"  analysis prompt:              {len(registry.analysis_prompt('What is due tomorrow?')):>6} chars")
+    print(f"  fused system prompt:          {len(registry.fused_system_prompt(PENDING_TASKS)):>6} chars")
+    print()
+
+    baseline = run("render per request (before)", registry, iterations, cold=True)
+    registry.clear()
+    compiled_before = registry.compiled_days
+    cached = run("prompt registry (after)", registry, iterations, cold=False)
+
+    print()
+    print(f"CPU saved per request: {baseline - cached:8.1f} µs ({baseline / cached:5.1f}x faster)")
+    print(f"Days compiled during the cached run: {registry.compiled_days - compiled_before}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Test script for templated data answers
+Checks the fully_captured gate and the task/timer/quiz renderers
+(no Firebase credentials or Groq key needed)
+"""
+
+import os
+import sys
+
+# Add parent directory to path to allow imports from 'ai-backend'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from answer_templates import (
+    fully_captured, render_tasks_answer, render_timer_stats_answer,
+    render_quizzes_answer, render_templated_answer, MAX_LISTED_TASKS
+)
+
+
+DATES = {
+    "current_date_str": "2026-10-18",
+    "tomorrow_str": "2026-10-19",
+    "yesterday_str": "2026-10-17",
+    "week_start_str": "2026-10-12",
+    "week_end_str": "2026-10-18",
+}
+
+
+def tasks_query(start=None, end=None, **filters):
+    return {
+        "query_type": "tasks",
+        "date_range": {"start_date": start, "end_date": end},
+        "filters": filters,
+    }
+
+
+# (message, query params, whether a template may answer)
+GATE_CASES = [
+    ("What's due tomorrow?", tasks_query("2026-10-19", "2026-10-19"), True),
+    ("show me my pending tasks", tasks_query(completed=False), True),
+    ("what's overdue?", tasks_query(end="2026-10-17", completed=False), True),
+    ("which tasks are late", tasks_query(end="2026-10-17", completed=False), True),
+    ("my high priority tasks in my Work list", tasks_query(priority="high", list="Work"), True),
+    ("what is due on the 21st", tasks_query("2026-10-21", "2026-10-21"), True),
+    ("how many pomodoros have I done", {"query_type": "timer_stats"}, True),
+    ("show my recent quiz results", {"query_type": "quizzes"}, True),
+
+    # "overdue" is only captured by the overdue range itself
+    ("what's overdue?", tasks_query(completed=False), False),
+    ("what's overdue?", tasks_query("2026-10-19", "2026-10-25", completed=False), False),
+    ("what's overdue?", tasks_query(end="2026-10-17"), False),
+    # Negations, subjects and advice are left to the LLM
+    ("which tasks are not done", tasks_query(completed=False), False),
+    ("what's due tomorrow for physics", tasks_query("2026-10-19", "2026-10-19"), False),
+    ("how many pomodoros should I do", {"query_type": "timer_stats"}, False),
+    ("my quiz results in chemistry", {"query_type": "quizzes"}, False),
+    # Numbers only count as part of a date range
+    ("show my 3 tasks", tasks_query(), False),
+    ("", tasks_query(), False),
+]
+
+
+def test_fully_captured_gate():
+    failures = [
+        (message, params, expected)
+        for message, params, expected in GATE_CASES
+        if fully_captured(message, params, DATES) is not expected
+    ]
+    assert not failures, failures
+
+
+def test_overdue_needs_dates():
+    assert not fully_captured("what's overdue?", tasks_query(end="2026-10-17", completed=False))
+
+
+def test_tasks_answer():
+    tasks = [
+        {"description": "Essay", "dueDate": "2026-10-19", "priority": "high"},
+        {"description": "Reading", "dueDate": "2026-10-19", "importance": True},
+    ]
+    answer = render_tasks_answer(tasks_query("2026-10-19", "2026-10-19", completed=False), tasks, DATES)
+    assert answer.splitlines() == [
+        "You have 2 pending tasks due tomorrow:",
+        "• Essay (due tomorrow, high priority)",
+        "• Reading (due tomorrow, important)",
+    ]
+
+    overdue = render_tasks_answer(tasks_query(end="2026-10-17", completed=False), [], DATES)
+    assert overdue == "You don't have any overdue tasks. You're all caught up!"
+
+    in_list = render_tasks_answer(tasks_query("2026-10-12", "2026-10-18", list="Work"), [], DATES)
+    assert in_list == "You don't have any tasks due this week in your Work list."
+
+
+def test_capped_tasks_answer():
+    tasks = [{"description": f"Task {i}"} for i in range(MAX_LISTED_TASKS + 2)]
+    answer = render_tasks_answer(tasks_query(), tasks, DATES, row_limit=len(tasks))
+    lines = answer.splitlines()
+    assert lines[0] == f"You have at least {len(tasks)} tasks:"
+    assert lines[-1] == "...and 2 more."
+
+    uncapped = render_tasks_answer(tasks_query(), tasks, DATES, row_limit=100)
+    assert uncapped.startswith(f"You have {len(tasks)} tasks:")
+
+
+def test_timer_stats_answer():
+    assert render_timer_stats_answer({"completedPomodoros": 0, "presentTime": 0}).startswith(
+        "You haven't completed any pomodoros yet"
+    )
+    assert render_timer_stats_answer({"completedPomodoros": 1, "presentTime": 1500}).startswith(
+        "You've completed 1 pomodoro so far"
+    )
+
+
+def test_quizzes_answer():
+    attempts = [
+        {"subject": "Physics", "year": 2023, "score": 8, "totalQuestions": 10,
+         "percentage": 80, "createdAt": "2026-10-18T09:00:00"},
+        {"subject": "Chemistry", "score": 6, "totalQuestions": 10, "percentage": 60},
+    ]
+    lines = render_quizzes_answer(attempts, DATES).splitlines()
+    assert lines == [
+        "You've completed 2 quiz attempts, averaging 70.0%. Your most recent results:",
+        "• Physics 2023: 8/10 (80%), today",
+        "• Chemistry: 6/10 (60%)",
+    ]
+
+    # A capped read is not a lifetime total
+    capped = render_quizzes_answer(attempts, DATES, row_limit=2)
+    assert capped.startswith("Across your last 2 quiz attempts, you averaged 70.0%.")
+
+    assert render_quizzes_answer([], DATES).startswith("You haven't attempted any quizzes yet")
+
+
+def test_templated_answer_falls_back_to_the_llm():
+    params = tasks_query(completed=False)
+    assert render_templated_answer("what's overdue?", params, [{"description": "Later"}], DATES) is None
+    assert render_templated_answer("my pending tasks", params, [], DATES) == (
+        "You don't have any pending tasks. You're all caught up!"
+    )
+    # Data of the wrong shape is never templated
+    assert render_templated_answer("how many pomodoros", {"query_type": "timer_stats"}, [], DATES) is None
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
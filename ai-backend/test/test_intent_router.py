@@ -0,0 +1,79 @@
+"""
+Test script for the zero-LLM intent pre-classifier
+Table of messages and the rule outcome each one should get
+(no Firebase credentials or Groq key needed)
+"""
+
+import os
+import sys
+
+# Add parent directory to path to allow imports from 'ai-backend'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from intent_router import IntentPreClassifier
+
+
+# (message, expected intent or None for LLM fallback, expected rule)
+CASES = [
+    # small_talk
+    ("hi", "small_talk", "greeting"),
+    ("Thanks so much!", "small_talk", "thanks"),
+    ("what can you do", "small_talk", "capabilities"),
+
+    # data_query
+    ("show me all my tasks", "data_query", "show_tasks"),
+    ("What's due tomorrow?", "data_query", "whats_due"),
+    ("what is due this week", "data_query", "whats_due"),
+    ("what do i have due on friday", "data_query", "whats_due"),
+    ("what's overdue?", "data_query", "whats_due"),
+    ("my pending tasks", "data_query", "my_pending_tasks"),
+    ("How many pomodoros have I done?", "data_query", "pomodoro_count"),
+    ("how many pomodoros today", "data_query", "pomodoro_count"),
+    ("show my study stats", "data_query", "timer_stats"),
+    ("What are my quiz results?", "data_query", "quiz_results"),
+    ("my latest exam scores", "data_query", "quiz_results"),
+    ("how did i do on my quizzes", "data_query", "quiz_performance"),
+
+    # tool_use
+    ("add a task to finish the essay", "tool_use", "create_task"),
+    ("remind me to call mom", "tool_use", "remind_me"),
+
+    # Advice and look-alike phrasing goes to the LLM router
+    ("How many pomodoros should I do per day?", None, None),
+    ("how many pomodoros is best for deep work", None, None),
+    ("my quiz scores are bad, any tips?", None, None),
+    ("how do I improve my study time", None, None),
+    ("what is due diligence", None, None),
+    ("what is pending approval in a workflow", None, None),
+    ("explain photosynthesis", None, None),
+]
+
+
+def test_rule_outcomes():
+    classifier = IntentPreClassifier(enabled=True, min_confidence=0.85)
+    failures = []
+    for message, intent, rule in CASES:
+        result = classifier.classify(message)
+        if result["intent"] != intent or (intent and result["rule"] != rule):
+            failures.append((message, result["intent"], result["rule"]))
+    assert not failures, failures
+
+
+def test_pending_tasks_always_fall_back():
+    classifier = IntentPreClassifier(enabled=True)
+    result = classifier.classify("tomorrow", has_pending_tasks=True)
+    assert result["intent"] is None and result["fallback_reason"] == "pending_tasks"
+
+
+def test_long_messages_lose_confidence():
+    classifier = IntentPreClassifier(enabled=True, min_confidence=0.85)
+    message = "show me my tasks " + " ".join(["please"] * 12)
+    result = classifier.classify(message)
+    assert result["intent"] is None and result["fallback_reason"] == "low_confidence"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
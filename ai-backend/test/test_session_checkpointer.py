@@ -0,0 +1,123 @@
+"""
+Test script for the SQLite session checkpointer
+Runs a small LangGraph graph against an in-memory SessionSaver
+(no Firebase credentials needed)
+"""
+
+import os
+import sys
+
+# Add parent directory to path to allow imports from 'ai-backend'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from langgraph.graph import StateGraph, END
+
+from session_checkpointer import SessionSaver, session_context, SESSION_MAX_HISTORY_MESSAGES
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_graph(**saver_kwargs):
+    """One-node graph that answers every message, checkpointed per session thread"""
+    clock = FakeClock()
+    saver = SessionSaver(":memory:", clock=clock, **saver_kwargs)
+
+    def answer(state: dict) -> dict:
+        state["response"] = f"echo: {state['user_message']}"
+        return state
+
+    workflow = StateGraph(dict)
+    workflow.add_node("answer", answer)
+    workflow.set_entry_point("answer")
+    workflow.add_edge("answer", END)
+    return workflow.compile(checkpointer=saver), saver, clock
+
+
+def config_for(session_id):
+    return {"configurable": {"thread_id": session_id}}
+
+
+def checkpoint_count(saver, session_id):
+    return saver.conn.execute(
+        "SELECT COUNT(*) FROM checkpoints WHERE thread_id = ?", (session_id,)
+    ).fetchone()[0]
+
+
+def test_thread_round_trip():
+    graph, saver, clock = make_graph()
+    graph.invoke({"user_message": "hi", "pending_tasks": [{"description": "Essay"}]}, config=config_for("s1"))
+
+    values = graph.get_state(config_for("s1")).values
+    assert values["response"] == "echo: hi"
+    assert values["pending_tasks"] == [{"description": "Essay"}]
+
+    # Another thread does not see it
+    assert not graph.get_state(config_for("s2")).values
+
+
+def test_checkpoints_are_pruned_per_thread():
+    graph, saver, clock = make_graph(retain=2)
+    for turn in range(5):
+        graph.invoke({"user_message": f"turn {turn}"}, config=config_for("s1"))
+
+    assert checkpoint_count(saver, "s1") == 2
+    assert graph.get_state(config_for("s1")).values["response"] == "echo: turn 4"
+
+
+def test_idle_threads_expire():
+    graph, saver, clock = make_graph(ttl=60)
+    graph.invoke({"user_message": "hi"}, config=config_for("s1"))
+    graph.invoke({"user_message": "hi"}, config=config_for("s2"))
+
+    # Reading an expired thread drops it
+    clock.now += 61
+    assert not graph.get_state(config_for("s1")).values
+    assert checkpoint_count(saver, "s1") == 0
+
+    # The sweep drops the rest
+    assert saver.expire_sessions() == 1
+    assert saver.stats()["sessions"] == 0
+    assert saver.stats()["expired"] == 2
+
+
+def test_max_sessions_evicts_least_recently_active():
+    graph, saver, clock = make_graph(max_sessions=2)
+    for session_id in ("s1", "s2", "s3"):
+        clock.now += 1
+        graph.invoke({"user_message": "hi"}, config=config_for(session_id))
+
+    assert not graph.get_state(config_for("s1")).values
+    assert graph.get_state(config_for("s3")).values["response"] == "echo: hi"
+    assert saver.stats()["sessions"] == 2
+    assert saver.stats()["evicted"] == 1
+
+
+def test_restored_history_is_capped():
+    graph, saver, clock = make_graph()
+    history = [{"role": "user", "content": f"message {i}"} for i in range(SESSION_MAX_HISTORY_MESSAGES + 10)]
+    graph.invoke({"user_message": "latest", "conversation_history": history}, config=config_for("s1"))
+
+    restored, pending = session_context(graph.get_state(config_for("s1")).values)
+    assert len(restored) == SESSION_MAX_HISTORY_MESSAGES
+    assert restored[-2:] == [
+        {"role": "user", "content": "latest"},
+        {"role": "assistant", "content": "echo: latest"},
+    ]
+    assert pending == []
+
+    # History sent by the client takes precedence (and is capped the same way)
+    sent, _ = session_context(graph.get_state(config_for("s1")).values, conversation_history=history)
+    assert sent == history[-SESSION_MAX_HISTORY_MESSAGES:]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
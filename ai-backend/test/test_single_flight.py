@@ -0,0 +1,224 @@
+"""
+Test script for single-flight read coalescing
+Covers the sync and async paths, failure fan-out, leader cancellation and
+argument keys (no Firebase credentials needed)
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+# Add parent directory to path to allow imports from 'ai-backend'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from single_flight import SingleFlight, single_flight, flights
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.005)
+
+
+def run_callers(count, call):
+    """Start `count` threads running call(); returns (threads, results, errors)"""
+    results, errors = [], []
+
+    def target():
+        try:
+            results.append(call())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+def test_sync_callers_share_one_read():
+    flight = SingleFlight()
+    release = threading.Event()
+    reads = []
+
+    def read():
+        reads.append(1)
+        release.wait(2)
+        return [{"id": "t1"}]
+
+    threads, results, errors = run_callers(4, lambda: flight.do(("svc", "query_tasks", "u1"), "query_tasks", read))
+    wait_for(lambda: flight.joined == 3)
+    assert flight.stats()["in_flight"] == {"('query_tasks', 'u1')": 3}
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(reads) == 1 and not errors
+    assert results == [[{"id": "t1"}]] * 4
+    # Every caller, the leader's included, gets its own copy
+    assert len({id(result) for result in results}) == 4
+    results[0][0]["id"] = "changed"
+    assert sum(1 for result in results if result[0]["id"] == "t1") == 3
+    assert flight.stats()["in_flight"] == {}
+
+
+def test_sync_failure_reaches_every_caller():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def read():
+        release.wait(2)
+        raise RuntimeError("firestore unavailable")
+
+    threads, results, errors = run_callers(3, lambda: flight.do(("svc", "get_user", "u1"), "get_user", read))
+    wait_for(lambda: flight.joined == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert not results
+    assert len(errors) == 3 and all(str(e) == "firestore unavailable" for e in errors)
+
+    # The failed call is not cached: the next caller reads again
+    assert flight.do(("svc", "get_user", "u1"), "get_user", lambda: {"role": "student"}) == {"role": "student"}
+
+
+def test_async_callers_share_one_read_and_failures():
+    flight = SingleFlight()
+    reads = []
+
+    async def read():
+        reads.append(1)
+        await asyncio.sleep(0.05)
+        return {"role": "student"}
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise RuntimeError("boom")
+
+    async def main():
+        results = await asyncio.gather(*[flight.ado(("svc", "get_user", "u1"), "get_user", read) for _ in range(5)])
+        assert len(reads) == 1 and results == [{"role": "student"}] * 5
+        assert len({id(result) for result in results}) == 5
+
+        errors = await asyncio.gather(
+            *[flight.ado(("svc", "get_user", "u2"), "get_user", failing) for _ in range(3)],
+            return_exceptions=True
+        )
+        assert all(isinstance(e, RuntimeError) for e in errors)
+        assert flight.stats()["in_flight"] == {}
+
+    asyncio.run(main())
+
+
+def test_cancelled_async_leader_lets_joiners_retry():
+    flight = SingleFlight()
+    reads = []
+
+    async def read():
+        reads.append(1)
+        await asyncio.sleep(0.05)
+        return ["attempt"]
+
+    async def main():
+        key = ("svc", "get_quiz_results", "u1")
+        leader = asyncio.ensure_future(flight.ado(key, "get_quiz_results", read))
+        await asyncio.sleep(0.01)
+        joiner = asyncio.ensure_future(flight.ado(key, "get_quiz_results", read))
+        await asyncio.sleep(0.01)
+
+        # e.g. an unused prefetch cancelled when its request finishes
+        leader.cancel()
+        assert await asyncio.wait_for(joiner, 1) == ["attempt"]
+        assert leader.cancelled()
+        assert len(reads) == 2
+        assert flight.stats()["in_flight"] == {}
+
+        # Several joiners: one of them re-runs the read, the rest join it
+        leader = asyncio.ensure_future(flight.ado(key, "get_quiz_results", read))
+        await asyncio.sleep(0.01)
+        joiners = [asyncio.ensure_future(flight.ado(key, "get_quiz_results", read)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await asyncio.wait_for(asyncio.gather(*joiners), 1) == [["attempt"]] * 3
+        assert len(reads) == 4
+
+    asyncio.run(main())
+
+
+def test_cancelled_async_joiner_leaves_the_read_running():
+    flight = SingleFlight()
+
+    async def read():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def main():
+        key = ("svc", "get_user", "u1")
+        leader = asyncio.ensure_future(flight.ado(key, "get_user", read))
+        await asyncio.sleep(0.01)
+        joiner = asyncio.ensure_future(flight.ado(key, "get_user", read))
+        await asyncio.sleep(0.01)
+
+        joiner.cancel()
+        assert await asyncio.wait_for(leader, 1) == "done"
+        assert joiner.cancelled()
+
+    asyncio.run(main())
+
+
+class FakeService:
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+
+    @single_flight
+    def query(self, uid, fields=None, limit=50):
+        self.calls.append((uid, fields, limit))
+        self.release.wait(2)
+        return {"uid": uid}
+
+
+def test_decorator_keys_freeze_list_and_dict_arguments():
+    service = FakeService()
+    joined_before = flights.stats()["joined"]
+
+    calls = [
+        lambda: service.query("u1", ["score", "createdAt"]),
+        lambda: service.query("u1", fields=("score", "createdAt")),
+        lambda: service.query("u1", ["score", "createdAt"], 50),
+        lambda: service.query("u1", fields={"b": [1], "a": 2}),
+        lambda: service.query("u1", fields={"a": 2, "b": (1,)}),
+    ]
+    threads, results, errors = [], [], []
+    for call in calls:
+        started, call_results, call_errors = run_callers(1, call)
+        threads += started
+        results.append(call_results)
+        errors += call_errors
+        time.sleep(0.02)
+
+    wait_for(lambda: flights.stats()["joined"] - joined_before == 3)
+    service.release.set()
+    for thread in threads:
+        thread.join()
+
+    # list == tuple (defaults applied), dict keys sorted: two distinct reads
+    assert not errors
+    assert len(service.calls) == 2
+    assert all(call_results == [{"uid": "u1"}] for call_results in results)
+
+    # Different instances never share a key
+    other = FakeService()
+    other.release.set()
+    assert other.query("u1") == {"uid": "u1"} and len(other.calls) == 1
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,169 @@
+"""
+Test script for the snapshot listener subsystem
+Runs against an in-process fake of the Firestore on_snapshot API
+(no Firebase credentials needed)
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+
+# Add parent directory to path to allow imports from 'ai-backend'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from cache import TTLCache, MISSING
+from task_index import TaskIndexCache
+from snapshot_listeners import SnapshotListenerManager
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeWatch:
+    def __init__(self, store, key, callback):
+        self.store, self.key, self.callback = store, key, callback
+        self.is_active = True
+
+    def unsubscribe(self):
+        self.is_active = False
+        self.store.watches.remove(self)
+
+
+class FakeStore:
+    """Documents keyed by path tuple; delivers snapshots synchronously"""
+
+    def __init__(self):
+        self.docs = {}
+        self.watches = []
+
+    def collection(self, name):
+        return FakeRef(self, (name,))
+
+    def write(self, path, data):
+        existed = path in self.docs
+        if data is None:
+            self.docs.pop(path, None)
+        else:
+            self.docs[path] = dict(data)
+        change_type = "REMOVED" if data is None else ("MODIFIED" if existed else "ADDED")
+        for watch in list(self.watches):
+            if watch.key == path[:-1]:
+                change = SimpleNamespace(type=SimpleNamespace(name=change_type), document=FakeSnapshot(path[-1], data))
+                watch.callback(self._children(watch.key), [change], None)
+            elif watch.key == path:
+                watch.callback([FakeSnapshot(path[-1], data)], [], None)
+
+    def _children(self, key):
+        return [FakeSnapshot(path[-1], data) for path, data in self.docs.items() if path[:-1] == key]
+
+
+class FakeRef:
+    def __init__(self, store, path):
+        self.store, self.path = store, path
+
+    def document(self, doc_id):
+        return FakeRef(self.store, self.path + (doc_id,))
+
+    def collection(self, name):
+        return FakeRef(self.store, self.path + (name,))
+
+    def on_snapshot(self, callback):
+        watch = FakeWatch(self.store, self.path, callback)
+        self.store.watches.append(watch)
+        if len(self.path) % 2:  # collection
+            initial = self.store._children(self.path)
+        else:
+            initial = [FakeSnapshot(self.path[-1], self.store.docs.get(self.path))]
+        callback(initial, [], None)
+        return watch
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_manager():
+    store = FakeStore()
+    clock = FakeClock()
+    task_index = TaskIndexCache(max_bytes=1024 * 1024, ttl=60, clock=clock)
+    user_cache = TTLCache(maxsize=100, ttl=60, name="user_profiles", clock=clock)
+    manager = SnapshotListenerManager(store, task_index, user_cache, idle_seconds=900, max_users=2, clock=clock)
+    return store, clock, manager
+
+
+def test_initial_snapshot_hydrates_caches():
+    store, clock, manager = make_manager()
+    store.write(("users", "u1"), {"role": "student"})
+    store.write(("users", "u1", "tasks", "t1"), {"description": "Essay", "dueDate": "2025-11-29"})
+    store.write(("users", "u1", "paper_attempts", "a1"), {"score": 7, "createdAt": "2025-11-01"})
+
+    manager.touch("u1")
+
+    assert manager.task_index.query("u1")[0]["description"] == "Essay"
+    assert manager.user_cache.get("u1") == {"role": "student"}
+    assert [a["id"] for a in manager.get_quiz_attempts("u1")] == ["a1"]
+
+    # Live entries do not expire while the listener is attached
+    clock.now += 10_000
+    assert manager.task_index.query("u1") is not None
+
+
+def test_frontend_writes_are_applied():
+    store, clock, manager = make_manager()
+    store.write(("users", "u1", "tasks", "t1"), {"description": "Essay", "dueDate": "2025-11-29"})
+    manager.touch("u1")
+
+    # Writes that bypass FirestoreService
+    store.write(("users", "u1", "tasks", "t2"), {"description": "Lab report", "dueDate": "2025-11-20"})
+    store.write(("users", "u1", "tasks", "t1"), {"description": "Essay", "dueDate": "2025-11-29", "completed": True})
+    store.write(("users", "u1", "paper_attempts", "a2"), {"score": 9, "createdAt": "2025-11-05"})
+    store.write(("users", "u1"), {"role": "parent"})
+
+    assert [t["id"] for t in manager.task_index.query("u1", filters={"completed": False})] == ["t2"]
+    assert manager.get_quiz_attempts("u1")[0]["score"] == 9
+    assert manager.user_cache.get("u1") == {"role": "parent"}
+
+    store.write(("users", "u1", "tasks", "t2"), None)
+    assert [t["id"] for t in manager.task_index.query("u1")] == ["t1"]
+
+
+def test_idle_users_are_detached():
+    store, clock, manager = make_manager()
+    store.write(("users", "u1", "tasks", "t1"), {"description": "Essay"})
+    manager.touch("u1")
+
+    clock.now += 1000
+    assert manager.detach_idle() == 1
+    assert not store.watches
+    assert manager.task_index.query("u1") is None
+    assert manager.user_cache.get("u1", MISSING) is MISSING
+    assert manager.get_quiz_attempts("u1") is None
+
+
+def test_max_users_detaches_least_recently_active():
+    store, clock, manager = make_manager()
+    for uid in ("u1", "u2", "u3"):
+        clock.now += 1
+        manager.touch(uid)
+
+    assert not manager.is_live("u1", "tasks")
+    assert manager.is_live("u3", "tasks")
+    assert manager.stats()["users"] == 2
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")
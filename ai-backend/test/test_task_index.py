@@ -0,0 +1,175 @@
+"""
+Test script for the per-user task index
+Checks range/filter semantics against a plain Python reference and the
+write-version guard against stale hydrations (no Firebase credentials needed)
+"""
+
+import os
+import sys
+import random
+
+# Add parent directory to path to allow imports from 'ai-backend'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from task_index import UserTaskIndex, TaskIndexCache, TASK_FIELD_DEFAULTS, WRITE_VERSION_MAX_USERS
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_tasks(count=200, seed=7):
+    rng = random.Random(seed)
+    tasks = []
+    for i in range(count):
+        task = {
+            "id": f"t{i:03d}",
+            "description": f"Task {i}",
+            "dueDate": rng.choice([None, "", f"2026-10-{rng.randint(1, 28):02d}"]),
+            "completed": rng.random() < 0.5,
+            "importance": rng.random() < 0.3,
+            "list": rng.choice(["Personal", "Work", "Study"]),
+            "priority": rng.choice(["low", "medium", "high"]),
+        }
+        # Some documents miss fields and fall back to the defaults
+        if i % 9 == 0:
+            del task["priority"]
+        if i % 11 == 0:
+            del task["completed"]
+        tasks.append(task)
+    return tasks
+
+
+def reference(tasks, start_date=None, end_date=None, filters=None, limit=None):
+    """query_tasks semantics spelled out: ranges drop undated tasks, undated sort last"""
+    results = [
+        task for task in tasks
+        if all(task.get(field, TASK_FIELD_DEFAULTS[field]) == value for field, value in (filters or {}).items())
+    ]
+    if start_date or end_date:
+        results = [
+            task for task in results
+            if task.get("dueDate")
+            and (not start_date or task["dueDate"] >= start_date)
+            and (not end_date or task["dueDate"] <= end_date)
+        ]
+    results.sort(key=lambda task: (task.get("dueDate") or "9999-12-31", task["id"]))
+    return results[:limit] if limit else results
+
+
+CASES = [
+    {},
+    {"filters": {"completed": False}},
+    {"start_date": "2026-10-05", "end_date": "2026-10-12"},
+    {"end_date": "2026-10-10", "filters": {"completed": False}},
+    {"start_date": "2026-10-20"},
+    {"filters": {"priority": "medium"}},
+    {"filters": {"completed": False, "list": "Work", "priority": "high"}, "start_date": "2026-10-05"},
+    {"start_date": "2026-10-01", "end_date": "2026-10-20", "filters": {"importance": True}, "limit": 5},
+    {"filters": {"list": "Study", "priority": "low"}, "limit": 3},
+    {"start_date": "2026-10-28", "end_date": "2026-10-28"},
+    {"filters": {"list": "Nonexistent"}},
+]
+
+
+def ids(tasks):
+    return [task["id"] for task in tasks]
+
+
+def test_queries_match_reference():
+    tasks = make_tasks()
+    index = UserTaskIndex(tasks)
+    for case in CASES:
+        assert ids(index.query(**case)) == ids(reference(tasks, **case)), case
+
+
+def test_upsert_and_remove_keep_indexes_consistent():
+    tasks = make_tasks()
+    index = UserTaskIndex(tasks)
+
+    moved = dict(tasks[3], dueDate="2026-10-06", priority="high", completed=True)
+    index.upsert(moved)
+    index.remove(tasks[4]["id"])
+    index.upsert({"id": "new", "description": "New", "dueDate": "2026-10-06"})
+
+    current = [moved if task["id"] == moved["id"] else task for task in tasks if task["id"] != tasks[4]["id"]]
+    current.append({"id": "new", "description": "New", "dueDate": "2026-10-06"})
+    for case in CASES:
+        assert ids(index.query(**case)) == ids(reference(current, **case)), case
+
+    # Emptying the index frees its estimated size
+    for task_id in list(index.tasks):
+        index.remove(task_id)
+    assert index.size_bytes == 0 and index.query() == []
+
+
+def test_results_are_copies():
+    index = UserTaskIndex([{"id": "a", "description": "Essay", "dueDate": "2026-10-01"}])
+    index.query()[0]["description"] = "changed"
+    assert index.query()[0]["description"] == "Essay"
+
+
+def test_hydration_racing_a_write_is_refused():
+    cache = TaskIndexCache(max_bytes=10_000_000, ttl=300)
+    tasks = make_tasks(10)
+
+    # A write lands between taking the version and installing the read
+    version = cache.version()
+    cache.upsert_task("u1", {"id": "late", "description": "Added in the UI"})
+    assert cache.hydrate("u1", tasks, version=version) is False
+    assert "u1" not in cache
+    assert cache.stats()["stale_hydrations"] == 1
+
+    # Writes for other users do not block the hydration
+    version = cache.version()
+    cache.remove_task("u2", "x")
+    assert cache.hydrate("u1", tasks, version=version) is True
+    assert len(cache.query("u1")) == 10
+
+    # A listener snapshot (no version) is always installed
+    cache.invalidate("u1")
+    assert cache.hydrate("u1", tasks) is True
+
+
+def test_forgotten_write_versions_still_refuse_old_reads():
+    cache = TaskIndexCache(max_bytes=10_000_000, ttl=300)
+    version = cache.version()
+    cache.update_task("u1", "t1", {"completed": True})
+    for i in range(WRITE_VERSION_MAX_USERS):
+        cache.invalidate(f"other{i}")
+
+    # u1's own write version was folded into the floor
+    assert cache.hydrate("u1", [], version=version) is False
+    assert cache.hydrate("u1", [], version=cache.version()) is True
+
+
+def test_ttl_and_memory_cap():
+    clock = FakeClock()
+    tasks = make_tasks(20)
+    cache = TaskIndexCache(max_bytes=UserTaskIndex(tasks).size_bytes * 2 + 1, ttl=60, clock=clock)
+
+    assert cache.hydrate("u1", tasks)
+    clock.now += 1
+    assert cache.hydrate("u2", tasks)
+    cache.query("u1")
+    clock.now += 1
+    assert cache.hydrate("u3", tasks)
+
+    # u2 was least recently used
+    assert "u2" not in cache and "u1" in cache and "u3" in cache
+    assert cache.stats()["evictions"] == 1
+
+    clock.now += 60
+    assert cache.query("u1") is None
+    assert cache.stats()["expirations"] == 1
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✓ {name}")